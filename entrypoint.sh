@@ -27,6 +27,11 @@ if [ "${RUN_MIGRATIONS:-1}" = "1" ]; then
   python manage.py migrate --noinput
 fi
 
+if [ "${RUN_LUA_SCHEDULER_TICK:-0}" = "1" ]; then
+  echo "Agendando despacho periódico do escalonador Lua..."
+  python manage.py lua_scheduler --schedule || true
+fi
+
 # Se nenhum comando foi passado (ex: Dockerfile sem CMD), usamos Gunicorn como padrão.
 if [ "$#" -eq 0 ]; then
   set -- gunicorn lua_web_scrapper.wsgi:application --bind 0.0.0.0:8000 --workers "${GUNICORN_WORKERS:-3}"
@@ -10,6 +10,12 @@ export interface WsMessage {
   step_title?: string;
   status?: string;
   log?: string;
+  steps?: Array<{
+    step_index?: number;
+    step_title?: string;
+    status?: string;
+    log?: string;
+  }>;
   success?: boolean;
   result?: any;
   error?: string;
@@ -20,6 +26,7 @@ export interface WsMessage {
   search_term?: string;
   job_id?: string;
   title?: string;
+  dropped?: number;
 }
 
 export interface WsClient {
@@ -38,6 +45,7 @@ export const useAsyncExecution = (): WsClient => {
   const messageCallbacks = ref<Set<(message: WsMessage) => void>>(new Set());
   const errorOptionsRef = ref<ErrorHandlerOptions | undefined>(undefined);
   const isManualDisconnect = ref(false);
+  const lastSessionId = ref<string | undefined>(undefined);
 
   const getWebSocketUrl = (): string => {
     const apiBase = config.public.apiBase as string;
@@ -108,6 +116,20 @@ export const useAsyncExecution = (): WsClient => {
 
     try {
       const message: WsMessage = JSON.parse(newData);
+
+      // Heartbeat do servidor: sem resposta a conexão é fechada por inatividade
+      if (message.type === "ping") {
+        send(JSON.stringify({ action: "pong" }));
+        return;
+      }
+
+      // Mensagens descartadas pelo servidor: nova inscrição reenvia os eventos da sessão
+      if (message.type === "backpressure") {
+        console.warn("Mensagens descartadas pelo servidor:", message.dropped);
+        if (lastSessionId.value) subscribe(lastSessionId.value);
+        return;
+      }
+
       messageCallbacks.value.forEach((callback) => callback(message));
     } catch (error) {
       handleWebSocketError(error, {
@@ -165,6 +187,7 @@ export const useAsyncExecution = (): WsClient => {
       return;
     }
 
+    lastSessionId.value = sessionId;
     const subscribeMessage = {
       action: "subscribe",
       session_id: sessionId,
@@ -18,5 +18,5 @@ if settings.DEBUG:
 
 application = ProtocolTypeRouter({
     'http': django_asgi_app,
-    'websocket': URLRouter(websocket_urlpatterns),
+    'websocket': AuthMiddlewareStack(URLRouter(websocket_urlpatterns)),
 })
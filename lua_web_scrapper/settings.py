@@ -15,6 +15,11 @@ DEBUG = config('DEBUG', default=True, cast=bool)
 ALLOWED_HOSTS = config(
     'ALLOWED_HOSTS', default='localhost,127.0.0.1,0.0.0.0', cast=Csv())
 
+# Proxies reversos confiáveis na frente da aplicação (nginx em produção). O IP dos
+# anônimos vem da entrada do X-Forwarded-For nesta posição a partir da direita;
+# com 0 o cabeçalho é ignorado e vale o endereço da conexão
+TRUSTED_PROXY_COUNT = config('TRUSTED_PROXY_COUNT', default=0, cast=int)
+
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -120,6 +125,39 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Armazenamento de screenshots: 'local' (MEDIA_ROOT) ou 's3' (requer boto3)
+SCREENSHOT_STORAGE_BACKEND = config('SCREENSHOT_STORAGE_BACKEND', default='local')
+
+if SCREENSHOT_STORAGE_BACKEND == 's3':
+    SCREENSHOT_STORAGE = {
+        'BACKEND': 'scraper.services.screenshot_store.S3ScreenshotStore',
+        'OPTIONS': {
+            'bucket': config('SCREENSHOT_S3_BUCKET'),
+            'prefix': config('SCREENSHOT_S3_PREFIX', default='screenshots/lua_editor'),
+            'endpoint_url': config('SCREENSHOT_S3_ENDPOINT_URL', default=None),
+            'public_url': config('SCREENSHOT_S3_PUBLIC_URL', default=None),
+        },
+    }
+else:
+    SCREENSHOT_STORAGE = {
+        'BACKEND': 'scraper.services.screenshot_store.LocalScreenshotStore',
+        'OPTIONS': {},
+    }
+
+# Variantes geradas em background para cada screenshot
+SCREENSHOT_VARIANTS = {
+    'ENABLED': config('SCREENSHOT_VARIANTS_ENABLED', default=True, cast=bool),
+    'QUEUE': 'default',
+    'FORMATS': {
+        'webp': {'format': 'WEBP', 'quality': config('SCREENSHOT_WEBP_QUALITY', default=80, cast=int)},
+        'jpeg': {'format': 'JPEG', 'quality': config('SCREENSHOT_JPEG_QUALITY', default=80, cast=int)},
+    },
+    'THUMBNAILS': {
+        'thumbnail_small': {'size': (320, 240), 'format': 'WEBP', 'quality': 75},
+        'thumbnail_medium': {'size': (640, 480), 'format': 'WEBP', 'quality': 75},
+    },
+}
+
 
 def parse_redis_url(url):
     """Parse Redis URL para extrair host, port e database."""
@@ -148,15 +186,174 @@ RQ_QUEUES = {
     }
 }
 
+# Nós Splash disponíveis (separados por vírgula em SPLASH_BACKENDS)
+SPLASH_BACKENDS = config(
+    'SPLASH_BACKENDS', default='http://localhost:8050', cast=Csv())
+
+SPLASH_CLUSTER = {
+    'MAX_CONCURRENCY_PER_NODE': config('SPLASH_MAX_CONCURRENCY_PER_NODE', default=5, cast=int),
+    'HEALTH_CHECK_INTERVAL': config('SPLASH_HEALTH_CHECK_INTERVAL', default=10, cast=int),
+    'HEALTH_CHECK_TIMEOUT': 2,
+    'SLOW_THRESHOLD': config('SPLASH_SLOW_THRESHOLD', default=60, cast=float),
+    'MAX_FAILURES': 3,
+    'EJECTION_TIME': config('SPLASH_EJECTION_TIME', default=30, cast=int),
+    'ACQUIRE_TIMEOUT': 30,
+}
+
+# Pool de conexões HTTP com o Splash (compartilhado por todos os jobs do processo).
+# Para reaproveitar conexões entre jobs, o worker deve rodar sem fork por job
+# (rqworker --worker-class rq.worker.SimpleWorker).
+SPLASH_HTTP_POOL = {
+    'POOL_CONNECTIONS': config('SPLASH_POOL_CONNECTIONS', default=10, cast=int),
+    'POOL_MAXSIZE': config('SPLASH_POOL_MAXSIZE', default=10, cast=int),
+    'POOL_BLOCK': False,
+    'MAX_RETRIES': config('SPLASH_MAX_RETRIES', default=3, cast=int),
+    'BACKOFF_FACTOR': config('SPLASH_BACKOFF_FACTOR', default=0.3, cast=float),
+    'TIMEOUT': config('SPLASH_TIMEOUT', default=30, cast=int),
+}
+
+# Retenção de execuções: as mais antigas viram resumo e o payload é arquivado
+EXECUTION_RETENTION = {
+    'KEEP_FULL': config('EXECUTION_RETENTION_KEEP_FULL', default=50, cast=int),
+    'BATCH_SIZE': 500,
+    # Diretório persistente e fora do MEDIA_ROOT (que é público). Vazio: BASE_DIR/archive/executions
+    # apenas com DEBUG; fora dele a compactação não roda sem este valor
+    'ARCHIVE_DIR': config('EXECUTION_ARCHIVE_DIR', default=''),
+    'QUEUE': 'default',
+    'INTERVAL': config('EXECUTION_RETENTION_INTERVAL', default=3600, cast=int),
+}
+
+# Progresso das sessões de scraping ('redis' ou 'file')
+PROGRESS_STORE = {
+    'BACKEND': config('PROGRESS_BACKEND', default='redis'),
+    'KEY_PREFIX': 'progress',
+    'TTL': 86400,
+    'DIRECTORY': os.path.join(BASE_DIR, 'media', 'progress'),
+}
+
+# Escalonador da fila lua_execution: limites global/por usuário e faixas de prioridade
+LUA_SCHEDULER = {
+    'ENABLED': config('LUA_SCHEDULER_ENABLED', default=True, cast=bool),
+    'QUEUE': 'lua_execution',
+    'KEY_PREFIX': 'lua_sched',
+    # Vazio = nós Splash × MAX_CONCURRENCY_PER_NODE
+    'GLOBAL_LIMIT': config('LUA_SCHEDULER_GLOBAL_LIMIT', default=0, cast=int) or None,
+    'INTERACTIVE_RESERVED': config('LUA_SCHEDULER_INTERACTIVE_RESERVED', default=2, cast=int),
+    'USER_LIMITS': {
+        'interactive': config('LUA_SCHEDULER_USER_LIMIT_INTERACTIVE', default=2, cast=int),
+        'bulk': config('LUA_SCHEDULER_USER_LIMIT_BULK', default=5, cast=int),
+    },
+    'DEFAULT_WEIGHT': 1,
+    'WEIGHTS': {},
+    'JOB_TIMEOUT': 300,
+    'LEASE_TIMEOUT': 360,
+    'TICK_INTERVAL': 30,
+    'SCAN_LIMIT': 100,
+}
+
+# Scripts salvos registrados como módulos do Splash (opt-in). O diretório deve ser
+# montado no Splash e apontado por --lua-package-path, com
+# --lua-sandbox-allowed-modules "esmeralda_scripts"
+LUA_MODULES = {
+    'ENABLED': config('LUA_MODULES_ENABLED', default=False, cast=bool),
+    'DIRECTORY': config('LUA_MODULES_DIR', default=os.path.join(BASE_DIR, 'lua_modules')),
+    'PREFIX': 'esmeralda_script_',
+}
+
+# Cache de resultados de execuções Lua (opt-in)
+LUA_RESULT_CACHE = {
+    'ENABLED': config('LUA_RESULT_CACHE_ENABLED', default=False, cast=bool),
+    'TTL': config('LUA_RESULT_CACHE_TTL', default=300, cast=int),
+    'MAX_ENTRIES': config('LUA_RESULT_CACHE_MAX_ENTRIES', default=1000, cast=int),
+    'KEY_PREFIX': 'lua_result_cache',
+    'QUEUE': 'lua_execution',
+}
+
+# Cache em disco (SQLite) das renderizações do Splash: endpoint + URL + hash do Lua + args.
+# O Scrapy lê as mesmas variáveis (scraper/scrapy_project/settings.py) e usa o mesmo arquivo
+RENDER_CACHE = {
+    'ENABLED': config('RENDER_CACHE_ENABLED', default=False, cast=bool),
+    'PATH': config('RENDER_CACHE_PATH', default=os.path.join(BASE_DIR, 'cache', 'render_cache.sqlite3')),
+    'TTL': config('RENDER_CACHE_TTL', default=86400, cast=int),
+    'MAX_BYTES': config('RENDER_CACHE_MAX_BYTES', default=512 * 1024 * 1024, cast=int),
+}
+
+# Coalescência de execuções idênticas em andamento (single-flight)
+LUA_SINGLE_FLIGHT = {
+    'ENABLED': config('LUA_SINGLE_FLIGHT_ENABLED', default=True, cast=bool),
+    'TTL': 600,
+    'KEY_PREFIX': 'lua_flight',
+    'QUEUE': 'lua_execution',
+}
+
+# Execução em lote
+LUA_BATCH = {
+    'MAX_ITEMS': config('LUA_BATCH_MAX_ITEMS', default=10000, cast=int),
+    'CHUNK_SIZE': 500,
+    'TTL': 86400,
+    'KEY_PREFIX': 'lua_batch',
+    'QUEUE': 'lua_execution',
+}
+
+# Resumos enviados ao grupo global (notifications_lua, firehose de administradores): todos, amostrados ou nenhum
+LUA_EVENTS = {
+    'GLOBAL_BROADCAST': config('LUA_EVENTS_GLOBAL_BROADCAST', default='all'),
+    'GLOBAL_SAMPLE_RATE': config('LUA_EVENTS_GLOBAL_SAMPLE_RATE', default=0.1, cast=float),
+    'GLOBAL_GROUP': 'notifications_lua',
+}
+
+# Resultados completos das execuções (os eventos levam só resumo + result_url quando grandes)
+LUA_RESULTS = {
+    'TTL': config('LUA_RESULTS_TTL', default=3600, cast=int),
+    'KEY_PREFIX': 'lua_results',
+    'QUEUE': 'lua_execution',
+    'INLINE_MAX_BYTES': config('LUA_RESULTS_INLINE_MAX_BYTES', default=16 * 1024, cast=int),
+    'CHUNK_SIZE': 256 * 1024,
+}
+
+# Buffer de eventos por sessão para replay na inscrição do WebSocket
+LUA_EVENT_BUFFER = {
+    'TTL': config('LUA_EVENT_BUFFER_TTL', default=300, cast=int),
+    'MAX_EVENTS': 500,
+    'KEY_PREFIX': 'lua_events',
+    'QUEUE': 'lua_execution',
+}
+
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
             'hosts': [REDIS_URL],
+            # msgpack (padrão do channels_redis) ou fastjson (codec de JSON_CODEC)
+            'serializer_format': config('CHANNEL_LAYER_SERIALIZER', default='msgpack'),
+            # Inscrições de processos que morreram expiram; conexões vivas renovam a cada GROUP_REFRESH_INTERVAL
+            'group_expiry': config('CHANNEL_LAYER_GROUP_EXPIRY', default=900, cast=int),
         },
     },
 }
 
+# Limites das conexões WebSocket: contagem por usuário/IP, heartbeat e fila de envio por conexão
+WS_LIMITS = {
+    'MAX_CONNECTIONS_PER_USER': config('WS_MAX_CONNECTIONS_PER_USER', default=20, cast=int),
+    'MAX_CONNECTIONS_PER_IP': config('WS_MAX_CONNECTIONS_PER_IP', default=50, cast=int),
+    'HEARTBEAT_INTERVAL': config('WS_HEARTBEAT_INTERVAL', default=25, cast=int),
+    'IDLE_TIMEOUT': config('WS_IDLE_TIMEOUT', default=75, cast=int),
+    'SEND_QUEUE_SIZE': config('WS_SEND_QUEUE_SIZE', default=256, cast=int),
+    # drop_oldest | drop_newest | close
+    'SEND_QUEUE_POLICY': config('WS_SEND_QUEUE_POLICY', default='drop_oldest'),
+    'SEND_TIMEOUT': 10,
+    'GROUP_REFRESH_INTERVAL': 300,
+    # redis | local | off
+    'ACCOUNTING': config('WS_ACCOUNTING', default='redis'),
+    'KEY_PREFIX': 'ws_connections',
+    'QUEUE': 'lua_execution',
+}
+
+# Codec JSON do WebSocket, do channel layer (fastjson) e dos buffers no Redis: auto | orjson | ujson | json
+JSON_CODEC = {
+    'BACKEND': config('JSON_CODEC_BACKEND', default='auto'),
+}
+
 FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:3000')
 
 CORS_ALLOWED_ORIGINS = config(
@@ -166,6 +363,8 @@ CORS_ALLOWED_ORIGINS = config(
 )
 
 CORS_ALLOW_CREDENTIALS = True
+# Necessário para o download parcial de resultados (Range)
+CORS_EXPOSE_HEADERS = ['Content-Range', 'Accept-Ranges']
 
 CSRF_TRUSTED_ORIGINS = config(
     'CSRF_TRUSTED_ORIGINS',
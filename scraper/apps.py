@@ -5,3 +5,9 @@ class ScraperConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'scraper'
     verbose_name = 'Scraper Interativo'
+
+    def ready(self):
+        from .utils.json_codec import register_channel_layer_serializer
+
+        # Permite CHANNEL_LAYERS[...]['CONFIG']['serializer_format'] = 'fastjson'
+        register_channel_layer_serializer()
@@ -1,4 +1,8 @@
+import asyncio
+import base64
+import gzip
 import logging
+import time
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from drf_spectacular_websocket.decorators import extend_ws_schema
 from .serializers import (
@@ -6,34 +10,228 @@ from .serializers import (
     SubscribedOutputSerializer,
     ErrorOutputSerializer,
     LuaExecutionProgressOutputSerializer,
+    LuaExecutionStepsOutputSerializer,
     LuaExecutionCompletedOutputSerializer,
     LuaExecutionErrorOutputSerializer,
+    LuaBatchProgressOutputSerializer,
+    LuaExecutionSummaryOutputSerializer,
+    LuaResultChunkOutputSerializer,
+    PingOutputSerializer,
+    BackpressureOutputSerializer,
 )
+from .utils import json_codec
+from .utils.client_messages import validate_client_message
+from .utils.event_buffer import get_events, parse_event_id
+from .utils.execution_results import can_read_result, get_results_settings, load_result_payload
+from .utils.ws_connections import (
+    CLOSE_CONNECTION_LIMIT,
+    CLOSE_IDLE_TIMEOUT,
+    CLOSE_SLOW_CONSUMER,
+    connection_owner,
+    get_ws_settings,
+    register_connection,
+    touch_connection,
+    unregister_connection,
+)
+from .services.event_publisher import get_event_settings, session_group, user_group
 
 logger = logging.getLogger(__name__)
 
 
 class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    owner = None
+    registered = False
+    closing = False
+    send_queue = None
+    dropped_frames = 0
+
     async def connect(self):
-        logger.info(f"WebSocket connection established: {self.channel_name}")
+        self.owner = connection_owner(self.scope)
+        self.registered = await asyncio.to_thread(
+            register_connection, self.owner, self.channel_name)
         await self.accept()
 
-        await self.channel_layer.group_add(
-            "notifications",
-            self.channel_name
-        )
+        if not self.registered:
+            logger.warning(f"WebSocket connection limit reached for {self.owner}: {self.channel_name}")
+            await self.send_error("Limite de conexões simultâneas atingido")
+            await self.close(code=CLOSE_CONNECTION_LIMIT)
+            return
+
+        logger.info(f"WebSocket connection established: {self.channel_name}")
+        self.start_connection_tasks()
+
+        # Usuários autenticados recebem os eventos de todas as suas sessões
+        user = self.scope.get("user")
+        if user is not None and user.is_authenticated:
+            await self.join_group(user_group(user.id))
+
+    def start_connection_tasks(self):
+        ws_settings = get_ws_settings()
+        self.last_seen = self.last_busy = time.monotonic()
+        self.groups_refreshed_at = self.last_seen
+        self.send_queue = asyncio.Queue(maxsize=ws_settings['SEND_QUEUE_SIZE'])
+        self.connection_tasks = [
+            asyncio.create_task(self.drain_send_queue()),
+            asyncio.create_task(self.heartbeat()),
+        ]
+
+    def stop_connection_tasks(self):
+        self.send_queue = None
+        current = asyncio.current_task()
+        for task in getattr(self, 'connection_tasks', []):
+            if task is not current:
+                task.cancel()
+        self.connection_tasks = []
+
+    @classmethod
+    async def decode_json(cls, text_data):
+        return json_codec.loads(text_data)
+
+    @classmethod
+    async def encode_json(cls, content):
+        return json_codec.dumps(content)
+
+    async def send_json(self, content, close=False):
+        # O send_json do channels chama super().send e pularia a fila de envio
+        await self.send(text_data=await self.encode_json(content), close=close)
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        """
+        Frames passam por uma fila limitada, esvaziada por `drain_send_queue`. Quando
+        o cliente não acompanha e a fila enche, SEND_QUEUE_POLICY decide: descartar o
+        frame mais antigo, descartar o novo ou fechar a conexão.
+        """
+        if self.closing:
+            return
+        if self.send_queue is None:
+            await super().send(text_data=text_data, bytes_data=bytes_data, close=close)
+            return
+
+        if self.send_queue.full():
+            policy = get_ws_settings()['SEND_QUEUE_POLICY']
+            if policy == 'close':
+                logger.warning(f"Slow WebSocket client, closing: {self.channel_name}")
+                await self.close(code=CLOSE_SLOW_CONSUMER)
+                return
+            if policy == 'drop_oldest':
+                self.send_queue.get_nowait()
+                self.send_queue.put_nowait((text_data, bytes_data))
+            self.dropped_frames += 1
+        else:
+            self.send_queue.put_nowait((text_data, bytes_data))
+
+        if close:
+            await self.close(close)
+
+    async def drain_send_queue(self):
+        timeout = get_ws_settings()['SEND_TIMEOUT']
+        queue = self.send_queue
+
+        while True:
+            text_data, bytes_data = await queue.get()
+            try:
+                await asyncio.wait_for(
+                    super().send(text_data=text_data, bytes_data=bytes_data), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"WebSocket send timed out, closing: {self.channel_name}")
+                await self.close(code=CLOSE_SLOW_CONSUMER)
+                return
+            except Exception as e:
+                logger.error(f"Error sending WebSocket frame to {self.channel_name}: {e}")
+                return
+
+            if self.dropped_frames and queue.empty():
+                await self.notify_dropped_frames()
+
+    @extend_ws_schema(
+        type='send',
+        summary='Mensagens descartadas',
+        description=(
+            'Avisa que mensagens foram descartadas porque o cliente não acompanhou o envio. '
+            'O cliente deve refazer a inscrição na sessão para receber o replay dos eventos'
+        ),
+        request=None,
+        responses=BackpressureOutputSerializer,
+    )
+    async def notify_dropped_frames(self):
+        dropped, self.dropped_frames = self.dropped_frames, 0
+        # Eventos descartados já passaram pela deduplicação: o próximo replay reenvia tudo
+        self.last_event_ids = {}
+        logger.warning(f"Dropped {dropped} frames for slow WebSocket client: {self.channel_name}")
+        await super().send(text_data=await self.encode_json({
+            "type": "backpressure",
+            "dropped": dropped,
+            "timestamp": time.time(),
+        }))
+
+    @extend_ws_schema(
+        type='send',
+        summary='Heartbeat',
+        description=(
+            'Enviado a cada HEARTBEAT_INTERVAL segundos; o cliente responde com a ação "pong". '
+            'Sem mensagens do cliente por IDLE_TIMEOUT segundos, a conexão é fechada (código 4408)'
+        ),
+        request=None,
+        responses=PingOutputSerializer,
+    )
+    async def heartbeat(self):
+        ws_settings = get_ws_settings()
+
+        while True:
+            await asyncio.sleep(ws_settings['HEARTBEAT_INTERVAL'])
+            now = time.monotonic()
+
+            # Com frames na fila o cliente só está atrasado (e o ping ficaria atrás deles);
+            # quem trava o envio de vez cai no SEND_TIMEOUT de drain_send_queue
+            if self.send_queue is not None and not self.send_queue.empty():
+                self.last_busy = now
+            elif now - max(self.last_seen, self.last_busy) > ws_settings['IDLE_TIMEOUT']:
+                logger.info(f"Closing idle WebSocket connection: {self.channel_name}")
+                await self.close(code=CLOSE_IDLE_TIMEOUT)
+                return
+            else:
+                await self.send_json({"type": "ping", "timestamp": time.time()})
+
+            await asyncio.to_thread(touch_connection, self.owner, self.channel_name)
+
+            if now - self.groups_refreshed_at >= ws_settings['GROUP_REFRESH_INTERVAL']:
+                # Renova as inscrições antes do group_expiry do channel layer
+                for group in self.groups:
+                    await self.channel_layer.group_add(group, self.channel_name)
+                self.groups_refreshed_at = now
+
+    async def close(self, code=None, reason=None):
+        if self.closing:
+            return
+        self.closing = True
+        self.stop_connection_tasks()
+        await super().close(code=code, reason=reason)
+
+    async def join_group(self, group_name):
+        if group_name in self.groups:
+            return
+        await self.channel_layer.group_add(group_name, self.channel_name)
+        self.groups.append(group_name)
 
     async def disconnect(self, close_code):
+        # Os grupos em self.groups já foram descartados por websocket_disconnect
         logger.info(
             f"WebSocket connection closed: {self.channel_name}, code: {close_code}")
 
-        for group in getattr(self, 'groups', []):
-            await self.channel_layer.group_discard(group, self.channel_name)
+        self.closing = True
+        self.stop_connection_tasks()
+        if self.registered:
+            await asyncio.to_thread(unregister_connection, self.owner, self.channel_name)
+            self.registered = False
+
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        self.last_seen = time.monotonic()
+        await super().receive(text_data=text_data, bytes_data=bytes_data, **kwargs)
 
     @extend_ws_schema(
         type='receive',
         summary='Receber mensagens do WebSocket',
-        description='Recebe mensagens JSON do cliente. Ação suportada: "subscribe"',
+        description='Recebe mensagens JSON do cliente. Ações suportadas: "subscribe", "fetch_result", "ping" e "pong"',
         request=SubscribeInputSerializer,
         responses={
             200: SubscribedOutputSerializer,
@@ -42,16 +240,26 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
     )
     async def receive_json(self, content, **kwargs):
         try:
-            serializer = SubscribeInputSerializer(data=content)
-            if not serializer.is_valid():
-                await self.send_error(f"Erro de validação: {serializer.errors}")
+            # Mesmas regras do SubscribeInputSerializer, sem o custo do DRF por mensagem
+            data, errors = validate_client_message(content)
+            if errors:
+                await self.send_error(f"Erro de validação: {errors}")
                 return
 
-            action = serializer.validated_data.get('action')
-            session_id = serializer.validated_data.get('session_id')
+            action = data.get('action')
+            session_id = data.get('session_id')
+            batch_id = data.get('batch_id')
+            firehose = data.get('firehose', False)
 
             if action == 'subscribe':
-                await self.handle_subscribe(session_id)
+                await self.handle_subscribe(session_id, batch_id, firehose)
+            elif action == 'fetch_result':
+                await self.handle_fetch_result(
+                    data.get('result_id'), data.get('compression', 'none'))
+            elif action == 'ping':
+                await self.send_json({"type": "pong", "timestamp": time.time()})
+            elif action == 'pong':
+                pass
             else:
                 logger.warning(f"Unknown action received: {action}")
                 await self.send_error(f"Ação desconhecida: {action}")
@@ -80,28 +288,108 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
         request=None,
         responses=SubscribedOutputSerializer,
     )
-    async def handle_subscribe(self, session_id):
-        if not hasattr(self, 'groups'):
-            self.groups = []
-
-        group_name = "notifications_lua"
-        await self.channel_layer.group_add(group_name, self.channel_name)
-        self.groups.append(group_name)
-        logger.debug(f"Subscribed {self.channel_name}")
-
+    async def handle_subscribe(self, session_id, batch_id=None, firehose=False):
         if session_id:
-            group_name = f"notifications_session_{session_id}"
-            await self.channel_layer.group_add(group_name, self.channel_name)
-            self.groups.append(group_name)
+            await self.join_group(session_group(session_id))
             logger.debug(
                 f"Subscribed {self.channel_name} to session: {session_id}")
 
+        if batch_id:
+            await self.join_group(f"notifications_batch_{batch_id}")
+            logger.debug(
+                f"Subscribed {self.channel_name} to batch: {batch_id}")
+
+        # Resumo das execuções de todos os usuários: apenas para administradores
+        if firehose:
+            user = self.scope.get("user")
+            if user is None or not user.is_staff:
+                await self.send_error("Firehose disponível apenas para administradores")
+                return
+            await self.join_group(get_event_settings()['GLOBAL_GROUP'])
+            logger.debug(f"Subscribed {self.channel_name} to firehose")
+
         await self.send_json({
             "type": "subscribed",
             "session_id": session_id,
             "message": "Inscrição realizada com sucesso"
         })
 
+        if session_id:
+            await self.replay_session_events(session_id)
+
+    @extend_ws_schema(
+        type='send',
+        summary='Resultado em blocos',
+        description=(
+            'Envia o resultado completo de uma execução em blocos numerados (seq/total), '
+            'em base64 e opcionalmente comprimido com gzip (resposta à ação fetch_result)'
+        ),
+        request=None,
+        responses=LuaResultChunkOutputSerializer,
+    )
+    async def handle_fetch_result(self, result_id, compression='none'):
+        if not result_id:
+            await self.send_error("result_id é obrigatório")
+            return
+
+        payload = None
+        if await asyncio.to_thread(can_read_result, result_id, self.scope.get("user")):
+            payload = await asyncio.to_thread(load_result_payload, result_id)
+        if payload is None:
+            await self.send_error("Resultado não encontrado ou expirado")
+            return
+
+        if compression == 'gzip':
+            payload = await asyncio.to_thread(gzip.compress, payload)
+
+        chunk_size = get_results_settings()['CHUNK_SIZE']
+        total = max(1, -(-len(payload) // chunk_size))
+
+        for seq in range(total):
+            chunk = payload[seq * chunk_size:(seq + 1) * chunk_size]
+            await self.send_json({
+                "type": "lua_result_chunk",
+                "result_id": result_id,
+                "seq": seq,
+                "total": total,
+                "size": len(payload),
+                "encoding": compression,
+                "data": base64.b64encode(chunk).decode('ascii'),
+                "final": seq == total - 1,
+            })
+
+    async def replay_session_events(self, session_id):
+        """
+        Reenvia os eventos emitidos antes da inscrição. Eventos já entregues
+        (ao vivo ou em um replay anterior) são descartados em `is_duplicate`.
+        """
+        events = await asyncio.to_thread(get_events, session_id)
+        for event in events:
+            handler = getattr(self, event.get("type", ""), None)
+            if handler is not None:
+                await handler(event)
+
+        if events:
+            logger.debug(
+                f"Replayed {len(events)} events to {self.channel_name} for session: {session_id}")
+
+    def is_duplicate(self, event):
+        session_id = event.get("session_id")
+        event_id = event.get("event_id")
+        if not event_id or session_group(session_id) not in getattr(self, 'groups', []):
+            return False
+
+        if not hasattr(self, 'last_event_ids'):
+            self.last_event_ids = {}
+
+        parsed_id = parse_event_id(event_id)
+        last_id = self.last_event_ids.get(session_id)
+        if last_id is not None and parsed_id <= last_id:
+            return True
+
+        self.last_event_ids[session_id] = parsed_id
+        return False
+
     @extend_ws_schema(
         type='send',
         summary='Progresso da execução Lua',
@@ -110,6 +398,8 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
         responses=LuaExecutionProgressOutputSerializer,
     )
     async def lua_execution_progress(self, event):
+        if self.is_duplicate(event):
+            return
         await self.send_json({
             "type": "lua_execution_progress",
             "session_id": event["session_id"],
@@ -120,6 +410,23 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
             "timestamp": event.get("timestamp"),
         })
 
+    @extend_ws_schema(
+        type='send',
+        summary='Progresso agrupado da execução Lua',
+        description='Notifica em uma única mensagem a atualização de vários passos, na ordem em que ocorreram',
+        request=None,
+        responses=LuaExecutionStepsOutputSerializer,
+    )
+    async def lua_execution_steps(self, event):
+        if self.is_duplicate(event):
+            return
+        await self.send_json({
+            "type": "lua_execution_steps",
+            "session_id": event["session_id"],
+            "steps": event.get("steps", []),
+            "timestamp": event.get("timestamp"),
+        })
+
     @extend_ws_schema(
         type='send',
         summary='Execução Lua concluída',
@@ -128,6 +435,8 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
         responses=LuaExecutionCompletedOutputSerializer,
     )
     async def lua_execution_completed(self, event):
+        if self.is_duplicate(event):
+            return
         await self.send_json({
             "type": "lua_execution_completed",
             "session_id": event["session_id"],
@@ -145,6 +454,8 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
         responses=LuaExecutionErrorOutputSerializer,
     )
     async def lua_execution_error(self, event):
+        if self.is_duplicate(event):
+            return
         await self.send_json({
             "type": "lua_execution_error",
             "session_id": event["session_id"],
@@ -152,3 +463,41 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
             "details": event.get("details"),
             "timestamp": event.get("timestamp"),
         })
+
+    @extend_ws_schema(
+        type='send',
+        summary='Resumo de execução (firehose)',
+        description='Resumo de um evento de qualquer sessão, enviado a administradores inscritos no firehose',
+        request=None,
+        responses=LuaExecutionSummaryOutputSerializer,
+    )
+    async def lua_execution_summary(self, event):
+        await self.send_json({
+            "type": "lua_execution_summary",
+            "event": event.get("event"),
+            "session_id": event["session_id"],
+            "user_id": event.get("user_id"),
+            "steps": event.get("steps"),
+            "status": event.get("status"),
+            "success": event.get("success"),
+            "error": event.get("error"),
+            "timestamp": event.get("timestamp"),
+        })
+
+    @extend_ws_schema(
+        type='send',
+        summary='Progresso do lote',
+        description='Notifica o progresso agregado de uma execução em lote',
+        request=None,
+        responses=LuaBatchProgressOutputSerializer,
+    )
+    async def lua_batch_progress(self, event):
+        await self.send_json({
+            "type": "lua_batch_progress",
+            "batch_id": event["batch_id"],
+            "total": event.get("total"),
+            "completed": event.get("completed"),
+            "succeeded": event.get("succeeded"),
+            "failed": event.get("failed"),
+            "timestamp": event.get("timestamp"),
+        })
@@ -0,0 +1,111 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from scraper.serializers import SubscribeInputSerializer
+from scraper.utils.client_messages import validate_client_message
+from scraper.utils.json_codec import BACKEND_ORDER, get_codec, load_codec
+
+
+def sample_messages(html_bytes: int) -> dict:
+    """Mensagens típicas do WebSocket: passos agrupados, conclusão pequena e resultado grande."""
+    steps = {
+        'type': 'lua_execution_steps',
+        'session_id': 'session-benchmark',
+        'timestamp': 1700000000.123,
+        'steps': [
+            {'step_index': index, 'step_title': f'Passo {index}', 'status': 'success',
+             'log': f'splash:go concluído em {index * 0.01:.2f}s'}
+            for index in range(50)
+        ],
+    }
+    completed = {
+        'type': 'lua_execution_completed',
+        'session_id': 'session-benchmark',
+        'success': True,
+        'result': {'result_id': 'session-benchmark', 'result_url': '/api/lua/results/session-benchmark/',
+                   'size': 1024, 'truncated': True, 'timestamp': 1700000000.123},
+        'error': None,
+        'timestamp': 1700000000.123,
+    }
+    row = '<tr><td class="cell">Produto ação</td><td>R$ 19,90</td></tr>\n'
+    result = {
+        'type': 'lua_execution_completed',
+        'session_id': 'session-benchmark',
+        'success': True,
+        'result': {'html': row * (html_bytes // len(row.encode('utf-8'))), 'url': 'https://example.com'},
+        'timestamp': 1700000000.123,
+    }
+    return {'steps': steps, 'completed': completed, 'result': result}
+
+
+def measure(function, number: int) -> float:
+    """Melhor tempo por chamada, em microssegundos."""
+    return min(timeit.repeat(function, number=number, repeat=3)) / number * 1e6
+
+
+class Command(BaseCommand):
+    help = 'Compara o codec JSON, os serializers do channel layer e a validação das mensagens do WebSocket'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=2000,
+                            help='Chamadas por medição nas mensagens pequenas')
+        parser.add_argument('--html-kb', type=int, default=1024,
+                            help='Tamanho do HTML da mensagem grande, em KB')
+
+    def handle(self, *args, **options):
+        number = options['number']
+        messages = sample_messages(options['html_kb'] * 1024)
+
+        # json (biblioteca padrão) primeiro: é a referência das comparações
+        codecs = []
+        for name in sorted(BACKEND_ORDER, key=lambda name: name != 'json'):
+            try:
+                codecs.append(load_codec(name))
+            except ImportError:
+                self.stdout.write(f'{name}: não instalado')
+
+        self.stdout.write(f'Codec ativo: {get_codec().name}\n')
+        self.stdout.write('Codec JSON do WebSocket (µs por mensagem, encode / decode, ganho sobre json)')
+        baseline = {}
+        for label, message in messages.items():
+            runs = number if label != 'result' else max(number // 100, 5)
+            for codec in codecs:
+                text = codec.dumps(message)
+                encode = measure(lambda: codec.dumps(message), runs)
+                decode = measure(lambda: codec.loads(text), runs)
+                baseline.setdefault(label, (encode, decode))
+                self.stdout.write(
+                    f'  {label:<10} {codec.name:<7} {encode:>10.1f} / {decode:>10.1f}'
+                    f'  ({baseline[label][0] / encode:.1f}x / {baseline[label][1] / decode:.1f}x)')
+
+        self.write_channel_layer(messages, number)
+
+        self.stdout.write('\nValidação da mensagem de inscrição (µs por mensagem)')
+        content = {'action': 'subscribe', 'session_id': 'session-benchmark', 'firehose': False}
+        assert validate_client_message(content)[0]['session_id'] == 'session-benchmark'
+        drf = measure(lambda: SubscribeInputSerializer(data=content).is_valid(), number)
+        light = measure(lambda: validate_client_message(content), number)
+        self.stdout.write(f'  SubscribeInputSerializer {drf:>10.1f}')
+        self.stdout.write(f'  validate_client_message  {light:>10.1f}  ({drf / light:.1f}x)')
+
+    def write_channel_layer(self, messages: dict, number: int):
+        try:
+            from channels_redis.serializers import SerializerDoesNotExist, registry
+        except ImportError:
+            self.stdout.write('\nchannels_redis não instalado: serializers do channel layer ignorados')
+            return
+
+        self.stdout.write('\nSerializer do channel layer (µs por mensagem, as_bytes / from_bytes, bytes)')
+        for label, message in messages.items():
+            runs = number if label != 'result' else max(number // 100, 5)
+            for name in ('msgpack', 'json', 'fastjson'):
+                try:
+                    serializer = registry.get_serializer(name)
+                except SerializerDoesNotExist:
+                    continue
+                payload = serializer.as_bytes(message)
+                encode = measure(lambda: serializer.as_bytes(message), runs)
+                decode = measure(lambda: serializer.from_bytes(payload), runs)
+                self.stdout.write(
+                    f'  {label:<10} {name:<8} {encode:>10.1f} / {decode:>10.1f}  {len(payload):>9}')
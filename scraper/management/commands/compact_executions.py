@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper.services.execution_retention import (
+    ArchiveNotConfigured,
+    compact_executions,
+    get_retention_settings,
+    schedule_compaction,
+)
+
+
+class Command(BaseCommand):
+    help = 'Arquiva o payload de execuções antigas, mantendo as últimas N completas por script'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=None,
+                            help='Execuções completas mantidas por script (padrão: EXECUTION_RETENTION["KEEP_FULL"])')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Execuções arquivadas por lote')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Apenas conta as execuções que seriam compactadas')
+        parser.add_argument('--schedule', action='store_true',
+                            help='Agenda o job periódico no RQ em vez de compactar agora')
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            job = schedule_compaction(delay=0)
+            if job:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Compactação periódica agendada (a cada {get_retention_settings()["INTERVAL"]}s): {job.id}'))
+            else:
+                self.stdout.write('Compactação periódica já está agendada')
+            return
+
+        try:
+            totals = compact_executions(
+                keep=options['keep'],
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+            )
+        except ArchiveNotConfigured as exc:
+            raise CommandError(str(exc))
+
+        verb = 'seriam compactadas' if options['dry_run'] else 'compactadas'
+        self.stdout.write(self.style.SUCCESS(
+            f'{totals["executions"]} execuções {verb} em {totals["scripts"]} scripts'))
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from channels.layers import InMemoryChannelLayer, channel_layers
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from scraper.consumers import NotificationConsumer
+from scraper.utils.ws_connections import CLOSE_CONNECTION_LIMIT, CLOSE_SLOW_CONSUMER, get_ws_settings
+
+# Endereço do proxy reverso simulado na frente das conexões anônimas
+PROXY_ADDRESS = '172.18.0.2'
+
+
+class SimulatedSocket:
+    """Cliente WebSocket em memória falando ASGI direto com o consumer."""
+
+    def __init__(self, index: int, user, send_delay: float = 0, client_ip: str = None):
+        self.index = index
+        self.user = user
+        self.send_delay = send_delay
+        # Conexões com client_ip chegam pelo proxy, como em produção atrás do nginx
+        self.client_ip = client_ip
+        self.incoming = asyncio.Queue()
+        self.accepted = asyncio.Event()
+        self.close_code = None
+        self.frames = 0
+        self.events = 0
+        self.dropped = 0
+
+    def scope(self) -> dict:
+        headers, client = [], f'10.0.{self.index // 250}.{self.index % 250}'
+        if self.client_ip:
+            # A primeira entrada é forjada pelo cliente; o proxy acrescenta o IP real à direita
+            forwarded_for = f'192.0.2.{self.index % 250}, {self.client_ip}'
+            headers, client = [(b'x-forwarded-for', forwarded_for.encode())], PROXY_ADDRESS
+        return {
+            'type': 'websocket',
+            'path': '/ws/notifications/',
+            'headers': headers,
+            'client': (client, 40000 + self.index),
+            'user': self.user,
+        }
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send(self, message):
+        message_type = message['type']
+        if message_type == 'websocket.accept':
+            self.accepted.set()
+        elif message_type == 'websocket.close':
+            self.close_code = message.get('code')
+            self.accepted.set()
+            self.incoming.put_nowait({'type': 'websocket.disconnect', 'code': self.close_code})
+        elif message_type == 'websocket.send':
+            if self.send_delay:
+                # Cliente lento: o servidor ASGI segura o envio até o frame ser aceito
+                await asyncio.sleep(self.send_delay)
+            self.frames += 1
+            content = json.loads(message['text'])
+            if content['type'] == 'ping':
+                self.send_json({'action': 'pong'})
+            elif content['type'] == 'backpressure':
+                self.dropped += content['dropped']
+            elif content['type'] == 'lua_batch_progress':
+                self.events += 1
+
+    def send_json(self, content: dict):
+        self.incoming.put_nowait({'type': 'websocket.receive', 'text': json.dumps(content)})
+
+    def disconnect(self):
+        if self.close_code is None:
+            self.incoming.put_nowait({'type': 'websocket.disconnect', 'code': 1000})
+
+
+class Command(BaseCommand):
+    help = (
+        'Simula milhares de conexões WebSocket contra o NotificationConsumer com um channel layer '
+        'em memória. Com milhares de conexões o tempo de publicação é dominado pelo próprio '
+        'InMemoryChannelLayer, que percorre todos os canais a cada envio'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=200,
+                            help='Usuários distintos entre as conexões (testa o limite por usuário)')
+        parser.add_argument('--batches', type=int, default=100,
+                            help='Lotes distintos assinados pelas conexões')
+        parser.add_argument('--events', type=int, default=20,
+                            help='Eventos publicados por lote')
+        parser.add_argument('--slow-ratio', type=float, default=0.05,
+                            help='Fração de clientes lentos')
+        parser.add_argument('--slow-delay', type=float, default=0.5,
+                            help='Atraso por frame dos clientes lentos, em segundos')
+        parser.add_argument('--queue-size', type=int, default=None)
+        parser.add_argument('--policy', choices=['drop_oldest', 'drop_newest', 'close'], default=None)
+        parser.add_argument('--max-per-user', type=int, default=None)
+        parser.add_argument('--anonymous', type=int, default=0,
+                            help='Conexões anônimas (entre as --connections), todas atrás de um único proxy')
+        parser.add_argument('--ips', type=int, default=10,
+                            help='IPs distintos entre as conexões anônimas (testa o limite por IP)')
+        parser.add_argument('--max-per-ip', type=int, default=None)
+        parser.add_argument('--heartbeat', type=int, default=5,
+                            help='Intervalo do heartbeat durante o teste, em segundos')
+        parser.add_argument('--idle-timeout', type=int, default=60,
+                            help='IDLE_TIMEOUT durante o teste; todas as conexões dividem um único event loop')
+
+    def handle(self, *args, **options):
+        ws_settings = {
+            **get_ws_settings(),
+            'ACCOUNTING': 'local',
+            'HEARTBEAT_INTERVAL': options['heartbeat'],
+            'IDLE_TIMEOUT': options['idle_timeout'],
+        }
+        if options['queue_size'] is not None:
+            ws_settings['SEND_QUEUE_SIZE'] = options['queue_size']
+        if options['policy'] is not None:
+            ws_settings['SEND_QUEUE_POLICY'] = options['policy']
+        if options['max_per_user'] is not None:
+            ws_settings['MAX_CONNECTIONS_PER_USER'] = options['max_per_user']
+        if options['max_per_ip'] is not None:
+            ws_settings['MAX_CONNECTIONS_PER_IP'] = options['max_per_ip']
+
+        layer = InMemoryChannelLayer(capacity=1000)
+        previous = channel_layers.set('default', layer)
+        try:
+            with override_settings(WS_LIMITS=ws_settings, TRUSTED_PROXY_COUNT=1):
+                asyncio.run(self.run(layer, options, ws_settings))
+        finally:
+            channel_layers.set('default', previous)
+
+    async def run(self, layer, options, ws_settings):
+        application = NotificationConsumer.as_asgi()
+        users = [
+            SimpleNamespace(id=index + 1, is_authenticated=True, is_staff=False)
+            for index in range(options['users'])
+        ]
+        anonymous = SimpleNamespace(id=None, is_authenticated=False, is_staff=False)
+        slow_every = int(1 / options['slow_ratio']) if options['slow_ratio'] else 0
+
+        sockets, tasks = [], []
+        started = time.perf_counter()
+        for index in range(options['connections']):
+            is_slow = slow_every and index % slow_every == 0
+            delay = options['slow_delay'] if is_slow else 0
+            if index < options['anonymous']:
+                client_ip = f'198.51.100.{index % max(options["ips"], 1)}'
+                socket = SimulatedSocket(index, anonymous, delay, client_ip)
+            else:
+                socket = SimulatedSocket(index, users[index % len(users)], delay)
+            socket.incoming.put_nowait({'type': 'websocket.connect'})
+            tasks.append(asyncio.create_task(application(socket.scope(), socket.receive, socket.send)))
+            sockets.append(socket)
+
+        await asyncio.gather(*[socket.accepted.wait() for socket in sockets])
+        accepted = time.perf_counter() - started
+
+        # Inscrição por lote: o progresso de lote não passa pelo buffer de replay no Redis
+        for socket in sockets:
+            socket.send_json({'action': 'subscribe', 'batch_id': f'loadtest-{socket.index % options["batches"]}'})
+        await asyncio.sleep(0.5)
+
+        # Conexões acima do limite são aceitas e fechadas em seguida com 4429
+        connected = [socket for socket in sockets if socket.close_code is None]
+        self.stdout.write(
+            f'{len(connected)}/{len(sockets)} conexões aceitas em {accepted:.2f}s '
+            f'(rejeitadas pelo limite: {len(sockets) - len(connected)})')
+        if options['anonymous']:
+            self.write_ip_limits(sockets, ws_settings)
+        self.stdout.write(f'Grupos no channel layer após inscrição: {len(layer.groups)}')
+
+        started = time.perf_counter()
+        for number in range(options['events']):
+            await asyncio.gather(*[
+                layer.group_send(f'notifications_batch_loadtest-{batch}', {
+                    'type': 'lua_batch_progress',
+                    'batch_id': f'loadtest-{batch}',
+                    'total': options['events'],
+                    'completed': number + 1,
+                    'succeeded': number + 1,
+                    'failed': 0,
+                    'timestamp': time.time(),
+                })
+                for batch in range(options['batches'])
+            ])
+        published = time.perf_counter() - started
+
+        fast = [socket for socket in connected if not socket.send_delay]
+        slow = [socket for socket in connected if socket.send_delay]
+        expected = options['events']
+
+        deadline = time.perf_counter() + 30
+        while time.perf_counter() < deadline and any(s.events < expected for s in fast):
+            await asyncio.sleep(0.1)
+        delivered = time.perf_counter() - started
+
+        # Lentos terminam quando tudo foi recebido ou avisado como descartado, ou quando são fechados
+        deadline = time.perf_counter() + 60
+        while time.perf_counter() < deadline and any(
+                s.close_code is None and s.events + s.dropped < expected for s in slow):
+            await asyncio.sleep(0.1)
+
+        # Espera o heartbeat passar ao menos uma vez com os clientes respondendo
+        await asyncio.sleep(ws_settings['HEARTBEAT_INTERVAL'] * 1.5)
+
+        self.stdout.write(
+            f'{options["events"] * options["batches"]} eventos publicados em {published:.2f}s; '
+            f'clientes rápidos completos em {delivered:.2f}s')
+        self.stdout.write(
+            f'Rápidos: {sum(s.events == expected for s in fast)}/{len(fast)} receberam todos os eventos')
+        self.stdout.write(
+            f'Lentos: {len(slow)}; eventos recebidos {sum(s.events for s in slow)}, '
+            f'descartes avisados {sum(s.dropped for s in slow)}, '
+            f'fechados por lentidão {sum(s.close_code == CLOSE_SLOW_CONSUMER for s in slow)} '
+            f'(política {ws_settings["SEND_QUEUE_POLICY"]}, fila {ws_settings["SEND_QUEUE_SIZE"]})')
+        close_codes = {}
+        for socket in connected:
+            if socket.close_code is not None:
+                close_codes[socket.close_code] = close_codes.get(socket.close_code, 0) + 1
+        self.stdout.write(f'Fechadas durante o teste, por código: {close_codes or "nenhuma"}')
+
+        for socket in sockets:
+            socket.disconnect()
+        await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=60)
+
+        leaked = sum(len(channels) for channels in layer.groups.values())
+        self.stdout.write(
+            f'Após desconectar: {len(layer.groups)} grupos, {leaked} inscrições restantes')
+        style = self.style.SUCCESS if not leaked else self.style.ERROR
+        self.stdout.write(style('Sem inscrições vazadas' if not leaked else 'Inscrições vazadas!'))
+
+    def write_ip_limits(self, sockets: list, ws_settings: dict):
+        """Anônimas atrás do proxy: o limite vale por IP real, não pelo IP do proxy nem pelo forjado."""
+        by_ip = {}
+        for socket in sockets:
+            if socket.client_ip:
+                by_ip.setdefault(socket.client_ip, []).append(socket)
+
+        limit = ws_settings['MAX_CONNECTIONS_PER_IP']
+        expected = sum(max(0, len(group) - limit) for group in by_ip.values())
+        rejected = sum(socket.close_code == CLOSE_CONNECTION_LIMIT
+                       for group in by_ip.values() for socket in group)
+        style = self.style.SUCCESS if rejected == expected else self.style.ERROR
+        self.stdout.write(style(
+            f'Anônimas: {sum(map(len, by_ip.values()))} conexões de {len(by_ip)} IPs via {PROXY_ADDRESS}; '
+            f'rejeitadas pelo limite por IP ({limit}): {rejected} (esperado {expected})'))
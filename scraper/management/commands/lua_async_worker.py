@@ -0,0 +1,207 @@
+"""
+Worker assíncrono para a fila lua_execution.
+Consome os mesmos jobs enfileirados pelo RQ, mas executa vários ao mesmo tempo
+em um único event loop em vez de um processo por renderização.
+
+O bookkeeping é o do próprio RQ: cada job entra no StartedJobRegistry com TTL renovado
+por heartbeat, então se o processo morrer os jobs expiram e a manutenção do RQ os move
+para o FailedJobRegistry (disparando on_failure), como acontece com o rqworker.
+"""
+
+import asyncio
+import signal
+import sys
+import threading
+import traceback
+
+import django_rq
+from django.core.management.base import BaseCommand
+from rq import Queue, Worker
+from rq.exceptions import DequeueTimeout
+from rq.timeouts import TimerDeathPenalty
+from rq.utils import now
+
+from scraper.services.async_lua_executor import run_lua_script_job_async
+from scraper.services.splash_client import close_async_splash_client
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+ASYNC_JOB_FUNCTIONS = {
+    'scraper.services.lua_executor.run_lua_script_job': run_lua_script_job_async,
+}
+
+
+class AsyncLuaWorker(Worker):
+    """
+    Worker do RQ usado apenas para registro, heartbeat e tratamento de sucesso/falha;
+    os jobs rodam no event loop. Callbacks rodam em threads, então o timeout deles
+    não pode usar SIGALRM.
+    """
+    death_penalty_class = TimerDeathPenalty
+
+
+class Command(BaseCommand):
+    help = 'Executa jobs Lua da fila RQ de forma concorrente em um event loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', default='lua_execution',
+                            help='Nome da fila RQ (padrão: lua_execution)')
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help='Máximo de jobs simultâneos (padrão: 50)')
+        parser.add_argument('--dequeue-timeout', type=int, default=5,
+                            help='Segundos aguardando novos jobs por chamada')
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(
+            options['queue'], options['concurrency'], options['dequeue_timeout']))
+
+    async def run(self, queue_name: str, concurrency: int, dequeue_timeout: int):
+        queue = django_rq.get_queue(queue_name)
+        semaphore = asyncio.Semaphore(concurrency)
+        stopping = asyncio.Event()
+        tasks = set()
+
+        # Os métodos do Worker guardam a execução corrente em atributos da instância,
+        # então as chamadas feitas a partir das threads são serializadas
+        self.worker = AsyncLuaWorker([queue], connection=queue.connection)
+        self.worker_lock = threading.Lock()
+        self.running = {}
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stopping.set)
+
+        await asyncio.to_thread(self.worker.register_birth)
+        heartbeats = asyncio.create_task(self._maintain_heartbeats())
+
+        self.stdout.write(
+            f'Worker assíncrono {self.worker.name} ouvindo "{queue_name}" '
+            f'(concorrência: {concurrency})')
+
+        try:
+            while not stopping.is_set():
+                await semaphore.acquire()
+                try:
+                    dequeued = await asyncio.to_thread(
+                        self._dequeue, queue, dequeue_timeout)
+                except Exception:
+                    semaphore.release()
+                    raise
+
+                if dequeued is None:
+                    semaphore.release()
+                    continue
+
+                task = asyncio.create_task(self._run_job(dequeued, queue, semaphore))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                self.stdout.write(f'Aguardando {len(tasks)} jobs em andamento...')
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        finally:
+            heartbeats.cancel()
+            await asyncio.to_thread(self.worker.register_death)
+            await close_async_splash_client()
+
+    def _dequeue(self, queue: Queue, timeout: int):
+        with self.worker_lock:
+            self.worker.heartbeat()
+            if self.worker.should_run_maintenance_tasks:
+                self.worker.run_maintenance_tasks()
+
+        try:
+            result = Queue.dequeue_any([queue], timeout, connection=queue.connection)
+        except DequeueTimeout:
+            return None
+        return result[0] if result else None
+
+    async def _maintain_heartbeats(self):
+        interval = self.worker.job_monitoring_interval
+        while True:
+            await asyncio.sleep(interval)
+            running = list(self.running.values())
+            try:
+                await asyncio.to_thread(self._send_heartbeats, running)
+            except Exception as e:
+                logger.error(f'Falha ao renovar heartbeats: {str(e)}')
+
+    def _send_heartbeats(self, running: list):
+        with self.worker_lock, self.worker.connection.pipeline() as pipeline:
+            self.worker.heartbeat(self.worker.job_monitoring_interval + 60, pipeline=pipeline)
+            for job, execution in running:
+                ttl = int(self.worker.get_heartbeat_ttl(job))
+                execution.heartbeat(job.started_job_registry, ttl, pipeline=pipeline)
+                job.heartbeat(now(), ttl, pipeline=pipeline, xx=True)
+            pipeline.execute()
+
+    async def _run_job(self, job, queue: Queue, semaphore: asyncio.Semaphore):
+        try:
+            execution = await asyncio.to_thread(self._prepare_job, job)
+            self.running[job.id] = (job, execution)
+
+            func = ASYNC_JOB_FUNCTIONS.get(job.func_name)
+            try:
+                if func is None:
+                    # Jobs síncronos bloqueariam uma thread sem poder ser cancelados no timeout
+                    raise TypeError(
+                        f'Job {job.func_name} não tem versão assíncrona; '
+                        f'enfileire-o em uma fila atendida pelo rqworker')
+
+                timeout = job.timeout if job.timeout and job.timeout > 0 else None
+                result = await asyncio.wait_for(func(*job.args, **job.kwargs), timeout)
+
+            except Exception as e:
+                logger.error(f'Job {job.id} falhou: {str(e)}')
+                exc_info = sys.exc_info()
+                await asyncio.to_thread(
+                    self._handle_failure, job, queue, execution,
+                    traceback.format_exc(), exc_info)
+
+            else:
+                await asyncio.to_thread(
+                    self._handle_success, job, queue, execution, result)
+
+            finally:
+                self.running.pop(job.id, None)
+
+        except Exception as e:
+            logger.error(f'Erro no bookkeeping do job {job.id}: {str(e)}')
+
+        finally:
+            semaphore.release()
+
+    def _prepare_job(self, job):
+        with self.worker_lock:
+            execution = self.worker.prepare_execution(job)
+            self.worker.prepare_job_execution(job, remove_from_intermediate_queue=True)
+            self.worker.execution = None
+        return execution
+
+    def _handle_success(self, job, queue: Queue, execution, result):
+        job.ended_at = now()
+        job._result = result
+        try:
+            job.execute_success_callback(self.worker.death_penalty_class, result)
+        except Exception as e:
+            logger.error(f'Callback de sucesso do job {job.id} falhou: {str(e)}')
+
+        with self.worker_lock:
+            self.worker.execution = execution
+            self.worker.handle_job_success(job, queue, job.started_job_registry)
+
+    def _handle_failure(self, job, queue: Queue, execution, exc_string: str, exc_info: tuple):
+        job.ended_at = now()
+        # Mesmo contrato do worker do RQ: on_failure roda quando o job falha
+        try:
+            job.execute_failure_callback(self.worker.death_penalty_class, *exc_info)
+        except Exception as e:
+            logger.error(f'Callback de falha do job {job.id} falhou: {str(e)}')
+
+        with self.worker_lock:
+            self.worker.execution = execution
+            self.worker.handle_job_failure(
+                job, queue, started_job_registry=job.started_job_registry, exc_string=exc_string)
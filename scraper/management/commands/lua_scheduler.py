@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from scraper.services.execution_scheduler import (
+    dispatch,
+    get_scheduler_settings,
+    get_scheduler_stats,
+    schedule_tick,
+)
+
+
+class Command(BaseCommand):
+    help = 'Mostra o estado do escalonador de execuções Lua e despacha pendências'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dispatch', action='store_true',
+                            help='Recupera vagas expiradas e despacha execuções pendentes')
+        parser.add_argument('--schedule', action='store_true',
+                            help='Agenda no RQ o despacho periódico, se ainda não estiver agendado '
+                                 '(requer --with-scheduler)')
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            job = schedule_tick(delay=0)
+            if job:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Despacho periódico agendado (a cada {get_scheduler_settings()["TICK_INTERVAL"]}s): {job.id}'))
+            else:
+                self.stdout.write('Despacho periódico já está agendado')
+            return
+
+        if options['dispatch']:
+            dispatched = dispatch()
+            self.stdout.write(self.style.SUCCESS(f'{dispatched} execuções despachadas'))
+
+        self.stdout.write(json.dumps(get_scheduler_stats(), indent=2))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 17:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0002_script_scriptexecution'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scriptexecution',
+            name='screenshot_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='URLs das variantes da screenshot (WebP, JPEG, miniaturas)'),
+        ),
+    ]
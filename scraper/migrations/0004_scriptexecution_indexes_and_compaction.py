@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-17 17:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0003_scriptexecution_screenshot_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scriptexecution',
+            name='archive_path',
+            field=models.CharField(blank=True, help_text='Arquivo compactado com o payload original', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='scriptexecution',
+            name='compacted',
+            field=models.BooleanField(default=False, help_text='Payload arquivado; a linha mantém apenas o resumo'),
+        ),
+        migrations.AddField(
+            model_name='scriptexecution',
+            name='logs_size',
+            field=models.PositiveIntegerField(blank=True, help_text='Tamanho em bytes dos logs antes da compactação', null=True),
+        ),
+        migrations.AddField(
+            model_name='scriptexecution',
+            name='response_size',
+            field=models.PositiveIntegerField(blank=True, help_text='Tamanho em bytes de response_data antes da compactação', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='scriptexecution',
+            index=models.Index(fields=['script', '-started_at'], name='scraper_exec_script_started'),
+        ),
+    ]
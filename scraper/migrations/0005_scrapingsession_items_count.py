@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0004_scriptexecution_indexes_and_compaction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapingsession',
+            name='items_count',
+            field=models.PositiveIntegerField(default=0, help_text='Resultados gravados no banco'),
+        ),
+        migrations.AlterField(
+            model_name='scrapingresult',
+            name='url',
+            field=models.URLField(max_length=2048),
+        ),
+    ]
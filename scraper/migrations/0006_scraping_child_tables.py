@@ -0,0 +1,70 @@
+# Generated by Django 4.2.30 on 2026-10-17 17:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0005_scrapingsession_items_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapingScreenshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Screenshot de Scraping',
+                'verbose_name_plural': 'Screenshots de Scraping',
+                'ordering': ['created_at', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ScrapingUrl',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=2048)),
+                ('url_hash', models.CharField(db_index=True, max_length=64)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'URL de Scraping',
+                'verbose_name_plural': 'URLs de Scraping',
+                'ordering': ['position', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='scrapingresult',
+            name='url_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='scrapingresult',
+            index=models.Index(fields=['session', '-scraped_at'], name='scraper_result_session_time'),
+        ),
+        migrations.AddField(
+            model_name='scrapingurl',
+            name='session',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='session_urls', to='scraper.scrapingsession'),
+        ),
+        migrations.AddField(
+            model_name='scrapingscreenshot',
+            name='session',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='screenshot_files', to='scraper.scrapingsession'),
+        ),
+        migrations.AddIndex(
+            model_name='scrapingurl',
+            index=models.Index(fields=['session', 'position'], name='scraper_url_session_pos'),
+        ),
+        migrations.AddIndex(
+            model_name='scrapingscreenshot',
+            index=models.Index(fields=['session', 'created_at'], name='scraper_shot_session_time'),
+        ),
+    ]
@@ -0,0 +1,110 @@
+"""
+Move as listas JSON de ScrapingSession (urls, results, screenshots) para as tabelas
+filhas, uma sessão por vez e com bulk_create em lotes, e preenche url_hash dos
+resultados existentes.
+
+Sessões que já têm linhas em uma tabela filha (resultados gravados pelo DatabasePipeline,
+ou uma execução anterior desta migração) não são copiadas de novo para essa tabela.
+Os resultados copiados recebem scraped_at = created_at da sessão, o que permite ao
+reverso apagar apenas eles.
+"""
+
+import hashlib
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+RESULT_FIELDS = ('url', 'title', 'screenshot_path')
+
+
+def url_digest(url):
+    return hashlib.sha256((url or '').encode('utf-8')).hexdigest()
+
+
+def backfill(apps, schema_editor):
+    ScrapingSession = apps.get_model('scraper', 'ScrapingSession')
+    ScrapingUrl = apps.get_model('scraper', 'ScrapingUrl')
+    ScrapingResult = apps.get_model('scraper', 'ScrapingResult')
+    ScrapingScreenshot = apps.get_model('scraper', 'ScrapingScreenshot')
+
+    sessions = ScrapingSession.objects.only(
+        'id', 'created_at', 'urls', 'results', 'screenshots').order_by('pk')
+
+    for session in sessions.iterator(chunk_size=50):
+        if not ScrapingUrl.objects.filter(session_id=session.pk).exists():
+            ScrapingUrl.objects.bulk_create([
+                ScrapingUrl(session_id=session.pk, url=url, url_hash=url_digest(url),
+                            position=position, created_at=session.created_at)
+                for position, url in enumerate(session.urls or [])
+            ], batch_size=BATCH_SIZE)
+
+        results = []
+        items = session.results or []
+        if ScrapingResult.objects.filter(session_id=session.pk).exists():
+            items = []
+        for item in items:
+            if not isinstance(item, dict):
+                item = {'value': item}
+            url = item.get('url') or ''
+            results.append(ScrapingResult(
+                session_id=session.pk,
+                url=url,
+                url_hash=url_digest(url),
+                title=(item.get('title') or '')[:500],
+                screenshot_path=(item.get('screenshot_path') or '')[:500],
+                data={key: value for key, value in item.items() if key not in RESULT_FIELDS},
+                scraped_at=session.created_at,
+            ))
+        ScrapingResult.objects.bulk_create(results, batch_size=BATCH_SIZE)
+
+        if not ScrapingScreenshot.objects.filter(session_id=session.pk).exists():
+            ScrapingScreenshot.objects.bulk_create([
+                ScrapingScreenshot(session_id=session.pk, path=str(path)[:500],
+                                   created_at=session.created_at)
+                for path in session.screenshots or []
+            ], batch_size=BATCH_SIZE)
+
+        if results:
+            ScrapingSession.objects.filter(pk=session.pk).update(
+                items_count=ScrapingResult.objects.filter(session_id=session.pk).count())
+
+    # Resultados gravados antes da coluna url_hash
+    pending = ScrapingResult.objects.filter(url_hash='').only('id', 'url')
+    while True:
+        batch = list(pending.order_by('pk')[:BATCH_SIZE])
+        if not batch:
+            break
+        for result in batch:
+            result.url_hash = url_digest(result.url)
+        ScrapingResult.objects.bulk_update(batch, ['url_hash'])
+
+
+def restore(apps, schema_editor):
+    ScrapingSession = apps.get_model('scraper', 'ScrapingSession')
+
+    for session in ScrapingSession.objects.order_by('pk').iterator(chunk_size=50):
+        session.urls = list(session.session_urls.order_by(
+            'position', 'id').values_list('url', flat=True))
+        session.results = [
+            {'url': url, 'title': title, 'screenshot_path': screenshot_path, **(data or {})}
+            for url, title, screenshot_path, data in session.items.order_by(
+                'scraped_at', 'id').values_list('url', 'title', 'screenshot_path', 'data')
+        ]
+        session.screenshots = list(session.screenshot_files.order_by(
+            'created_at', 'id').values_list('path', flat=True))
+        session.save(update_fields=['urls', 'results', 'screenshots'])
+        # Apenas os resultados criados pelo backfill voltam a existir só na lista;
+        # os gravados pelo pipeline já estavam na tabela antes desta migração
+        session.items.filter(scraped_at=session.created_at).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0006_scraping_child_tables'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, restore),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 17:50
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0007_backfill_scraping_child_tables'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='scrapingsession',
+            name='results',
+        ),
+        migrations.RemoveField(
+            model_name='scrapingsession',
+            name='screenshots',
+        ),
+        migrations.RemoveField(
+            model_name='scrapingsession',
+            name='urls',
+        ),
+    ]
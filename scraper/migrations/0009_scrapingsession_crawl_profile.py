@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0008_remove_scrapingsession_lists'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapingsession',
+            name='crawl_profile',
+            field=models.CharField(blank=True, choices=[('polite', 'polite'), ('balanced', 'balanced'), ('bulk', 'bulk')], default='', help_text='Perfil de crawl da sessão; vazio usa o CRAWL_PROFILE do processo', max_length=20),
+        ),
+    ]
@@ -1,7 +1,16 @@
+import hashlib
+
 from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import User
 
+from .scrapy_project.profiles import CRAWL_PROFILES
+
+
+def url_digest(url: str) -> str:
+    """sha256 da URL, indexado no lugar da URL completa (que pode exceder o limite do índice)."""
+    return hashlib.sha256((url or '').encode('utf-8')).hexdigest()
+
 
 class ScrapingSession(models.Model):
     session_id = models.CharField(max_length=100, unique=True)
@@ -13,11 +22,12 @@ class ScrapingSession(models.Model):
                                   ('completed', 'Concluída'),
                                   ('error', 'Erro')
                               ])
-    urls = models.JSONField(default=list, help_text='URLs para scraping')
-    results = models.JSONField(
-        default=list, help_text='Resultados do scraping')
-    screenshots = models.JSONField(
-        default=list, help_text='Caminhos das screenshots')
+    items_count = models.PositiveIntegerField(
+        default=0, help_text='Resultados gravados no banco')
+    crawl_profile = models.CharField(
+        max_length=20, blank=True, default='',
+        choices=[(name, name) for name in CRAWL_PROFILES],
+        help_text='Perfil de crawl da sessão; vazio usa o CRAWL_PROFILE do processo')
 
     class Meta:
         verbose_name = 'Sessão de Scraping'
@@ -28,10 +38,32 @@ class ScrapingSession(models.Model):
         return f'Sessão {self.session_id} - {self.status}'
 
 
+class ScrapingUrl(models.Model):
+    session = models.ForeignKey(
+        ScrapingSession, on_delete=models.CASCADE, related_name='session_urls')
+    url = models.URLField(max_length=2048)
+    url_hash = models.CharField(max_length=64, db_index=True)
+    position = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'URL de Scraping'
+        verbose_name_plural = 'URLs de Scraping'
+        ordering = ['position', 'id']
+        indexes = [
+            models.Index(fields=['session', 'position'],
+                         name='scraper_url_session_pos'),
+        ]
+
+    def __str__(self):
+        return self.url
+
+
 class ScrapingResult(models.Model):
     session = models.ForeignKey(
         ScrapingSession, on_delete=models.CASCADE, related_name='items')
-    url = models.URLField()
+    url = models.URLField(max_length=2048)
+    url_hash = models.CharField(max_length=64, blank=True, db_index=True)
     title = models.CharField(max_length=500, blank=True)
     screenshot_path = models.CharField(max_length=500, blank=True)
     data = models.JSONField(default=dict)
@@ -41,10 +73,37 @@ class ScrapingResult(models.Model):
         verbose_name = 'Resultado de Scraping'
         verbose_name_plural = 'Resultados de Scraping'
         ordering = ['-scraped_at']
+        indexes = [
+            models.Index(fields=['session', '-scraped_at'],
+                         name='scraper_result_session_time'),
+        ]
 
     def __str__(self):
         return f'{self.url} - {self.title or "Sem título"}'
 
+    def save(self, *args, **kwargs):
+        self.url_hash = url_digest(self.url)
+        super().save(*args, **kwargs)
+
+
+class ScrapingScreenshot(models.Model):
+    session = models.ForeignKey(
+        ScrapingSession, on_delete=models.CASCADE, related_name='screenshot_files')
+    path = models.CharField(max_length=500)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Screenshot de Scraping'
+        verbose_name_plural = 'Screenshots de Scraping'
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['session', 'created_at'],
+                         name='scraper_shot_session_time'),
+        ]
+
+    def __str__(self):
+        return self.path
+
 
 class Script(models.Model):
     user = models.ForeignKey(
@@ -91,11 +150,25 @@ class ScriptExecution(models.Model):
     logs = models.TextField(blank=True, help_text='Logs da execução')
     screenshot_url = models.URLField(
         blank=True, null=True, help_text='URL da screenshot gerada')
+    screenshot_variants = models.JSONField(
+        default=dict, blank=True, help_text='URLs das variantes da screenshot (WebP, JPEG, miniaturas)')
+    compacted = models.BooleanField(
+        default=False, help_text='Payload arquivado; a linha mantém apenas o resumo')
+    response_size = models.PositiveIntegerField(
+        null=True, blank=True, help_text='Tamanho em bytes de response_data antes da compactação')
+    logs_size = models.PositiveIntegerField(
+        null=True, blank=True, help_text='Tamanho em bytes dos logs antes da compactação')
+    archive_path = models.CharField(
+        max_length=500, blank=True, help_text='Arquivo compactado com o payload original')
 
     class Meta:
         verbose_name = 'Execução de Script'
         verbose_name_plural = 'Execuções de Scripts'
         ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['script', '-started_at'],
+                         name='scraper_exec_script_started'),
+        ]
 
     def __str__(self):
         return f'{self.script.name} - {self.status} ({self.started_at})'
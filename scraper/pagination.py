@@ -0,0 +1,30 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ExecutionCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    # id desempata execuções iniciadas no mesmo instante
+    ordering = ('-started_at', '-id')
+
+
+class ScrapingResultCursorPagination(CursorPagination):
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-scraped_at', '-id')
+
+
+class ScrapingUrlCursorPagination(CursorPagination):
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('position', 'id')
+
+
+class ScrapingScreenshotCursorPagination(CursorPagination):
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('created_at', 'id')
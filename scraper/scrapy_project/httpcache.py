@@ -0,0 +1,62 @@
+import hashlib
+import os
+
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+
+from scraper.utils.render_cache import RenderCache, make_render_key, make_splash_key
+
+
+class SplashRenderCacheStorage:
+    """
+    Storage do HttpCacheMiddleware que entende requisições Splash: a chave usa a URL
+    renderizada, o hash do lua_source e os argumentos do Splash, e não o corpo JSON
+    enviado ao endpoint. Os dados ficam no mesmo arquivo SQLite usado pelo editor Lua
+    (RENDER_CACHE_PATH), com a mesma chave (make_splash_key).
+    """
+
+    def __init__(self, settings):
+        self.path = settings.get('RENDER_CACHE_PATH') or os.path.join(
+            data_path(settings['HTTPCACHE_DIR'], createdir=True), 'render_cache.sqlite3')
+        self.expiration_secs = settings.getint('HTTPCACHE_EXPIRATION_SECS')
+        self.max_bytes = settings.getint('RENDER_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+        self.cache = None
+
+    def open_spider(self, spider):
+        self.cache = RenderCache(self.path, ttl=self.expiration_secs, max_bytes=self.max_bytes)
+        spider.logger.debug(f'Cache de renderizações em {self.path}')
+
+    def close_spider(self, spider):
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+    def request_key(self, request):
+        splash = request.meta.get('splash')
+        if splash:
+            return make_splash_key(
+                splash.get('endpoint', 'render.json'),
+                {'url': request.url, **splash.get('args', {})},
+            )
+
+        return make_render_key(request.url, '', {
+            'method': request.method,
+            'body': hashlib.sha256(request.body).hexdigest(),
+        })
+
+    def retrieve_response(self, spider, request):
+        entry = self.cache.get(self.request_key(request))
+        if entry is None:
+            return None
+
+        headers = Headers(entry['headers'])
+        respcls = responsetypes.from_args(headers=headers, url=request.url, body=entry['body'])
+        return respcls(url=request.url, headers=headers, status=entry['status'], body=entry['body'])
+
+    def store_response(self, spider, request, response):
+        headers = {
+            key.decode('latin1'): [value.decode('latin1') for value in values]
+            for key, values in response.headers.items()
+        }
+        self.cache.set(self.request_key(request), response.status, response.body, headers)
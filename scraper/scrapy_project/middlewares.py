@@ -0,0 +1,130 @@
+import time
+from urllib.parse import urljoin
+
+from scraper.services.splash_cluster import BACKPRESSURE_STATUSES, SplashCluster, is_failure_status
+
+
+class SplashClusterMiddleware:
+    """
+    Distribui as requisições Splash entre os nós de SPLASH_URLS,
+    escolhendo o nó saudável com menos requisições em andamento. Cada tentativa
+    (inclusive as repetidas pelo RetryMiddleware) escolhe o nó de novo.
+    """
+
+    def __init__(self, urls, options):
+        self.cluster = SplashCluster(urls, **options)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        urls = settings.getlist('SPLASH_URLS') or [settings.get('SPLASH_URL')]
+        middleware = cls(urls, settings.getdict('SPLASH_CLUSTER'))
+        middleware.cluster.start_health_checks()
+        return middleware
+
+    def process_request(self, request, spider):
+        if 'splash' not in request.meta or '_splash_node' in request.meta:
+            return None
+
+        node = self.cluster.pick()
+        if node is None:
+            spider.logger.warning('Nenhum nó Splash saudável, usando SPLASH_URL padrão')
+            return None
+
+        splash = request.meta['splash']
+        splash['splash_url'] = node.url
+        request.meta['_splash_node'] = node.url
+        request.meta['_splash_node_started'] = time.monotonic()
+
+        # Requisição repetida: o SplashMiddleware não a processa de novo, então a
+        # URL ainda aponta para o nó da tentativa anterior
+        if request.meta.get('_splash_processed'):
+            splash_url = urljoin(node.url, splash.get('endpoint', 'render.json'))
+            if request.url != splash_url:
+                return request.replace(url=splash_url)
+        return None
+
+    def _release(self, request, success):
+        node_url = request.meta.pop('_splash_node', None)
+        if node_url is None:
+            return
+
+        started = request.meta.pop('_splash_node_started', None)
+        latency = time.monotonic() - started if started else None
+        for node in self.cluster.nodes:
+            if node.url == node_url:
+                self.cluster.release(node, latency, success)
+                break
+
+    def process_response(self, request, response, spider):
+        # 429/503 são fila cheia (ver SplashBackpressureMiddleware), não falha do nó
+        self._release(request, not is_failure_status(response.status))
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self._release(request, False)
+        return None
+
+
+class SplashBackpressureMiddleware:
+    """
+    Quando o Splash responde 503/429 (fila de slots cheia), pausa o engine por um
+    intervalo crescente e reenfileira a requisição, em vez de contá-la como falha.
+    O intervalo volta ao mínimo na primeira resposta bem-sucedida.
+    """
+
+    BACKPRESSURE_STATUSES = BACKPRESSURE_STATUSES
+
+    def __init__(self, crawler, min_delay, max_delay, max_retries):
+        self.crawler = crawler
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.delay = min_delay
+        self.resume_call = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            crawler,
+            min_delay=settings.getfloat('SPLASH_BACKPRESSURE_MIN_DELAY', 1.0),
+            max_delay=settings.getfloat('SPLASH_BACKPRESSURE_MAX_DELAY', 30.0),
+            max_retries=settings.getint('SPLASH_BACKPRESSURE_MAX_RETRIES', 5),
+        )
+
+    def process_response(self, request, response, spider):
+        if 'splash' not in request.meta:
+            return response
+
+        if response.status not in self.BACKPRESSURE_STATUSES:
+            self.delay = self.min_delay
+            return response
+
+        retries = request.meta.get('splash_backpressure_retries', 0)
+        if retries >= self.max_retries:
+            spider.logger.warning(
+                f'Splash sobrecarregado, desistindo de {request.url} após {retries} tentativas')
+            return response
+
+        self.pause(spider)
+        self.crawler.stats.inc_value('splash/backpressure')
+
+        retry_request = request.replace(dont_filter=True)
+        retry_request.meta['splash_backpressure_retries'] = retries + 1
+        return retry_request
+
+    def pause(self, spider):
+        from twisted.internet import reactor
+
+        if self.resume_call is not None and self.resume_call.active():
+            return
+
+        spider.logger.info(f'Splash com fila cheia, pausando o crawl por {self.delay:.1f}s')
+        self.crawler.engine.pause()
+        self.resume_call = reactor.callLater(self.delay, self.resume)
+        self.delay = min(self.delay * 2, self.max_delay)
+
+    def resume(self):
+        self.resume_call = None
+        self.crawler.engine.unpause()
@@ -1,36 +1,58 @@
-import json
 import os
-from datetime import datetime
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from twisted.internet import defer, task, threads
 
 from scraper.utils.redis_cache import cache_progress
+from scraper.utils.result_stream import JsonLinesWriter, result_path
+
+
+def setup_django():
+    """Inicializa o Django quando o Scrapy roda fora de um processo Django."""
+    from django.conf import settings
+
+    if not settings.configured:
+        import django
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lua_web_scrapper.settings')
+        django.setup()
 
 
 class ScraperPipeline:
 
-    def __init__(self):
-        self.results_dir = 'media/scraping_results'
+    def __init__(self, results_dir='media/scraping_results', compression='none', fsync_every=100):
+        self.results_dir = results_dir
+        self.compression = compression
+        self.fsync_every = fsync_every
+        self.writers = {}
         os.makedirs(self.results_dir, exist_ok=True)
 
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            results_dir=crawler.settings.get('RESULTS_DIR', 'media/scraping_results'),
+            compression=crawler.settings.get('RESULTS_COMPRESSION', 'none'),
+            fsync_every=crawler.settings.getint('RESULTS_FSYNC_EVERY', 100),
+        )
+
+    def get_writer(self, session_id):
+        writer = self.writers.get(session_id)
+        if writer is None:
+            writer = JsonLinesWriter(
+                result_path(self.results_dir, session_id, self.compression),
+                compression=self.compression,
+                fsync_every=self.fsync_every,
+            )
+            self.writers[session_id] = writer
+        return writer
+
     def process_item(self, item, spider):
         try:
             if 'timestamp' not in item:
                 item['timestamp'] = datetime.now().timestamp()
 
             session_id = item.get('session_id', 'unknown')
-            result_file = os.path.join(self.results_dir, f"{session_id}_results.json")
-
-            existing_results = []
-            if os.path.exists(result_file):
-                try:
-                    with open(result_file, 'r') as f:
-                        existing_results = json.load(f)
-                except:
-                    existing_results = []
-
-            existing_results.append(dict(item))
-
-            with open(result_file, 'w') as f:
-                json.dump(existing_results, f, indent=2, ensure_ascii=False)
+            self.get_writer(session_id).write(dict(item))
 
             spider.logger.info(f"Item salvo: {item.get('url', 'N/A')}")
             cache_progress(session_id, {
@@ -47,3 +69,139 @@ class ScraperPipeline:
             spider.logger.error(f"Erro no pipeline: {e}")
 
         return item
+
+    def close_spider(self, spider):
+        for session_id, writer in self.writers.items():
+            try:
+                writer.close()
+                spider.logger.info(f"{writer.count} itens gravados em {writer.path}")
+            except Exception as e:
+                spider.logger.error(f"Erro ao fechar resultados da sessão {session_id}: {e}")
+        self.writers.clear()
+
+
+class DatabasePipeline:
+    """
+    Persiste os itens em ScrapingResult com bulk_create. Os itens ficam em buffer e são
+    gravados por tamanho (DB_BATCH_SIZE), por tempo (DB_FLUSH_INTERVAL) e no close_spider.
+    As gravações rodam no thread pool do Twisted, uma de cada vez e na ordem de chegada,
+    para não bloquear o reactor.
+    """
+
+    RESULT_FIELDS = ('url', 'title', 'screenshot_path', 'session_id', 'timestamp')
+
+    def __init__(self, batch_size=500, flush_interval=5.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.session_ids = {}
+        self.sessions_seen = set()
+        self.writes = defer.succeed(None)
+        self.flush_loop = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            batch_size=crawler.settings.getint('DB_BATCH_SIZE', 500),
+            flush_interval=crawler.settings.getfloat('DB_FLUSH_INTERVAL', 5.0),
+        )
+
+    def open_spider(self, spider):
+        setup_django()
+        self.spider = spider
+        self.flush_loop = task.LoopingCall(self.flush_if_due)
+        self.flush_loop.start(self.flush_interval, now=False)
+
+    def process_item(self, item, spider):
+        self.buffer.append(dict(item))
+        self.sessions_seen.add(item.get('session_id', 'unknown'))
+
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+        return item
+
+    def flush_if_due(self):
+        if self.buffer and time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        batch, self.buffer = self.buffer, []
+        self.last_flush = time.monotonic()
+        if not batch:
+            return self.writes
+
+        self.writes.addCallback(lambda _: threads.deferToThread(self.write_batch, batch))
+        self.writes.addErrback(self.log_failure, len(batch))
+        return self.writes
+
+    def log_failure(self, failure, count):
+        self.spider.logger.error(
+            f"Erro ao gravar {count} resultados no banco: {failure.getErrorMessage()}")
+
+    def get_session_id(self, session_id):
+        from scraper.models import ScrapingSession
+
+        if session_id not in self.session_ids:
+            session, _ = ScrapingSession.objects.get_or_create(session_id=session_id)
+            self.session_ids[session_id] = session.pk
+        return self.session_ids[session_id]
+
+    def build_result(self, item):
+        from django.utils import timezone
+        from scraper.models import ScrapingResult, url_digest
+
+        timestamp = item.get('timestamp')
+        scraped_at = (datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+                      if timestamp else timezone.now())
+
+        return ScrapingResult(
+            session_id=self.get_session_id(item.get('session_id', 'unknown')),
+            url=item.get('url') or '',
+            url_hash=url_digest(item.get('url')),
+            title=(item.get('title') or '')[:500],
+            screenshot_path=(item.get('screenshot_path') or '')[:500],
+            data={key: value for key, value in item.items() if key not in self.RESULT_FIELDS},
+            scraped_at=scraped_at,
+        )
+
+    def write_batch(self, batch):
+        from django.db import close_old_connections, transaction
+        from django.db.models import F
+        from scraper.models import ScrapingResult, ScrapingSession
+
+        close_old_connections()
+        results = [self.build_result(item) for item in batch]
+
+        counts = {}
+        for result in results:
+            counts[result.session_id] = counts.get(result.session_id, 0) + 1
+
+        with transaction.atomic():
+            ScrapingResult.objects.bulk_create(results, batch_size=self.batch_size)
+            for session_pk, count in counts.items():
+                ScrapingSession.objects.filter(pk=session_pk).update(
+                    items_count=F('items_count') + count)
+            ScrapingSession.objects.filter(
+                pk__in=counts, status='created').update(status='running')
+
+        return len(results)
+
+    def finish_sessions(self, _):
+        from django.db import connection
+        from scraper.models import ScrapingSession
+
+        ScrapingSession.objects.filter(
+            session_id__in=self.sessions_seen, status__in=['created', 'running']
+        ).update(status='completed')
+        connection.close()
+
+    def close_spider(self, spider):
+        if self.flush_loop and self.flush_loop.running:
+            self.flush_loop.stop()
+
+        self.flush()
+        self.writes.addCallback(lambda _: threads.deferToThread(self.finish_sessions, None))
+        self.writes.addErrback(self.log_failure, 0)
+        return self.writes
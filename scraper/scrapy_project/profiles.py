@@ -0,0 +1,110 @@
+"""
+Perfis de crawl (polite, balanced, bulk) escolhidos por crawl. O perfil vem, nesta
+ordem, do argumento `crawl_profile` do spider (`scrapy crawl <spider> -a crawl_profile=bulk`),
+do campo crawl_profile da ScrapingSession do argumento `session_id` e, por fim, da
+setting CRAWL_PROFILE (padrão do processo).
+A concorrência dos perfis maiores é derivada da capacidade dos nós Splash.
+Valores passados explicitamente (-s, custom_settings) continuam tendo precedência.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+CRAWL_PROFILES = {
+    # Praticamente serial: um pedido por domínio, com atraso
+    'polite': {
+        'CONCURRENCY_FACTOR': 0,
+        'CONCURRENT_REQUESTS': 2,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 1,
+        'DOWNLOAD_DELAY': 1.0,
+        'AUTOTHROTTLE_TARGET_CONCURRENCY': 1.0,
+        'AUTOTHROTTLE_START_DELAY': 1.0,
+        'AUTOTHROTTLE_MAX_DELAY': 30.0,
+    },
+    'balanced': {
+        'CONCURRENCY_FACTOR': 1,
+        'CONCURRENT_REQUESTS': 8,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 4,
+        'DOWNLOAD_DELAY': 0.25,
+        'AUTOTHROTTLE_TARGET_CONCURRENCY': 4.0,
+        'AUTOTHROTTLE_START_DELAY': 0.5,
+        'AUTOTHROTTLE_MAX_DELAY': 15.0,
+    },
+    # Usa toda a capacidade do Splash; o AutoThrottle e o back-pressure seguram o ritmo
+    'bulk': {
+        'CONCURRENCY_FACTOR': 2,
+        'CONCURRENT_REQUESTS': 16,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 8,
+        'DOWNLOAD_DELAY': 0,
+        'AUTOTHROTTLE_TARGET_CONCURRENCY': 8.0,
+        'AUTOTHROTTLE_START_DELAY': 0.1,
+        'AUTOTHROTTLE_MAX_DELAY': 10.0,
+    },
+}
+
+DEFAULT_CRAWL_PROFILE = 'balanced'
+
+
+def get_profile_settings(name: str, splash_capacity: int = 0) -> dict:
+    """
+    Settings do perfil. CONCURRENT_REQUESTS é o maior valor entre o do perfil e
+    a capacidade do Splash (nós × concorrência por nó) × CONCURRENCY_FACTOR.
+    """
+    if name not in CRAWL_PROFILES:
+        raise ValueError(
+            f'Perfil de crawl desconhecido: {name} (opções: {", ".join(CRAWL_PROFILES)})')
+
+    profile = dict(CRAWL_PROFILES[name])
+    factor = profile.pop('CONCURRENCY_FACTOR')
+    profile['CONCURRENT_REQUESTS'] = max(
+        profile['CONCURRENT_REQUESTS'], splash_capacity * factor)
+    profile['AUTOTHROTTLE_ENABLED'] = True
+    profile['RANDOMIZE_DOWNLOAD_DELAY'] = True
+    return profile
+
+
+def get_session_profile(session_id: str) -> str:
+    """Perfil gravado na sessão de scraping; vazio quando a sessão não define um."""
+    from scraper.models import ScrapingSession
+
+    return ScrapingSession.objects.filter(session_id=session_id).values_list(
+        'crawl_profile', flat=True).first() or ''
+
+
+class CrawlProfileAddon:
+    """
+    Aplica o perfil do crawl antes de as settings serem congeladas. O spider já foi
+    criado nesse ponto, então os argumentos dele (-a) estão disponíveis.
+    """
+
+    def __init__(self, crawler=None):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def resolve_profile(self, settings) -> str:
+        spider = getattr(self.crawler, 'spider', None)
+        name = getattr(spider, 'crawl_profile', None)
+
+        session_id = getattr(spider, 'session_id', None)
+        if not name and session_id:
+            try:
+                name = get_session_profile(session_id)
+            except Exception as e:
+                logger.warning(f'Perfil da sessão {session_id} indisponível: {e}')
+
+        return name or settings.get('CRAWL_PROFILE') or DEFAULT_CRAWL_PROFILE
+
+    def update_settings(self, settings):
+        name = self.resolve_profile(settings)
+        splash_urls = settings.getlist('SPLASH_URLS') or [settings.get('SPLASH_URL')]
+        per_node = settings.getdict('SPLASH_CLUSTER').get('MAX_CONCURRENCY_PER_NODE', 5)
+
+        logger.info(f'Perfil de crawl: {name}')
+        settings.setdict(
+            get_profile_settings(name, len(splash_urls) * int(per_node)),
+            priority='addon',
+        )
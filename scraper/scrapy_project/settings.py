@@ -1,19 +1,21 @@
+import os
+
+# Raiz do projeto (a mesma BASE_DIR do Django)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 BOT_NAME = 'interactive_scraper'
 
 SPIDER_MODULES = ['scraper.scrapy_project.spiders']
 NEWSPIDER_MODULE = 'scraper.scrapy_project.spiders'
-        
-# Splash configuration
-SPLASH_URL = 'http://localhost:8050'
-DOWNLOADER_MIDDLEWARES = {
-    'scrapy_splash.SplashCookiesMiddleware': 723,
-    'scrapy_splash.SplashMiddleware': 725,
-    'scrapy.downloadermiddlewares.httpcompression.HttpCompressionMiddleware': 810,
-}
 
-SPIDER_MIDDLEWARES = {
-    'scrapy_splash.SplashDeduplicateArgsMiddleware': 100,
+# Splash configuration
+SPLASH_URL = os.environ.get('SPLASH_URL', 'http://localhost:8050')
+SPLASH_URLS = os.environ.get('SPLASH_BACKENDS', SPLASH_URL).split(',')
+SPLASH_CLUSTER = {
+    'MAX_CONCURRENCY_PER_NODE': int(os.environ.get('SPLASH_MAX_CONCURRENCY_PER_NODE', 5)),
+    'HEALTH_CHECK_INTERVAL': 10,
+    'SLOW_THRESHOLD': 60,
+    'EJECTION_TIME': 30,
 }
 
 DUPEFILTER_CLASS = 'scrapy_splash.SplashAwareDupeFilter'
@@ -24,16 +26,33 @@ ROBOTSTXT_OBEY = False
 # Configure pipelines
 ITEM_PIPELINES = {
     'scraper.scrapy_project.pipelines.ScraperPipeline': 300,
+    'scraper.scrapy_project.pipelines.DatabasePipeline': 400,
 }
 
-DOWNLOAD_DELAY = 1
-RANDOMIZE_DOWNLOAD_DELAY = True
+# Gravação em lote no banco (ScrapingResult)
+DB_BATCH_SIZE = 500
+DB_FLUSH_INTERVAL = 5.0
+
+# Resultados em JSON Lines: compressão 'none', 'gzip' ou 'zstd' (requer zstandard)
+RESULTS_DIR = 'media/scraping_results'
+RESULTS_COMPRESSION = os.environ.get('RESULTS_COMPRESSION', 'none')
+RESULTS_FSYNC_EVERY = 100
+
+# Perfil de crawl (polite, balanced, bulk): define concorrência, atrasos e AutoThrottle.
+# CRAWL_PROFILE é só o padrão do processo: o perfil da sessão (ScrapingSession.crawl_profile)
+# ou o argumento -a crawl_profile do spider têm precedência. Ver scraper/scrapy_project/profiles.py.
+ADDONS = {
+    'scraper.scrapy_project.profiles.CrawlProfileAddon': 0,
+}
+CRAWL_PROFILE = os.environ.get('CRAWL_PROFILE', 'balanced')
 
-# Configure maximum concurrent requests performed by Scrapy (default: 16)
-CONCURRENT_REQUESTS = 1
+# AutoThrottle: a latência medida inclui a renderização no Splash
+AUTOTHROTTLE_DEBUG = False
 
-# Configure concurrent requests per domain
-CONCURRENT_REQUESTS_PER_DOMAIN = 1
+# Back-pressure quando o Splash responde 503/429 (fila de slots cheia)
+SPLASH_BACKPRESSURE_MIN_DELAY = 1.0
+SPLASH_BACKPRESSURE_MAX_DELAY = 30.0
+SPLASH_BACKPRESSURE_MAX_RETRIES = 5
 
 # Disable cookies (enabled by default)
 COOKIES_ENABLED = True
@@ -58,6 +77,8 @@ SPIDER_MIDDLEWARES = {
 
 # Enable or disable downloader middlewares
 DOWNLOADER_MIDDLEWARES = {
+    'scraper.scrapy_project.middlewares.SplashBackpressureMiddleware': 719,
+    'scraper.scrapy_project.middlewares.SplashClusterMiddleware': 720,
     'scrapy_splash.SplashCookiesMiddleware': 723,
     'scrapy_splash.SplashMiddleware': 725,
     'scrapy.downloadermiddlewares.httpcompression.HttpCompressionMiddleware': 810,
@@ -72,8 +93,15 @@ EXTENSIONS = {
 LOG_LEVEL = 'INFO'
 LOG_FORMAT = '%(levelname)s: %(message)s'
 
-# Cache settings
-HTTPCACHE_ENABLED = False
+# Cache de renderizações do Splash: o mesmo arquivo SQLite e as mesmas variáveis do
+# RENDER_CACHE do Django (lua_web_scrapper/settings.py)
+HTTPCACHE_ENABLED = os.environ.get('RENDER_CACHE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+HTTPCACHE_STORAGE = 'scraper.scrapy_project.httpcache.SplashRenderCacheStorage'
+HTTPCACHE_EXPIRATION_SECS = int(os.environ.get('RENDER_CACHE_TTL', 86400))
+HTTPCACHE_IGNORE_HTTP_CODES = [429, 500, 502, 503, 504]
+RENDER_CACHE_PATH = os.environ.get(
+    'RENDER_CACHE_PATH', os.path.join(BASE_DIR, 'cache', 'render_cache.sqlite3'))
+RENDER_CACHE_MAX_BYTES = int(os.environ.get('RENDER_CACHE_MAX_BYTES', 512 * 1024 * 1024))
 
 # Splash specific settings
 SPLASH_COOKIES_DEBUG = False
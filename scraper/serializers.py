@@ -1,5 +1,13 @@
 from rest_framework import serializers
-from .models import Script, ScriptExecution
+from .models import (
+    Script,
+    ScriptExecution,
+    ScrapingSession,
+    ScrapingUrl,
+    ScrapingResult,
+    ScrapingScreenshot,
+)
+from .services.script_validator import validate_script, format_violation
 
 
 class ScriptSerializer(serializers.ModelSerializer):
@@ -24,6 +32,26 @@ class ScriptSerializer(serializers.ModelSerializer):
 
         return value
 
+    def validate_code(self, value):
+        violations = validate_script(value)
+        if violations:
+            raise serializers.ValidationError(
+                [format_violation(violation) for violation in violations])
+
+        return value
+
+
+class DynamicFieldsMixin:
+    """Permite restringir os campos serializados com o argumento `fields`."""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
 
 class ScriptExecutionSerializer(serializers.ModelSerializer):
     script_name = serializers.CharField(source='script.name', read_only=True)
@@ -32,16 +60,75 @@ class ScriptExecutionSerializer(serializers.ModelSerializer):
         model = ScriptExecution
         fields = [
             'id', 'script', 'script_name', 'status', 'started_at', 'finished_at',
-            'request_args', 'response_data', 'logs', 'screenshot_url', 'duration'
+            'request_args', 'response_data', 'logs', 'screenshot_url',
+            'screenshot_variants', 'compacted', 'response_size', 'logs_size',
+            'duration'
         ]
         read_only_fields = [
-            'id', 'script', 'script_name', 'started_at', 'finished_at', 'duration'
+            'id', 'script', 'script_name', 'started_at', 'finished_at',
+            'screenshot_variants', 'compacted', 'response_size', 'logs_size',
+            'duration'
+        ]
+
+
+class ScriptExecutionSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Representação leve para listagens, sem response_data e logs."""
+    script_name = serializers.CharField(source='script.name', read_only=True)
+
+    class Meta:
+        model = ScriptExecution
+        fields = [
+            'id', 'script', 'script_name', 'status', 'started_at', 'finished_at',
+            'request_args', 'screenshot_url', 'screenshot_variants', 'compacted',
+            'duration'
         ]
+        read_only_fields = fields
+
+
+class ScriptExecutionPayloadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ScriptExecution
+        fields = ['id', 'response_data', 'logs', 'compacted']
+        read_only_fields = fields
+
+
+class ScrapingSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ScrapingSession
+        fields = ['session_id', 'created_at', 'status', 'items_count', 'crawl_profile']
+        read_only_fields = fields
+
+
+class ScrapingUrlSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ScrapingUrl
+        fields = ['id', 'url', 'position', 'created_at']
+        read_only_fields = fields
+
+
+class ScrapingResultSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ScrapingResult
+        fields = ['id', 'url', 'title', 'screenshot_path', 'data', 'scraped_at']
+        read_only_fields = fields
+
+
+class ScrapingScreenshotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ScrapingScreenshot
+        fields = ['id', 'path', 'created_at']
+        read_only_fields = fields
 
 
 class SubscribeInputSerializer(serializers.Serializer):
-    action = serializers.ChoiceField(choices=['subscribe'], required=True)
+    action = serializers.ChoiceField(
+        choices=['subscribe', 'fetch_result', 'ping', 'pong'], required=True)
     session_id = serializers.CharField(required=False, allow_null=True)
+    batch_id = serializers.CharField(required=False, allow_null=True)
+    firehose = serializers.BooleanField(required=False, default=False)
+    result_id = serializers.CharField(required=False, allow_null=True)
+    compression = serializers.ChoiceField(
+        choices=['none', 'gzip'], required=False, default='none')
 
 
 class SubscribedOutputSerializer(serializers.Serializer):
@@ -68,6 +155,23 @@ class LuaExecutionProgressOutputSerializer(serializers.Serializer):
     timestamp = serializers.FloatField(required=False, allow_null=True)
 
 
+class LuaExecutionStepOutputSerializer(serializers.Serializer):
+    step_index = serializers.IntegerField(required=False, allow_null=True)
+    step_title = serializers.CharField(required=False, allow_null=True)
+    status = serializers.ChoiceField(
+        choices=['pending', 'running', 'success', 'error'],
+        default='running'
+    )
+    log = serializers.CharField(required=False, allow_null=True)
+
+
+class LuaExecutionStepsOutputSerializer(serializers.Serializer):
+    type = serializers.CharField(default='lua_execution_steps')
+    session_id = serializers.CharField()
+    steps = LuaExecutionStepOutputSerializer(many=True)
+    timestamp = serializers.FloatField(required=False, allow_null=True)
+
+
 class LuaExecutionCompletedOutputSerializer(serializers.Serializer):
     type = serializers.CharField(default='lua_execution_completed')
     session_id = serializers.CharField()
@@ -83,3 +187,47 @@ class LuaExecutionErrorOutputSerializer(serializers.Serializer):
     error = serializers.CharField(required=False, allow_null=True)
     details = serializers.CharField(required=False, allow_null=True)
     timestamp = serializers.FloatField(required=False, allow_null=True)
+
+
+class LuaExecutionSummaryOutputSerializer(serializers.Serializer):
+    type = serializers.CharField(default='lua_execution_summary')
+    event = serializers.CharField()
+    session_id = serializers.CharField()
+    user_id = serializers.IntegerField(required=False, allow_null=True)
+    steps = serializers.IntegerField(required=False, allow_null=True)
+    status = serializers.CharField(required=False, allow_null=True)
+    success = serializers.BooleanField(required=False, allow_null=True)
+    error = serializers.CharField(required=False, allow_null=True)
+    timestamp = serializers.FloatField(required=False, allow_null=True)
+
+
+class LuaResultChunkOutputSerializer(serializers.Serializer):
+    type = serializers.CharField(default='lua_result_chunk')
+    result_id = serializers.CharField()
+    seq = serializers.IntegerField()
+    total = serializers.IntegerField()
+    size = serializers.IntegerField()
+    encoding = serializers.ChoiceField(choices=['none', 'gzip'])
+    data = serializers.CharField(help_text='Bloco em base64; concatenar os bytes decodificados na ordem de seq')
+    final = serializers.BooleanField()
+
+
+class PingOutputSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=['ping', 'pong'], default='ping')
+    timestamp = serializers.FloatField()
+
+
+class BackpressureOutputSerializer(serializers.Serializer):
+    type = serializers.CharField(default='backpressure')
+    dropped = serializers.IntegerField(help_text='Mensagens descartadas; refaça a inscrição para o replay')
+    timestamp = serializers.FloatField()
+
+
+class LuaBatchProgressOutputSerializer(serializers.Serializer):
+    type = serializers.CharField(default='lua_batch_progress')
+    batch_id = serializers.CharField()
+    total = serializers.IntegerField()
+    completed = serializers.IntegerField()
+    succeeded = serializers.IntegerField()
+    failed = serializers.IntegerField()
+    timestamp = serializers.FloatField(required=False, allow_null=True)
@@ -0,0 +1,168 @@
+"""
+Execução assíncrona de scripts Lua via Splash.
+Permite que um único processo mantenha várias renderizações em andamento no Splash,
+usando httpx e envio nativo (await) para o channel layer.
+"""
+
+import asyncio
+import httpx
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+
+from .splash_client import get_async_splash_client
+from .splash_cluster import get_splash_cluster, SplashUnavailableError
+from .execution_scheduler import release_execution, renew_execution
+from .event_publisher import publish_events_async
+from ..utils.execution_results import share_result
+from ..utils.result_cache import set_cached_result
+from ..utils.batch_progress import record_batch_result
+from ..utils.single_flight import get_followers, finish_flight
+from .lua_executor import (
+    build_splash_payload,
+    build_execution_result,
+    build_error_result,
+    build_event,
+    build_batch_event,
+    build_start_events,
+    build_finish_events,
+    get_render_cache,
+    render_cache_key,
+    start_execution,
+    finish_execution,
+    fail_execution,
+    with_execution,
+    start_followers,
+    finish_followers,
+)
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def execute_lua_script_async(lua_script: str, args: dict) -> dict:
+    try:
+        logger.info(f'Executando script Lua (async) com args: {args}')
+
+        splash_payload = build_splash_payload(lua_script, args)
+
+        render_cache = get_render_cache()
+        if render_cache is not None:
+            cache_key = render_cache_key(splash_payload)
+            cached = await asyncio.to_thread(render_cache.get, cache_key)
+            if cached is not None:
+                logger.debug(f'Renderização encontrada no cache: {cache_key}')
+                return await asyncio.to_thread(
+                    build_execution_result, cached['status'], cached['body'].decode('utf-8'), args)
+
+        client = get_async_splash_client()
+
+        async with get_splash_cluster().lease_async() as lease:
+            logger.debug(f'Nó Splash selecionado: {lease.node.url}')
+            response = await client.post(lease.node.execute_url, json=splash_payload)
+            lease.report_status(response.status_code)
+
+        if render_cache is not None and response.status_code == 200:
+            await asyncio.to_thread(
+                render_cache.set, cache_key, response.status_code, response.content)
+
+        # Decodificar o JSON e salvar a screenshot fora do event loop
+        return await asyncio.to_thread(
+            build_execution_result, response.status_code, response.text, args)
+
+    except SplashUnavailableError as e:
+        return build_error_result(f'Splash indisponível: {str(e)}')
+
+    except httpx.HTTPError as e:
+        return build_error_result(f'Erro de conexão com Splash: {str(e)}')
+
+    except Exception as e:
+        return build_error_result(f'Erro interno na execução Lua: {str(e)}')
+
+
+async def publish_batch_progress_async(channel_layer, batch_id: str, success: bool):
+    progress = await asyncio.to_thread(record_batch_result, batch_id, success)
+    if progress is None:
+        return
+
+    await channel_layer.group_send(
+        f"notifications_batch_{batch_id}",
+        build_batch_event(batch_id, progress)
+    )
+
+
+async def run_lua_script_job_async(session_id: str, lua_script: str, args: dict, steps: list = None, execution_id: int = None, cache_key: str = None, batch_id: str = None, flight_key: str = None, user_id: int = None, lease_id: str = None):
+    channel_layer = get_channel_layer()
+    steps = steps or []
+    execution = None
+    followers_started = set()
+
+    if lease_id:
+        await asyncio.to_thread(renew_execution, lease_id)
+
+    try:
+        logger.info(f'Iniciando job Lua (async) para sessão {session_id}')
+
+        if execution_id:
+            execution = await sync_to_async(start_execution)(execution_id, session_id)
+
+        await publish_events_async(
+            channel_layer, build_start_events(session_id, steps), user_id=user_id)
+
+        if flight_key:
+            followers = await asyncio.to_thread(get_followers, flight_key, session_id)
+            await sync_to_async(start_followers)(channel_layer, followers, followers_started)
+
+        result = await execute_lua_script_async(lua_script, args)
+
+        if result.get('script_executed'):
+            logger.info(
+                f'Script Lua executado com sucesso para sessão {session_id}')
+            if cache_key:
+                await asyncio.to_thread(set_cached_result, cache_key, result)
+        else:
+            logger.error(
+                f'Erro na execução Lua para sessão {session_id}: {result.get("error", "Erro desconhecido")}')
+
+        if execution:
+            await sync_to_async(finish_execution)(execution, result)
+
+        event_result = result
+        if result.get('script_executed'):
+            event_result = await asyncio.to_thread(share_result, session_id, result, user_id)
+        await publish_events_async(channel_layer, build_finish_events(
+            session_id, steps, with_execution(event_result, execution_id)), user_id=user_id)
+
+        if flight_key:
+            followers = await asyncio.to_thread(finish_flight, flight_key, session_id)
+            await sync_to_async(finish_followers)(
+                channel_layer, followers, followers_started, result, event_result)
+
+        if batch_id:
+            await publish_batch_progress_async(
+                channel_layer, batch_id, bool(result.get('script_executed')))
+
+    except Exception as e:
+        error_msg = f'Erro interno no job Lua: {str(e)}'
+        logger.error(f'{error_msg} para sessão {session_id}')
+
+        if execution:
+            await sync_to_async(fail_execution)(execution, error_msg)
+
+        await publish_events_async(channel_layer, [build_event(
+            session_id,
+            "lua_execution_error",
+            error=error_msg
+        )], user_id=user_id)
+
+        if flight_key:
+            followers = await asyncio.to_thread(finish_flight, flight_key, session_id)
+            await sync_to_async(finish_followers)(
+                channel_layer, followers, followers_started, build_error_result(error_msg))
+
+        if batch_id:
+            await publish_batch_progress_async(channel_layer, batch_id, False)
+
+    finally:
+        if lease_id:
+            await asyncio.to_thread(release_execution, lease_id)
@@ -0,0 +1,178 @@
+"""
+Publicação de eventos de execução Lua no channel layer.
+Cada evento vai para o grupo da sessão e, quando conhecido, para o grupo do usuário.
+O grupo global (notifications_lua, restrito a administradores) recebe apenas resumos,
+de todas as sessões, de uma amostra por sessão ou de nenhuma.
+Atualizações de passos consecutivas da mesma sessão viram uma única mensagem
+`lua_execution_steps`; cada publicação grava os eventos no buffer com um único
+pipeline Redis e envia para todos os grupos de uma vez.
+"""
+
+import asyncio
+import hashlib
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+
+from ..utils.event_buffer import append_events
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVENT_SETTINGS = {
+    # all | sampled | off
+    'GLOBAL_BROADCAST': 'all',
+    'GLOBAL_SAMPLE_RATE': 0.1,
+    'GLOBAL_GROUP': 'notifications_lua',
+}
+
+STEP_EVENT_TYPE = 'lua_execution_progress'
+STEPS_EVENT_TYPE = 'lua_execution_steps'
+SUMMARY_EVENT_TYPE = 'lua_execution_summary'
+STEP_FIELDS = ('step_index', 'step_title', 'status', 'log')
+
+
+def get_event_settings() -> dict:
+    return {
+        **DEFAULT_EVENT_SETTINGS,
+        **getattr(settings, 'LUA_EVENTS', {}),
+    }
+
+
+def should_broadcast(session_id: str) -> bool:
+    """
+    Decide se os eventos da sessão vão para o grupo global. A amostragem é feita
+    por sessão (hash do session_id), para que uma sessão amostrada chegue completa.
+    """
+    event_settings = get_event_settings()
+    mode = event_settings['GLOBAL_BROADCAST']
+
+    if mode == 'off':
+        return False
+    if mode == 'sampled':
+        digest = hashlib.sha1(session_id.encode('utf-8')).digest()
+        return int.from_bytes(digest[:4], 'big') / 0xFFFFFFFF < event_settings['GLOBAL_SAMPLE_RATE']
+    return True
+
+
+def session_group(session_id: str) -> str:
+    return f"notifications_session_{session_id}"
+
+
+def user_group(user_id) -> str:
+    return f"notifications_user_{user_id}"
+
+
+def get_event_groups(session_id: str, user_id=None) -> list:
+    """Grupos que recebem o evento completo. O grupo global recebe só o resumo."""
+    groups = [session_group(session_id)]
+    if user_id:
+        groups.append(user_group(user_id))
+    return groups
+
+
+def with_user(events: list, user_id=None) -> list:
+    """Associa os eventos ao usuário dono da sessão, para o envio ao grupo do usuário."""
+    if user_id:
+        for event in events:
+            event.setdefault('user_id', user_id)
+    return events
+
+
+def summarize_event(event: dict) -> dict:
+    """Versão resumida do evento para o grupo global: sem resultado nem logs."""
+    summary = {
+        'type': SUMMARY_EVENT_TYPE,
+        'event': event['type'],
+        'session_id': event['session_id'],
+        'user_id': event.get('user_id'),
+        'timestamp': event.get('timestamp'),
+    }
+
+    if event['type'] == STEPS_EVENT_TYPE:
+        summary['steps'] = len(event.get('steps', []))
+        summary['status'] = event['steps'][-1].get('status') if event.get('steps') else None
+    elif event['type'] == STEP_EVENT_TYPE:
+        summary['steps'] = 1
+        summary['status'] = event.get('status')
+    elif 'success' in event:
+        summary['success'] = event['success']
+    elif event.get('error'):
+        summary['error'] = str(event['error'])[:200]
+
+    return summary
+
+
+def coalesce_events(events: list) -> list:
+    """Junta eventos de passo consecutivos da mesma sessão em um `lua_execution_steps`."""
+    coalesced = []
+
+    for event in events:
+        if event.get('type') != STEP_EVENT_TYPE:
+            coalesced.append(event)
+            continue
+
+        step = {field: event.get(field) for field in STEP_FIELDS}
+        last = coalesced[-1] if coalesced else None
+
+        if last is not None and last.get('session_id') == event['session_id']:
+            if last['type'] == STEPS_EVENT_TYPE:
+                last['steps'].append(step)
+                last['timestamp'] = event['timestamp']
+                continue
+            if last['type'] == STEP_EVENT_TYPE:
+                coalesced[-1] = {
+                    'type': STEPS_EVENT_TYPE,
+                    'session_id': event['session_id'],
+                    'timestamp': event['timestamp'],
+                    'steps': [{field: last.get(field) for field in STEP_FIELDS}, step],
+                }
+                if event.get('user_id'):
+                    coalesced[-1]['user_id'] = event['user_id']
+                continue
+
+        coalesced.append(event)
+
+    return coalesced
+
+
+async def publish_events_async(channel_layer, events: list, user_id=None) -> list:
+    """
+    Registra os eventos no buffer das sessões (para replay) e os envia aos grupos.
+    Grupos diferentes recebem em paralelo; dentro de um grupo a ordem é mantida.
+    """
+    events = coalesce_events(with_user(events, user_id))
+    if not events:
+        return events
+
+    event_ids = await asyncio.to_thread(append_events, events)
+    global_group = get_event_settings()['GLOBAL_GROUP']
+
+    groups = {}
+    broadcast = {}
+    for event, event_id in zip(events, event_ids):
+        event['event_id'] = event_id
+
+        for group in get_event_groups(event['session_id'], event.get('user_id')):
+            groups.setdefault(group, []).append(event)
+
+        session_id = event['session_id']
+        if session_id not in broadcast:
+            broadcast[session_id] = should_broadcast(session_id)
+        if broadcast[session_id]:
+            groups.setdefault(global_group, []).append(summarize_event(event))
+
+    async def send_to_group(group: str, group_events: list):
+        for event in group_events:
+            await channel_layer.group_send(group, event)
+
+    await asyncio.gather(*[
+        send_to_group(group, group_events)
+        for group, group_events in groups.items()
+    ])
+    return events
+
+
+def publish_events(channel_layer, events: list, user_id=None) -> list:
+    return async_to_sync(publish_events_async)(channel_layer, events, user_id)
@@ -0,0 +1,221 @@
+"""
+Retenção de execuções de scripts.
+Mantém as últimas N execuções completas por script; as mais antigas têm o payload
+(response_data e logs) arquivado em JSON Lines compactado e viram linhas de resumo.
+O diretório de arquivo precisa ser persistente (volume próprio em produção): fora do
+DEBUG a compactação não roda sem EXECUTION_RETENTION['ARCHIVE_DIR'] configurado.
+O payload arquivado continua disponível por `load_archived_payload`.
+"""
+
+import os
+import gzip
+import json
+import time
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_SETTINGS = {
+    'KEEP_FULL': 50,
+    'BATCH_SIZE': 500,
+    'ARCHIVE_DIR': None,
+    'QUEUE': 'default',
+    'INTERVAL': 3600,
+}
+
+RETENTION_JOB_PREFIX = 'compact_script_executions'
+
+# Execuções ainda em andamento não são compactadas: finish_execution gravaria o payload depois
+FINISHED_STATUSES = ('success', 'error')
+
+
+class ArchiveNotConfigured(Exception):
+    pass
+
+
+def get_retention_settings() -> dict:
+    retention_settings = {
+        **DEFAULT_RETENTION_SETTINGS,
+        **getattr(settings, 'EXECUTION_RETENTION', {}),
+    }
+    if not retention_settings['ARCHIVE_DIR'] and settings.DEBUG:
+        retention_settings['ARCHIVE_DIR'] = os.path.join(
+            settings.BASE_DIR, 'archive', 'executions')
+    return retention_settings
+
+
+def get_archive_dir() -> str:
+    archive_dir = get_retention_settings()['ARCHIVE_DIR']
+    if not archive_dir:
+        raise ArchiveNotConfigured(
+            'EXECUTION_ARCHIVE_DIR não configurado: defina um diretório persistente para o arquivo')
+    return archive_dir
+
+
+def _payload_size(value) -> int:
+    if value is None:
+        return 0
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'))
+
+
+def _write_archive(script_id: int, executions: list, archive_dir: str) -> str:
+    script_dir = os.path.join(archive_dir, str(script_id))
+    os.makedirs(script_dir, exist_ok=True)
+
+    archive_path = os.path.join(
+        script_dir, f'{executions[-1].id}-{executions[0].id}.jsonl.gz')
+    with gzip.open(archive_path, 'wt', encoding='utf-8') as f:
+        for execution in executions:
+            f.write(json.dumps({
+                'id': execution.id,
+                'script_id': script_id,
+                'status': execution.status,
+                'started_at': execution.started_at,
+                'finished_at': execution.finished_at,
+                'request_args': execution.request_args,
+                'response_data': execution.response_data,
+                'logs': execution.logs,
+            }, ensure_ascii=False, default=str))
+            f.write('\n')
+
+    return archive_path
+
+
+def _verify_archive(archive_path: str, executions: list):
+    """Relê o arquivo antes de apagar o payload do banco."""
+    with gzip.open(archive_path, 'rt', encoding='utf-8') as f:
+        archived_ids = {json.loads(line)['id'] for line in f}
+    missing = {execution.id for execution in executions} - archived_ids
+    if missing:
+        raise IOError(f'Arquivo {archive_path} incompleto: faltam {len(missing)} execuções')
+
+
+def load_archived_payload(execution) -> Optional[dict]:
+    """response_data e logs de uma execução compactada, lidos do arquivo."""
+    if not execution.archive_path:
+        return None
+
+    try:
+        with gzip.open(execution.archive_path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry['id'] == execution.id:
+                    return {'response_data': entry['response_data'], 'logs': entry['logs']}
+    except (OSError, ValueError) as exc:
+        logger.error(f'Falha ao ler arquivo da execução {execution.id}: {exc}')
+
+    return None
+
+
+def compact_script(script_id: int, keep: int, batch_size: int, archive_dir: str,
+                   dry_run: bool = False) -> int:
+    from ..models import ScriptExecution
+
+    executions = ScriptExecution.objects.filter(script_id=script_id)
+
+    # Execução mais antiga entre as `keep` mais recentes; tudo antes dela é compactado
+    boundary = executions.order_by('-started_at', '-id').values_list(
+        'started_at', 'id')[keep - 1:keep].first() if keep > 0 else None
+    candidates = executions.filter(compacted=False, status__in=FINISHED_STATUSES)
+    if boundary:
+        boundary_started, boundary_id = boundary
+        candidates = candidates.filter(
+            Q(started_at__lt=boundary_started) |
+            Q(started_at=boundary_started, id__lt=boundary_id))
+    elif keep > 0:
+        return 0
+
+    if dry_run:
+        return candidates.count()
+
+    compacted = 0
+    while True:
+        batch = list(candidates.order_by('-started_at', '-id').only(
+            'id', 'status', 'started_at', 'finished_at',
+            'request_args', 'response_data', 'logs')[:batch_size])
+        if not batch:
+            break
+
+        archive_path = _write_archive(script_id, batch, archive_dir)
+        _verify_archive(archive_path, batch)
+
+        for execution in batch:
+            execution.response_size = _payload_size(execution.response_data)
+            execution.logs_size = len((execution.logs or '').encode('utf-8'))
+            execution.response_data = None
+            execution.logs = ''
+            execution.compacted = True
+            execution.archive_path = archive_path
+
+        with transaction.atomic():
+            ScriptExecution.objects.bulk_update(batch, [
+                'response_data', 'logs', 'compacted',
+                'response_size', 'logs_size', 'archive_path',
+            ])
+
+        compacted += len(batch)
+
+    return compacted
+
+
+def compact_executions(keep: int = None, batch_size: int = None, dry_run: bool = False) -> dict:
+    from ..models import Script
+
+    retention_settings = get_retention_settings()
+    keep = retention_settings['KEEP_FULL'] if keep is None else keep
+    batch_size = batch_size or retention_settings['BATCH_SIZE']
+    archive_dir = None if dry_run else get_archive_dir()
+
+    script_ids = Script.objects.annotate(
+        pending=Count('executions', filter=Q(executions__compacted=False))
+    ).filter(pending__gt=keep).values_list('id', flat=True)
+
+    totals = {'scripts': 0, 'executions': 0}
+    for script_id in script_ids.iterator():
+        compacted = compact_script(
+            script_id, keep, batch_size, archive_dir, dry_run)
+        if compacted:
+            totals['scripts'] += 1
+            totals['executions'] += compacted
+            logger.info(f'{compacted} execuções compactadas do script {script_id}')
+
+    return totals
+
+
+def compact_executions_job(reschedule: bool = True):
+    """Job RQ periódico: compacta e se reagenda após EXECUTION_RETENTION['INTERVAL']."""
+    try:
+        totals = compact_executions()
+        logger.info(f'Retenção de execuções concluída: {totals}')
+    except ArchiveNotConfigured as exc:
+        logger.error(f'Retenção de execuções não executada: {exc}')
+    finally:
+        if reschedule:
+            schedule_compaction()
+
+
+def schedule_compaction(delay: int = None):
+    """
+    Agenda a próxima compactação (requer worker com --with-scheduler).
+    Não agenda se já houver uma compactação pendente, evitando cadeias duplicadas.
+    """
+    import django_rq
+
+    retention_settings = get_retention_settings()
+    delay = retention_settings['INTERVAL'] if delay is None else delay
+
+    queue = django_rq.get_queue(retention_settings['QUEUE'])
+    scheduled_ids = queue.scheduled_job_registry.get_job_ids()
+    if any(job_id.startswith(RETENTION_JOB_PREFIX) for job_id in scheduled_ids):
+        return None
+
+    return queue.enqueue_in(
+        timedelta(seconds=delay), compact_executions_job,
+        job_id=f'{RETENTION_JOB_PREFIX}-{int(time.time())}')
@@ -0,0 +1,398 @@
+"""
+Escalonador de execuções Lua na frente da fila lua_execution.
+As submissões ficam pendentes no Redis, por usuário e por faixa de prioridade, e só
+são enviadas ao RQ quando há vaga: limite global derivado da capacidade do Splash,
+limite por usuário e revezamento ponderado entre usuários (stride scheduling).
+A faixa interativa (editor) é despachada antes da faixa bulk (lotes) e tem vagas
+reservadas, de modo que um lote grande não atrasa execuções do editor.
+"""
+
+import json
+import time
+import uuid
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+
+from ..utils.client_ip import get_request_ip
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+LANE_INTERACTIVE = 'interactive'
+LANE_BULK = 'bulk'
+
+# Ordem de despacho: prioridade estrita
+LANES = (LANE_INTERACTIVE, LANE_BULK)
+
+DEFAULT_SCHEDULER_SETTINGS = {
+    'ENABLED': True,
+    'QUEUE': 'lua_execution',
+    'KEY_PREFIX': 'lua_sched',
+    # None = número de nós Splash × MAX_CONCURRENCY_PER_NODE
+    'GLOBAL_LIMIT': None,
+    # Vagas do limite global que a faixa bulk não pode ocupar
+    'INTERACTIVE_RESERVED': 2,
+    'USER_LIMITS': {LANE_INTERACTIVE: 2, LANE_BULK: 5},
+    'DEFAULT_WEIGHT': 1,
+    'WEIGHTS': {},
+    'JOB_TIMEOUT': 300,
+    # Vagas de jobs que não liberaram (worker morto) são recuperadas após este tempo,
+    # contado do início do job; deve ser maior que JOB_TIMEOUT
+    'LEASE_TIMEOUT': 360,
+    'TICK_INTERVAL': 30,
+    'SCAN_LIMIT': 100,
+}
+
+TICK_JOB_ID = 'lua_scheduler_tick'
+# Repetições por agendamento (~35 dias com o intervalo padrão); o entrypoint do worker
+# reagenda a cada início
+TICK_REPEATS = 100000
+ACTIVE_TICK_STATUSES = ('queued', 'deferred', 'scheduled', 'started')
+
+SUBMIT_CHUNK_SIZE = 500
+
+
+def get_scheduler_settings() -> dict:
+    return {
+        **DEFAULT_SCHEDULER_SETTINGS,
+        **getattr(settings, 'LUA_SCHEDULER', {}),
+    }
+
+
+def get_global_limit(scheduler_settings: Optional[dict] = None) -> int:
+    scheduler_settings = scheduler_settings or get_scheduler_settings()
+    if scheduler_settings['GLOBAL_LIMIT']:
+        return scheduler_settings['GLOBAL_LIMIT']
+
+    from .splash_cluster import DEFAULT_CLUSTER_SETTINGS
+
+    per_node = getattr(settings, 'SPLASH_CLUSTER', {}).get(
+        'MAX_CONCURRENCY_PER_NODE', DEFAULT_CLUSTER_SETTINGS['MAX_CONCURRENCY_PER_NODE'])
+    return max(1, len(settings.SPLASH_BACKENDS) * per_node)
+
+
+def get_owner(request) -> str:
+    """Identifica o dono da submissão: usuário autenticado ou IP do cliente."""
+    if request.user.is_authenticated:
+        return f'user:{request.user.id}'
+
+    return f"anon:{get_request_ip(request) or 'unknown'}"
+
+
+def _get_connection():
+    import django_rq
+    return django_rq.get_connection(get_scheduler_settings()['QUEUE'])
+
+
+def _get_queue():
+    import django_rq
+    scheduler_settings = get_scheduler_settings()
+    return django_rq.get_queue(
+        scheduler_settings['QUEUE'], default_timeout=scheduler_settings['JOB_TIMEOUT'])
+
+
+def _key(*parts) -> str:
+    return ':'.join((get_scheduler_settings()['KEY_PREFIX'],) + parts)
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _enqueue_job(queue, job_id: str, args: list, lease_id: Optional[str] = None,
+                 at_front: bool = False, pipeline=None):
+    from .lua_executor import run_lua_script_job, lua_job_failure_callback
+
+    return queue.enqueue_call(
+        run_lua_script_job, args=tuple(args), kwargs={'lease_id': lease_id},
+        job_id=job_id, at_front=at_front, pipeline=pipeline,
+        on_failure=lua_job_failure_callback)
+
+
+def submit_executions(owner: str, lane: str, jobs: list, job_ids: Optional[list] = None) -> list:
+    """
+    Registra execuções pendentes e dispara o despacho.
+    `jobs` é uma lista de listas de argumentos de run_lua_script_job.
+    Retorna os IDs de job RQ reservados para cada execução (gerados aqui quando
+    `job_ids` não é informado).
+    """
+    scheduler_settings = get_scheduler_settings()
+    job_ids = job_ids or [str(uuid.uuid4()) for _ in jobs]
+
+    if not scheduler_settings['ENABLED']:
+        queue = _get_queue()
+        with queue.connection.pipeline() as pipeline:
+            for job_id, args in zip(job_ids, jobs):
+                _enqueue_job(queue, job_id, args, pipeline=pipeline)
+            pipeline.execute()
+        return job_ids
+
+    connection = _get_connection()
+    clock = float(connection.get(_key('clock', lane)) or 0)
+    pending_key = _key('pending', lane, owner)
+
+    with connection.pipeline() as pipeline:
+        for start in range(0, len(jobs), SUBMIT_CHUNK_SIZE):
+            end = start + SUBMIT_CHUNK_SIZE
+            pipeline.rpush(pending_key, *[
+                json.dumps({'job_id': job_id, 'args': args}, default=str)
+                for job_id, args in zip(job_ids[start:end], jobs[start:end])
+            ])
+        # Usuário que volta a ter pendências entra no relógio virtual atual,
+        # sem acumular crédito pelo tempo em que ficou ocioso
+        pipeline.zadd(_key('owners', lane), {owner: clock}, nx=True)
+        pipeline.execute()
+
+    dispatch()
+    return job_ids
+
+
+def submit_execution(owner: str, lane: str, args: list, job_id: Optional[str] = None) -> str:
+    return submit_executions(owner, lane, [args], [job_id] if job_id else None)[0]
+
+
+# Jobs que ainda não começaram a rodar: a vaga continua ocupada enquanto esperam na fila
+WAITING_STATUSES = ('queued', 'deferred', 'scheduled')
+
+
+def _job_is_waiting(queue, job_id: str) -> bool:
+    job = queue.fetch_job(job_id)
+    if job is None:
+        return False
+    status = job.get_status()
+    return getattr(status, 'value', status) in WAITING_STATUSES
+
+
+def _reclaim_expired_leases(connection, scheduler_settings: dict):
+    """
+    Recupera as vagas de jobs que passaram do prazo. O prazo conta a partir do início
+    do job (renew_execution); enquanto o job espera na fila do RQ o prazo é só adiado,
+    para que uma fila lenta não libere vagas de jobs que ainda vão rodar.
+    """
+    expired = connection.zrangebyscore(_key('leases'), 0, time.time())
+    if not expired:
+        return
+
+    queue = _get_queue()
+    for member in expired:
+        lease_id = _decode(member)
+        if _job_is_waiting(queue, lease_id.split('|', 2)[2]):
+            connection.zadd(_key('leases'), {
+                lease_id: time.time() + scheduler_settings['LEASE_TIMEOUT']}, xx=True)
+            continue
+        if _release(connection, lease_id):
+            logger.warning(f'Vaga de execução expirada recuperada: {lease_id}')
+
+
+def _release(connection, lease_id: str) -> bool:
+    if not connection.zrem(_key('leases'), lease_id):
+        return False
+
+    lane, owner, _ = lease_id.split('|', 2)
+    if connection.hincrby(_key('inflight'), f'{lane}|{owner}', -1) <= 0:
+        connection.hdel(_key('inflight'), f'{lane}|{owner}')
+    return True
+
+
+def _next_owner(connection, lane: str, scheduler_settings: dict):
+    """
+    Dono com menor tempo virtual que ainda não atingiu o próprio limite. Os donos são
+    lidos em páginas de SCAN_LIMIT, para que os primeiros da fila, todos no limite,
+    não escondam os que podem receber vaga.
+    """
+    user_limit = scheduler_settings['USER_LIMITS'].get(lane)
+    page_size = scheduler_settings['SCAN_LIMIT']
+    start = 0
+
+    while True:
+        candidates = connection.zrange(
+            _key('owners', lane), start, start + page_size - 1, withscores=True)
+        if not candidates:
+            return None, None
+
+        if user_limit:
+            fields = [f'{lane}|{_decode(owner)}' for owner, _ in candidates]
+            inflight = connection.hmget(_key('inflight'), fields)
+        else:
+            inflight = [None] * len(candidates)
+
+        for (owner, score), count in zip(candidates, inflight):
+            if user_limit and int(count or 0) >= user_limit:
+                continue
+            return _decode(owner), score
+
+        start += page_size
+
+
+def _dispatch_ready(connection, scheduler_settings: dict) -> int:
+    queue = _get_queue()
+    global_limit = get_global_limit(scheduler_settings)
+    inflight_total = connection.zcard(_key('leases'))
+    dispatched = 0
+
+    for lane in LANES:
+        lane_limit = global_limit
+        if lane != LANE_INTERACTIVE:
+            lane_limit = max(1, global_limit - scheduler_settings['INTERACTIVE_RESERVED'])
+
+        while inflight_total < lane_limit:
+            owner, score = _next_owner(connection, lane, scheduler_settings)
+            if owner is None:
+                break
+
+            pending_key = _key('pending', lane, owner)
+            processing_key = _key('dispatching', lane, owner)
+            # A execução só sai da lista de despacho na mesma transação que a enfileira;
+            # se o despacho anterior morreu no meio, o item que ficou lá é retomado
+            raw = connection.lindex(processing_key, 0) or connection.lmove(
+                pending_key, processing_key, 'LEFT', 'RIGHT')
+            if raw is None:
+                connection.zrem(_key('owners', lane), owner)
+                continue
+
+            weight = scheduler_settings['WEIGHTS'].get(owner, scheduler_settings['DEFAULT_WEIGHT'])
+            spec = json.loads(raw)
+            lease_id = f'{lane}|{owner}|{spec["job_id"]}'
+            has_pending = connection.llen(pending_key)
+
+            with connection.pipeline() as pipeline:
+                # O enqueue do RQ abre o MULTI se ainda não estiver aberto; abrir antes
+                # permite enfileirar na mesma transação dos outros comandos
+                pipeline.multi()
+                pipeline.zadd(_key('leases'), {
+                    lease_id: time.time() + scheduler_settings['LEASE_TIMEOUT']})
+                pipeline.hincrby(_key('inflight'), f'{lane}|{owner}', 1)
+                pipeline.set(_key('clock', lane), score)
+                if has_pending:
+                    pipeline.zadd(_key('owners', lane), {owner: score + 1.0 / weight})
+                else:
+                    pipeline.zrem(_key('owners', lane), owner)
+                _enqueue_job(queue, spec['job_id'], spec['args'], lease_id=lease_id,
+                             at_front=lane == LANE_INTERACTIVE, pipeline=pipeline)
+                pipeline.lrem(processing_key, 1, raw)
+                pipeline.execute()
+
+            inflight_total += 1
+            dispatched += 1
+
+    return dispatched
+
+
+def dispatch() -> int:
+    """
+    Envia ao RQ as execuções que cabem nos limites. Apenas um processo despacha por vez;
+    quem não obtém o lock marca `dirty` para que o detentor faça mais uma rodada.
+    """
+    scheduler_settings = get_scheduler_settings()
+    if not scheduler_settings['ENABLED']:
+        return 0
+
+    connection = _get_connection()
+    dirty_key = _key('dirty')
+    lock_key = _key('lock')
+    connection.set(dirty_key, 1)
+    dispatched = 0
+
+    while True:
+        if not connection.set(lock_key, 1, nx=True, ex=30):
+            return dispatched
+
+        try:
+            while connection.delete(dirty_key):
+                _reclaim_expired_leases(connection, scheduler_settings)
+                dispatched += _dispatch_ready(connection, scheduler_settings)
+        except Exception as e:
+            logger.error(f'Erro ao despachar execuções Lua: {str(e)}')
+        finally:
+            connection.delete(lock_key)
+
+        # Outro processo pode ter marcado dirty entre a última verificação e a liberação do lock
+        if not connection.exists(dirty_key):
+            return dispatched
+
+
+def renew_execution(lease_id: str):
+    """
+    Chamado quando o job começa a rodar: o prazo da vaga passa a contar a partir daqui.
+    Se a vaga já tinha sido recuperada, ela volta a ser ocupada pelo job em execução.
+    """
+    try:
+        connection = _get_connection()
+        deadline = time.time() + get_scheduler_settings()['LEASE_TIMEOUT']
+        lane, owner, _ = lease_id.split('|', 2)
+
+        if connection.zadd(_key('leases'), {lease_id: deadline}, xx=True, ch=True):
+            return
+        if connection.zadd(_key('leases'), {lease_id: deadline}, nx=True):
+            connection.hincrby(_key('inflight'), f'{lane}|{owner}', 1)
+    except Exception as e:
+        logger.error(f'Erro ao renovar vaga {lease_id}: {str(e)}')
+
+
+def release_execution(lease_id: str):
+    """Libera a vaga de uma execução concluída e despacha a próxima."""
+    try:
+        _release(_get_connection(), lease_id)
+        dispatch()
+    except Exception as e:
+        logger.error(f'Erro ao liberar vaga {lease_id}: {str(e)}')
+
+
+def get_scheduler_stats() -> dict:
+    connection = _get_connection()
+    stats = {
+        'global_limit': get_global_limit(),
+        'inflight': connection.zcard(_key('leases')),
+        'lanes': {},
+    }
+
+    inflight_by_owner = {
+        _decode(field): int(value)
+        for field, value in connection.hgetall(_key('inflight')).items()
+    }
+    for lane in LANES:
+        owners = [_decode(owner) for owner in connection.zrange(_key('owners', lane), 0, -1)]
+        stats['lanes'][lane] = {
+            'owners': len(owners),
+            'pending': sum(connection.llen(_key('pending', lane, owner)) for owner in owners),
+            'inflight': sum(count for field, count in inflight_by_owner.items()
+                            if field.startswith(f'{lane}|')),
+        }
+
+    return stats
+
+
+def scheduler_tick_job():
+    """Job RQ periódico (repetido pelo RQ): recupera vagas expiradas e despacha pendências."""
+    try:
+        dispatch()
+    except Exception as e:
+        # Job que falha não é repetido pelo RQ
+        logger.error(f'Erro no despacho periódico: {str(e)}')
+
+
+def schedule_tick(delay: int = None):
+    """
+    Agenda o despacho periódico sob um job id fixo, então chamadas repetidas (um
+    entrypoint por worker, por exemplo) não criam cadeias paralelas. Só reagenda quando
+    o job não existe mais ou terminou: repetições esgotadas ou worker morto durante o tick.
+    """
+    import django_rq
+    from rq import Repeat
+
+    scheduler_settings = get_scheduler_settings()
+    delay = scheduler_settings['TICK_INTERVAL'] if delay is None else delay
+
+    queue = django_rq.get_queue('default')
+    job = queue.fetch_job(TICK_JOB_ID)
+    if job is not None:
+        status = job.get_status()
+        if getattr(status, 'value', status) in ACTIVE_TICK_STATUSES:
+            return None
+
+    return queue.enqueue_in(
+        timedelta(seconds=delay), scheduler_tick_job, job_id=TICK_JOB_ID,
+        repeat=Repeat(times=TICK_REPEATS, interval=scheduler_settings['TICK_INTERVAL']))
@@ -3,299 +3,541 @@ Serviço para execução de scripts Lua via Splash.
 Responsável por comunicação com Splash, processamento de resultados e salvamento de screenshots.
 """
 
-import os
+import json
 import time
-import base64
+import inspect
 import requests
+from functools import lru_cache
 from typing import Optional
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
-from django.conf import settings
+
+from .splash_client import splash_post, get_connection_stats
+from .splash_cluster import get_splash_cluster, SplashUnavailableError
+from .screenshot_store import get_screenshot_store
+from .lua_modules import get_module_source
+from .execution_scheduler import release_execution, renew_execution
+from .event_publisher import publish_events, with_user
+from .screenshot_variants import enqueue_screenshot_variants
+from ..utils.result_cache import set_cached_result
+from ..utils.batch_progress import record_batch_result
+from ..utils.execution_results import share_result, grant_result
+from ..utils.render_cache import RenderCache, make_splash_key
+from ..utils.single_flight import get_followers, finish_flight
 
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+WRAPPER_HEADER = "--[[ Script do usuário ]]--\n"
+
+WRAPPER_FOOTER = """
+local __esmeralda_user_main = main
+main = nil
+if type(__esmeralda_user_main) ~= 'function' then
+    error('Script deve definir function main(splash, args)')
+end
+
+local function __esmeralda_normalize_args(args)
+    local normalized = args or {}
+    if normalized.args then
+        for k, v in pairs(normalized.args) do
+            normalized[k] = v
+        end
+        normalized.args = nil
+    end
+    return normalized
+end
+
+function main(splash, args)
+    local normalized = __esmeralda_normalize_args(args)
+    return __esmeralda_user_main(splash, normalized)
+end"""
+
+WRAPPED_SCRIPT_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=WRAPPED_SCRIPT_CACHE_SIZE)
 def wrap_lua_script(lua_script: str) -> str:
-    wrapper_lines = [
-        "--[[ Script do usuário ]]--",
-        lua_script,
-        "",
-        "local __esmeralda_user_main = main",
-        "main = nil",
-        "if type(__esmeralda_user_main) ~= 'function' then",
-        "    error('Script deve definir function main(splash, args)')",
-        "end",
-        "",
-        "local function __esmeralda_normalize_args(args)",
-        "    local normalized = args or {}",
-        "    if normalized.args then",
-        "        for k, v in pairs(normalized.args) do",
-        "            normalized[k] = v",
-        "        end",
-        "        normalized.args = nil",
-        "    end",
-        "    return normalized",
-        "end",
-        "",
-        "function main(splash, args)",
-        "    local normalized = __esmeralda_normalize_args(args)",
-        "    return __esmeralda_user_main(splash, normalized)",
-        "end",
-    ]
+    return WRAPPER_HEADER + lua_script + "\n" + WRAPPER_FOOTER
 
-    return "\n".join(wrapper_lines)
 
+_render_cache = None
 
-def execute_lua_script(lua_script: str, args: dict) -> dict:
-    try:
-        logger.info(f'Executando script Lua com args: {args}')
 
-        splash_url = 'http://localhost:8050/execute'
-        wrapped_script = wrap_lua_script(lua_script)
+def get_render_cache() -> Optional[RenderCache]:
+    """Cache de renderizações compartilhado com o Scrapy, ou None se desabilitado."""
+    global _render_cache
 
-        splash_payload = {
-            'lua_source': wrapped_script,
-            'url': args.get('url', 'https://httpbin.org/html'),
-            'wait': args.get('wait', 3),
-            'html': args.get('html', 1),
-            'png': args.get('png', 1),
-        }
+    from django.conf import settings
 
-        for key, value in args.items():
-            if key not in ['url', 'wait', 'html', 'png']:
-                splash_payload[key] = value
+    cache_settings = getattr(settings, 'RENDER_CACHE', {})
+    if not cache_settings.get('ENABLED'):
+        return None
 
-        splash_payload['args'] = args
+    if _render_cache is None:
+        _render_cache = RenderCache(
+            cache_settings['PATH'],
+            ttl=cache_settings.get('TTL', 86400),
+            max_bytes=cache_settings.get('MAX_BYTES', 512 * 1024 * 1024),
+        )
+    return _render_cache
 
-        logger.debug(f'Enviando payload para Splash: {splash_payload}')
 
-        response = requests.post(splash_url, json=splash_payload, timeout=30)
+def render_cache_key(splash_payload: dict) -> str:
+    """Mesma chave que o Scrapy calcula para um POST em /execute com este corpo."""
+    return make_splash_key('execute', splash_payload)
 
-        if response.status_code == 200:
-            splash_result = response.json()
 
-            if splash_result.get('error') or (splash_result.get('errors') and len(splash_result.get('errors', [])) > 0):
-                error_msg = splash_result.get(
-                    'error', 'Erro desconhecido no Splash')
-                logger.error(f'Erro no script Lua: {error_msg}')
+def build_splash_payload(lua_script: str, args: dict) -> dict:
+    # Scripts salvos e registrados no Splash são enviados apenas como referência
+    lua_source = get_module_source(lua_script) or wrap_lua_script(lua_script)
 
-                return {
-                    'script_executed': False,
-                    'error': error_msg,
-                    'details': splash_result.get('description', ''),
-                    'splash_response': splash_result,
-                    'timestamp': time.time()
-                }
+    splash_payload = {
+        'lua_source': lua_source,
+        'url': args.get('url', 'https://httpbin.org/html'),
+        'wait': args.get('wait', 3),
+        'html': args.get('html', 1),
+        'png': args.get('png', 1),
+    }
 
-            logger.info('Script Lua executado com sucesso')
+    for key, value in args.items():
+        if key not in ['url', 'wait', 'html', 'png']:
+            splash_payload[key] = value
 
-            result = {
-                'script_executed': True,
-                'timestamp': time.time(),
-                'args_provided': args,
-                'splash_response': splash_result
-            }
+    splash_payload['args'] = args
 
-            if splash_result.get('png'):
-                try:
-                    screenshot_url = _save_screenshot(splash_result['png'])
-                    if screenshot_url:
-                        result['screenshot_url'] = screenshot_url
-                        logger.info(f'Screenshot salva: {screenshot_url}')
-                    else:
-                        result['screenshot_error'] = 'Erro ao salvar screenshot'
-                except Exception as e:
-                    logger.error(f'Erro ao processar screenshot: {str(e)}')
-                    result['screenshot_error'] = str(e)
+    return splash_payload
 
-            return result
 
-        else:
-            error_msg = f'Erro no Splash: HTTP {response.status_code}'
-            logger.error(f'{error_msg} - {response.text[:500]}')
+def build_execution_result(status_code: int, response_text: str, args: dict) -> dict:
+    if status_code == 200:
+        splash_result = json.loads(response_text)
+
+        if splash_result.get('error') or (splash_result.get('errors') and len(splash_result.get('errors', [])) > 0):
+            error_msg = splash_result.get(
+                'error', 'Erro desconhecido no Splash')
+            logger.error(f'Erro no script Lua: {error_msg}')
 
             return {
                 'script_executed': False,
                 'error': error_msg,
-                'details': response.text[:500],
+                'details': splash_result.get('description', ''),
+                'splash_response': splash_result,
                 'timestamp': time.time()
             }
 
-    except requests.RequestException as e:
-        error_msg = f'Erro de conexão com Splash: {str(e)}'
-        logger.error(error_msg)
+        logger.info('Script Lua executado com sucesso')
 
-        return {
-            'script_executed': False,
-            'error': error_msg,
-            'timestamp': time.time()
+        result = {
+            'script_executed': True,
+            'timestamp': time.time(),
+            'args_provided': args,
+            'splash_response': splash_result
         }
 
-    except Exception as e:
-        error_msg = f'Erro interno na execução Lua: {str(e)}'
-        logger.error(error_msg)
+        if splash_result.get('png'):
+            try:
+                screenshot_url = _save_screenshot(splash_result['png'])
+                if screenshot_url:
+                    result['screenshot_url'] = screenshot_url
+                    # O PNG já está no storage; não duplicar o base64 no banco e nos eventos
+                    splash_result.pop('png', None)
+                    logger.info(f'Screenshot salva: {screenshot_url}')
+                else:
+                    result['screenshot_error'] = 'Erro ao salvar screenshot'
+            except Exception as e:
+                logger.error(f'Erro ao processar screenshot: {str(e)}')
+                result['screenshot_error'] = str(e)
 
-        return {
-            'script_executed': False,
-            'error': error_msg,
-            'timestamp': time.time()
-        }
+        return result
 
+    error_msg = f'Erro no Splash: HTTP {status_code}'
+    logger.error(f'{error_msg} - {response_text[:500]}')
 
-def _save_screenshot(png_data: str) -> Optional[str]:
+    return {
+        'script_executed': False,
+        'error': error_msg,
+        'details': response_text[:500],
+        'timestamp': time.time()
+    }
+
+
+def build_error_result(error_msg: str) -> dict:
+    logger.error(error_msg)
+
+    return {
+        'script_executed': False,
+        'error': error_msg,
+        'timestamp': time.time()
+    }
+
+
+def execute_lua_script(lua_script: str, args: dict) -> dict:
     try:
-        if isinstance(png_data, str) and png_data.startswith('data:image/png;base64,'):
-            png_data = png_data.split(',')[1]
+        logger.info(f'Executando script Lua com args: {args}')
+
+        splash_payload = build_splash_payload(lua_script, args)
 
-        png_bytes = base64.b64decode(png_data)
+        render_cache = get_render_cache()
+        if render_cache is not None:
+            cache_key = render_cache_key(splash_payload)
+            cached = render_cache.get(cache_key)
+            if cached is not None:
+                logger.debug(f'Renderização encontrada no cache: {cache_key}')
+                return build_execution_result(cached['status'], cached['body'].decode('utf-8'), args)
+
+        logger.debug(f'Enviando payload para Splash: {splash_payload}')
 
-        screenshot_dir = os.path.join(
-            settings.MEDIA_ROOT, 'screenshots', 'lua_editor')
-        os.makedirs(screenshot_dir, exist_ok=True)
+        with get_splash_cluster().lease() as lease:
+            logger.debug(f'Nó Splash selecionado: {lease.node.url}')
+            response = splash_post(lease.node.execute_url, json=splash_payload)
+            lease.report_status(response.status_code)
+        logger.debug(f'Conexões Splash: {get_connection_stats()}')
 
-        timestamp = int(time.time())
-        screenshot_filename = f"lua_script_{timestamp}.png"
-        screenshot_path = os.path.join(screenshot_dir, screenshot_filename)
+        if render_cache is not None and response.status_code == 200:
+            render_cache.set(cache_key, response.status_code, response.content)
 
-        with open(screenshot_path, 'wb') as f:
-            f.write(png_bytes)
+        return build_execution_result(response.status_code, response.text, args)
 
-        return f"/media/screenshots/lua_editor/{screenshot_filename}"
+    except SplashUnavailableError as e:
+        return build_error_result(f'Splash indisponível: {str(e)}')
+
+    except requests.RequestException as e:
+        return build_error_result(f'Erro de conexão com Splash: {str(e)}')
+
+    except Exception as e:
+        return build_error_result(f'Erro interno na execução Lua: {str(e)}')
+
+
+def _save_screenshot(png_data: str) -> Optional[str]:
+    try:
+        return get_screenshot_store().save(png_data)
 
     except Exception as e:
         logger.error(f'Erro ao salvar screenshot: {str(e)}')
         return None
 
 
-def run_lua_script_job(session_id: str, lua_script: str, args: dict, steps: list = None, execution_id: int = None):
-    from django.apps import apps
-    ScriptExecution = apps.get_model('scraper', 'ScriptExecution')
-    channel_layer = get_channel_layer()
-    steps = steps or []
+def publish_event(channel_layer, event: dict, user_id: int = None):
+    """
+    Registra o evento no buffer da sessão (para replay na inscrição)
+    e o envia aos grupos do WebSocket.
+    """
+    publish_events(channel_layer, [event], user_id=user_id)
 
-    def send_progress_event(event_type: str, **kwargs):
-        event_data = {
-            "type": event_type,
-            "session_id": session_id,
-            "timestamp": time.time(),
-            **kwargs
-        }
 
-        async_to_sync(channel_layer.group_send)(
-            f"notifications_session_{session_id}",
-            event_data
-        )
+def build_batch_event(batch_id: str, progress: dict) -> dict:
+    return {
+        "type": "lua_batch_progress",
+        "batch_id": batch_id,
+        "timestamp": time.time(),
+        **progress
+    }
 
-        async_to_sync(channel_layer.group_send)(
-            "notifications_lua",
-            event_data
-        )
 
-    try:
-        logger.info(f'Iniciando job Lua para sessão {session_id}')
+def publish_batch_progress(channel_layer, batch_id: str, success: bool):
+    progress = record_batch_result(batch_id, success)
+    if progress is None:
+        return
 
-        # Pequeno delay para dar tempo do cliente se inscrever no WebSocket
-        # (Necessário quando o cliente se inscreve após receber o session_id)
-        time.sleep(1.0)
+    async_to_sync(channel_layer.group_send)(
+        f"notifications_batch_{batch_id}",
+        build_batch_event(batch_id, progress)
+    )
 
-        execution = None
-        if execution_id:
-            try:
-                execution = ScriptExecution.objects.get(id=execution_id)
-                execution.status = 'running'
-                execution.save()
-            except ScriptExecution.DoesNotExist:
-                logger.warning(
-                    f'Execution {execution_id} não encontrada para sessão {session_id}')
-
-        send_progress_event("lua_execution_progress", step_index=0,
-                            step_title="Iniciando execução", status="running")
-
-        for step in steps:
-            send_progress_event(
+
+def build_event(session_id: str, event_type: str, **kwargs) -> dict:
+    return {
+        "type": event_type,
+        "session_id": session_id,
+        "timestamp": time.time(),
+        **kwargs
+    }
+
+
+def build_start_events(session_id: str, steps: list) -> list:
+    events = [build_event(session_id, "lua_execution_progress", step_index=0,
+                          step_title="Iniciando execução", status="running")]
+
+    for step in steps:
+        events.append(build_event(
+            session_id,
+            "lua_execution_progress",
+            step_index=step.get("index"),
+            step_title=step.get("title"),
+            status="pending"
+        ))
+
+    events.append(build_event(session_id, "lua_execution_progress", step_index=0,
+                              step_title="Preparando script", status="running"))
+    return events
+
+
+def build_finish_events(session_id: str, steps: list, result: dict) -> list:
+    if result.get('script_executed'):
+        events = [
+            build_event(
+                session_id,
                 "lua_execution_progress",
                 step_index=step.get("index"),
                 step_title=step.get("title"),
-                status="pending"
+                status="success"
             )
+            for step in steps
+        ]
+        events.append(build_event(
+            session_id,
+            "lua_execution_completed",
+            success=True,
+            result=result
+        ))
+        return events
+
+    error_msg = result.get('error', 'Erro desconhecido')
+    events = [
+        build_event(
+            session_id,
+            "lua_execution_progress",
+            step_index=step.get("index"),
+            step_title=step.get("title"),
+            status="error",
+            log=error_msg
+        )
+        for step in steps
+    ]
+    events.append(build_event(
+        session_id,
+        "lua_execution_error",
+        error=error_msg,
+        details=result.get('details')
+    ))
+    return events
+
+
+def start_execution(execution_id: int, session_id: str):
+    from django.apps import apps
+    ScriptExecution = apps.get_model('scraper', 'ScriptExecution')
 
-        send_progress_event("lua_execution_progress", step_index=0,
-                            step_title="Preparando script", status="running")
+    try:
+        execution = ScriptExecution.objects.select_related(
+            'script').get(id=execution_id)
+        execution.status = 'running'
+        execution.save()
+        return execution
+    except ScriptExecution.DoesNotExist:
+        logger.warning(
+            f'Execution {execution_id} não encontrada para sessão {session_id}')
+        return None
+
+
+def finish_execution(execution, result: dict):
+    from django.utils import timezone
+
+    execution.finished_at = timezone.now()
+    execution.response_data = result
+
+    if result.get('script_executed'):
+        execution.status = 'success'
+        if result.get('screenshot_url'):
+            execution.screenshot_url = result.get('screenshot_url')
+        execution.save()
+
+        execution.script.last_executed_at = timezone.now()
+        execution.script.save()
+
+        if execution.screenshot_url:
+            enqueue_screenshot_variants(execution.id)
+    else:
+        execution.status = 'error'
+        execution.logs = result.get('error', 'Erro desconhecido')
+        execution.save()
+
+
+def fail_execution(execution, error_msg: str):
+    from django.utils import timezone
+
+    execution.status = 'error'
+    execution.finished_at = timezone.now()
+    execution.logs = error_msg
+    execution.save()
+
+
+def with_execution(result: dict, execution_id: int = None) -> dict:
+    return {**result, 'execution_id': execution_id} if execution_id else result
+
+
+def start_followers(channel_layer, followers: list, started: set):
+    """Envia os eventos iniciais às sessões anexadas a uma execução coalescida."""
+    events = []
+    for follower in followers:
+        if follower['session_id'] in started:
+            continue
+        started.add(follower['session_id'])
+        events.extend(with_user(
+            build_start_events(follower['session_id'], follower.get('steps') or []),
+            follower.get('user_id')))
+
+    publish_events(channel_layer, events)
+
+
+def finish_followers(channel_layer, followers: list, started: set, result: dict,
+                     event_result: dict = None):
+    """
+    Entrega o resultado da execução líder a cada sessão seguidora.
+    `event_result` é a versão do resultado que vai nos eventos (ver share_result).
+    """
+    start_followers(channel_layer, followers, started)
+    event_result = event_result or result
+
+    # O resultado compartilhado pertence à líder; as seguidoras também podem baixá-lo
+    if followers and event_result.get('result_id'):
+        grant_result(event_result['result_id'], [follower.get('user_id') for follower in followers])
+
+    events = []
+    for follower in followers:
+        follower_session_id = follower['session_id']
+        try:
+            if follower.get('execution_id'):
+                execution = start_execution(follower['execution_id'], follower_session_id)
+                if execution:
+                    finish_execution(execution, result)
+        except Exception as e:
+            logger.error(f'Erro ao finalizar execução da sessão {follower_session_id}: {str(e)}')
+
+        events.extend(with_user(
+            build_finish_events(
+                follower_session_id,
+                follower.get('steps') or [],
+                with_execution(event_result, follower.get('execution_id'))),
+            follower.get('user_id')))
+
+    publish_events(channel_layer, events)
+
+
+def run_lua_script_job(session_id: str, lua_script: str, args: dict, steps: list = None, execution_id: int = None, cache_key: str = None, batch_id: str = None, flight_key: str = None, user_id: int = None, lease_id: str = None):
+    channel_layer = get_channel_layer()
+    steps = steps or []
+    execution = None
+    followers_started = set()
+
+    if lease_id:
+        renew_execution(lease_id)
+
+    try:
+        logger.info(f'Iniciando job Lua para sessão {session_id}')
+
+        if execution_id:
+            execution = start_execution(execution_id, session_id)
+
+        publish_events(channel_layer, build_start_events(session_id, steps), user_id=user_id)
+
+        if flight_key:
+            start_followers(channel_layer, get_followers(flight_key, session_id), followers_started)
 
         result = execute_lua_script(lua_script, args)
 
         if result.get('script_executed'):
             logger.info(
                 f'Script Lua executado com sucesso para sessão {session_id}')
-
-            if execution:
-                from django.utils import timezone
-                execution.status = 'success'
-                execution.finished_at = timezone.now()
-                execution.response_data = result
-                if result.get('screenshot_url'):
-                    execution.screenshot_url = result.get('screenshot_url')
-                execution.save()
-
-                execution.script.last_executed_at = timezone.now()
-                execution.script.save()
-
-            for step in steps:
-                send_progress_event(
-                    "lua_execution_progress",
-                    step_index=step.get("index"),
-                    step_title=step.get("title"),
-                    status="success"
-                )
-
-            send_progress_event(
-                "lua_execution_completed",
-                success=True,
-                result=result
-            )
-
+            if cache_key:
+                set_cached_result(cache_key, result)
         else:
-            error_msg = result.get('error', 'Erro desconhecido')
             logger.error(
-                f'Erro na execução Lua para sessão {session_id}: {error_msg}')
-
-            if execution:
-                from django.utils import timezone
-                execution.status = 'error'
-                execution.finished_at = timezone.now()
-                execution.response_data = result
-                execution.logs = error_msg
-                execution.save()
-
-            for step in steps:
-                send_progress_event(
-                    "lua_execution_progress",
-                    step_index=step.get("index"),
-                    step_title=step.get("title"),
-                    status="error",
-                    log=error_msg
-                )
-
-            send_progress_event(
-                "lua_execution_error",
-                error=error_msg,
-                details=result.get('details')
-            )
+                f'Erro na execução Lua para sessão {session_id}: {result.get("error", "Erro desconhecido")}')
+
+        if execution:
+            finish_execution(execution, result)
+
+        # O resultado completo fica no Redis; os eventos levam um resumo com a referência
+        event_result = share_result(session_id, result, user_id) if result.get('script_executed') else result
+        publish_events(channel_layer, build_finish_events(
+            session_id, steps, with_execution(event_result, execution_id)), user_id=user_id)
+
+        if flight_key:
+            finish_followers(channel_layer, finish_flight(flight_key, session_id),
+                             followers_started, result, event_result)
+
+        if batch_id:
+            publish_batch_progress(
+                channel_layer, batch_id, bool(result.get('script_executed')))
 
     except Exception as e:
         error_msg = f'Erro interno no job Lua: {str(e)}'
         logger.error(f'{error_msg} para sessão {session_id}')
+        fail_job(channel_layer, session_id, error_msg, execution, flight_key,
+                 followers_started, batch_id, user_id)
+
+    finally:
+        if lease_id:
+            release_execution(lease_id)
+
+
+def fail_job(channel_layer, session_id: str, error_msg: str, execution=None, flight_key: str = None,
+             followers_started: set = None, batch_id: str = None, user_id: int = None):
+    """Encerra com erro a sessão do job, as seguidoras do voo e o progresso do lote."""
+    if execution:
+        fail_execution(execution, error_msg)
+
+    publish_event(channel_layer, build_event(
+        session_id,
+        "lua_execution_error",
+        error=error_msg
+    ), user_id=user_id)
+
+    if flight_key:
+        finish_followers(channel_layer, finish_flight(flight_key, session_id),
+                         followers_started or set(), build_error_result(error_msg))
+
+    if batch_id:
+        publish_batch_progress(channel_layer, batch_id, False)
 
+
+def lua_job_failure_callback(job, connection, exc_type, exc_value, traceback):
+    """
+    Callback on_failure do RQ: o job morreu sem passar pelo próprio tratamento de erro
+    (worker encerrado, job abandonado, timeout no worker assíncrono). Sem isso o voo
+    ficaria preso até o TTL e as seguidoras nunca receberiam eventos.
+    """
+    from django.apps import apps
+
+    try:
+        params = inspect.signature(run_lua_script_job).bind(*job.args, **job.kwargs).arguments
+    except TypeError:
+        logger.error(f'Argumentos inesperados no job Lua {job.id}')
+        return
+
+    session_id = params['session_id']
+    error_msg = f'Job Lua interrompido: {exc_type.__name__ if exc_type else "erro desconhecido"}'
+    logger.error(f'{error_msg} para sessão {session_id}')
+
+    execution = None
+    if params.get('execution_id'):
+        ScriptExecution = apps.get_model('scraper', 'ScriptExecution')
+        execution = ScriptExecution.objects.filter(
+            id=params['execution_id'], status__in=('pending', 'running')).first()
+
+    try:
+        fail_job(get_channel_layer(), session_id, error_msg, execution, params.get('flight_key'),
+                 batch_id=params.get('batch_id'), user_id=params.get('user_id'))
+    finally:
+        if params.get('lease_id'):
+            release_execution(params['lease_id'])
+
+
+def deliver_cached_result_job(session_id: str, result: dict, steps: list = None, execution_id: int = None, user_id: int = None):
+    """Entrega um resultado do cache com os mesmos eventos de uma execução real."""
+    channel_layer = get_channel_layer()
+    steps = steps or []
+
+    logger.info(f'Entregando resultado em cache para sessão {session_id}')
+
+    if execution_id:
+        execution = start_execution(execution_id, session_id)
         if execution:
-            from django.utils import timezone
-            execution.status = 'error'
-            execution.finished_at = timezone.now()
-            execution.logs = error_msg
-            execution.save()
-
-        send_progress_event(
-            "lua_execution_error",
-            error=error_msg
-        )
+            finish_execution(execution, result)
+
+    event_result = with_execution(share_result(session_id, result, user_id), execution_id)
+    publish_events(channel_layer, build_start_events(session_id, steps) +
+                   build_finish_events(session_id, steps, event_result), user_id=user_id)
@@ -0,0 +1,121 @@
+"""
+Registro de scripts salvos como módulos Lua do Splash.
+O script encapsulado é gravado uma única vez em um diretório compartilhado com o Splash
+(--lua-package-path); as execuções seguintes enviam apenas uma referência curta que o
+carrega, via o módulo `esmeralda_scripts`, no mesmo ambiente sandbox da requisição.
+
+Requer o Splash iniciado com:
+    --lua-package-path "/etc/splash/lua_modules/?.lua"
+    --lua-sandbox-allowed-modules "esmeralda_scripts"
+"""
+
+import os
+import hashlib
+import tempfile
+from functools import lru_cache
+from typing import Optional
+
+from django.conf import settings
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODULE_SETTINGS = {
+    'ENABLED': False,
+    'DIRECTORY': None,
+    'PREFIX': 'esmeralda_script_',
+}
+
+LOADER_MODULE = 'esmeralda_scripts'
+
+# Carrega o módulo com o ambiente (sandbox) de quem chamou, para que o script
+# do usuário continue sujeito às mesmas restrições de um lua_source comum
+LOADER_SOURCE = """local M = {}
+
+function M.load(name, env)
+    if not name:match('^[%w_]+$') then
+        error('Nome de módulo inválido: ' .. name)
+    end
+    local path = assert(package.searchpath(name, package.path))
+    local chunk = assert(loadfile(path, 't', env))
+    return chunk()
+end
+
+return M
+"""
+
+REFERENCE_TEMPLATE = 'require("{loader}").load("{name}", _ENV)\n'
+
+_registered = set()
+
+
+def get_module_settings() -> dict:
+    module_settings = {
+        **DEFAULT_MODULE_SETTINGS,
+        **getattr(settings, 'LUA_MODULES', {}),
+    }
+    if not module_settings['DIRECTORY']:
+        module_settings['DIRECTORY'] = os.path.join(settings.BASE_DIR, 'lua_modules')
+    return module_settings
+
+
+@lru_cache(maxsize=256)
+def module_name(lua_script: str) -> str:
+    digest = hashlib.sha256(lua_script.encode('utf-8')).hexdigest()[:32]
+    return f"{get_module_settings()['PREFIX']}{digest}"
+
+
+def _write_atomic(path: str, content: str):
+    directory = os.path.dirname(path)
+    with tempfile.NamedTemporaryFile(
+            'w', dir=directory, suffix='.tmp', delete=False, encoding='utf-8') as tmp_file:
+        tmp_file.write(content)
+
+    os.chmod(tmp_file.name, 0o644)
+    os.replace(tmp_file.name, path)
+
+
+def register_script(lua_script: str) -> Optional[str]:
+    """Grava o script encapsulado como módulo e retorna o nome do módulo."""
+    module_settings = get_module_settings()
+    if not module_settings['ENABLED'] or not lua_script:
+        return None
+
+    from .lua_executor import wrap_lua_script
+
+    name = module_name(lua_script)
+    directory = module_settings['DIRECTORY']
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+
+        loader_path = os.path.join(directory, f'{LOADER_MODULE}.lua')
+        if not os.path.exists(loader_path):
+            _write_atomic(loader_path, LOADER_SOURCE)
+
+        path = os.path.join(directory, f'{name}.lua')
+        if not os.path.exists(path):
+            _write_atomic(path, wrap_lua_script(lua_script))
+            logger.info(f'Script registrado como módulo Splash: {name}')
+    except OSError as e:
+        logger.error(f'Erro ao registrar módulo Splash {name}: {str(e)}')
+        return None
+
+    _registered.add(name)
+    return name
+
+
+def get_module_source(lua_script: str) -> Optional[str]:
+    """Retorna o lua_source curto que carrega o módulo, ou None se o script não está registrado."""
+    module_settings = get_module_settings()
+    if not module_settings['ENABLED']:
+        return None
+
+    name = module_name(lua_script)
+    if name not in _registered:
+        if not os.path.exists(os.path.join(module_settings['DIRECTORY'], f'{name}.lua')):
+            return None
+        _registered.add(name)
+
+    return REFERENCE_TEMPLATE.format(loader=LOADER_MODULE, name=name)
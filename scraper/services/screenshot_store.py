@@ -0,0 +1,193 @@
+"""
+Armazenamento de screenshots geradas pelo Splash.
+O PNG em base64 é decodificado em blocos e nomeado pelo hash do conteúdo, então
+renderizações idênticas apontam para o mesmo arquivo. O backend é escolhido em
+settings.SCREENSHOT_STORAGE (sistema de arquivos local ou S3 compatível).
+"""
+
+import os
+import base64
+import hashlib
+import tempfile
+from typing import Optional
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DATA_URL_PREFIX = 'data:image/png;base64,'
+
+# Múltiplo de 4 para que cada bloco seja base64 válido isoladamente
+DECODE_CHUNK_SIZE = 64 * 1024
+
+
+def iter_decoded_chunks(png_data: str):
+    start = len(DATA_URL_PREFIX) if png_data.startswith(DATA_URL_PREFIX) else 0
+
+    for offset in range(start, len(png_data), DECODE_CHUNK_SIZE):
+        yield base64.b64decode(png_data[offset:offset + DECODE_CHUNK_SIZE])
+
+
+def decode_to_file(png_data: str, fileobj) -> str:
+    """Decodifica o base64 para `fileobj` e retorna o sha256 do PNG."""
+    digest = hashlib.sha256()
+
+    for chunk in iter_decoded_chunks(png_data):
+        digest.update(chunk)
+        fileobj.write(chunk)
+
+    fileobj.flush()
+    return digest.hexdigest()
+
+
+class BaseScreenshotStore:
+    def save(self, png_data: str) -> str:
+        """Persiste a screenshot e retorna a URL pública."""
+        raise NotImplementedError
+
+    def read(self, filename: str) -> bytes:
+        raise NotImplementedError
+
+    def save_file(self, filename: str, content: bytes, content_type: str) -> str:
+        """Persiste um arquivo derivado (ex.: miniatura) e retorna a URL pública."""
+        raise NotImplementedError
+
+    def exists(self, filename: str) -> bool:
+        raise NotImplementedError
+
+    def url_for(self, filename: str) -> str:
+        raise NotImplementedError
+
+    @staticmethod
+    def filename_from_url(url: str) -> str:
+        return url.rstrip('/').rsplit('/', 1)[-1]
+
+
+class LocalScreenshotStore(BaseScreenshotStore):
+    def __init__(self, directory: Optional[str] = None, base_url: Optional[str] = None):
+        self.directory = directory or os.path.join(
+            settings.MEDIA_ROOT, 'screenshots', 'lua_editor')
+        self.base_url = (base_url or f'{settings.MEDIA_URL}screenshots/lua_editor').rstrip('/')
+
+    def path_for(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def url_for(self, filename: str) -> str:
+        return f'{self.base_url}/{filename}'
+
+    def exists(self, filename: str) -> bool:
+        return os.path.exists(self.path_for(filename))
+
+    def read(self, filename: str) -> bytes:
+        with open(self.path_for(filename), 'rb') as f:
+            return f.read()
+
+    def save_file(self, filename: str, content: bytes, content_type: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(
+                dir=self.directory, suffix='.tmp', delete=False) as tmp_file:
+            tmp_file.write(content)
+
+        os.chmod(tmp_file.name, 0o644)
+        os.replace(tmp_file.name, self.path_for(filename))
+        return self.url_for(filename)
+
+    def save(self, png_data: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(
+                dir=self.directory, suffix='.tmp', delete=False) as tmp_file:
+            try:
+                content_hash = decode_to_file(png_data, tmp_file)
+            except Exception:
+                os.unlink(tmp_file.name)
+                raise
+
+        filename = f'{content_hash}.png'
+        final_path = self.path_for(filename)
+
+        if os.path.exists(final_path):
+            os.unlink(tmp_file.name)
+            logger.debug(f'Screenshot repetida reaproveitada: {filename}')
+        else:
+            os.chmod(tmp_file.name, 0o644)
+            os.replace(tmp_file.name, final_path)
+
+        return self.url_for(filename)
+
+
+class S3ScreenshotStore(BaseScreenshotStore):
+    """
+    Backend S3 compatível (AWS, MinIO etc.). Requer boto3 instalado.
+    """
+
+    def __init__(self, bucket: str, prefix: str = 'screenshots/lua_editor',
+                 endpoint_url: Optional[str] = None, public_url: Optional[str] = None,
+                 **client_options):
+        import boto3
+
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, **client_options)
+        self.public_url = (public_url or
+                           f'{(endpoint_url or "https://s3.amazonaws.com").rstrip("/")}/{bucket}').rstrip('/')
+
+    def key_for(self, filename: str) -> str:
+        return f'{self.prefix}/{filename}' if self.prefix else filename
+
+    def url_for(self, filename: str) -> str:
+        return f'{self.public_url}/{self.key_for(filename)}'
+
+    def exists(self, filename: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.key_for(filename))
+            return True
+        except ClientError:
+            return False
+
+    def read(self, filename: str) -> bytes:
+        response = self.client.get_object(Bucket=self.bucket, Key=self.key_for(filename))
+        return response['Body'].read()
+
+    def save_file(self, filename: str, content: bytes, content_type: str) -> str:
+        self.client.put_object(
+            Bucket=self.bucket, Key=self.key_for(filename),
+            Body=content, ContentType=content_type)
+        return self.url_for(filename)
+
+    def save(self, png_data: str) -> str:
+        # Mantém em memória apenas PNGs pequenos; os maiores vão para disco
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as tmp_file:
+            content_hash = decode_to_file(png_data, tmp_file)
+            filename = f'{content_hash}.png'
+
+            if self.exists(filename):
+                logger.debug(f'Screenshot repetida reaproveitada: {filename}')
+            else:
+                tmp_file.seek(0)
+                self.client.upload_fileobj(
+                    tmp_file, self.bucket, self.key_for(filename),
+                    ExtraArgs={'ContentType': 'image/png'})
+
+        return self.url_for(filename)
+
+
+_store = None
+
+
+def get_screenshot_store() -> BaseScreenshotStore:
+    global _store
+
+    if _store is None:
+        storage_settings = getattr(settings, 'SCREENSHOT_STORAGE', {})
+        backend = import_string(storage_settings.get(
+            'BACKEND', 'scraper.services.screenshot_store.LocalScreenshotStore'))
+        _store = backend(**storage_settings.get('OPTIONS', {}))
+
+    return _store
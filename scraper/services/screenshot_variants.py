@@ -0,0 +1,133 @@
+"""
+Geração em background de variantes das screenshots (WebP/JPEG e miniaturas).
+As variantes ficam no mesmo storage da screenshot original, nomeadas pelo hash dela.
+"""
+
+import io
+from typing import Optional
+
+from django.conf import settings
+
+from .screenshot_store import get_screenshot_store
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VARIANT_SETTINGS = {
+    'ENABLED': True,
+    'QUEUE': 'default',
+    'FORMATS': {
+        'webp': {'format': 'WEBP', 'quality': 80},
+        'jpeg': {'format': 'JPEG', 'quality': 80},
+    },
+    'THUMBNAILS': {
+        'thumbnail_small': {'size': (320, 240), 'format': 'WEBP', 'quality': 75},
+        'thumbnail_medium': {'size': (640, 480), 'format': 'WEBP', 'quality': 75},
+    },
+}
+
+CONTENT_TYPES = {
+    'WEBP': ('webp', 'image/webp'),
+    'JPEG': ('jpg', 'image/jpeg'),
+    'PNG': ('png', 'image/png'),
+}
+
+
+def get_variant_settings() -> dict:
+    return {
+        **DEFAULT_VARIANT_SETTINGS,
+        **getattr(settings, 'SCREENSHOT_VARIANTS', {}),
+    }
+
+
+def _encode(image, image_format: str, quality: int) -> bytes:
+    # JPEG não suporta transparência
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def generate_variants(screenshot_url: str) -> dict:
+    """
+    Gera as variantes configuradas e retorna um dicionário nome -> URL.
+    Variantes já existentes no storage são reaproveitadas.
+    """
+    from PIL import Image
+
+    variant_settings = get_variant_settings()
+    store = get_screenshot_store()
+    source_filename = store.filename_from_url(screenshot_url)
+    content_hash = source_filename.rsplit('.', 1)[0]
+
+    specs = {
+        **variant_settings['FORMATS'],
+        **variant_settings['THUMBNAILS'],
+    }
+
+    variants = {}
+    image = None
+    for name, spec in specs.items():
+        extension, content_type = CONTENT_TYPES[spec['format']]
+        filename = f'{content_hash}_{name}.{extension}'
+
+        if store.exists(filename):
+            variants[name] = store.url_for(filename)
+            continue
+
+        if image is None:
+            image = Image.open(io.BytesIO(store.read(source_filename)))
+            image.load()
+
+        variant_image = image
+        if spec.get('size'):
+            variant_image = image.copy()
+            variant_image.thumbnail(tuple(spec['size']))
+
+        content = _encode(variant_image, spec['format'], spec.get('quality', 80))
+        variants[name] = store.save_file(filename, content, content_type)
+
+    return variants
+
+
+def generate_screenshot_variants_job(execution_id: int):
+    from django.apps import apps
+    ScriptExecution = apps.get_model('scraper', 'ScriptExecution')
+
+    try:
+        execution = ScriptExecution.objects.only(
+            'id', 'screenshot_url').get(id=execution_id)
+    except ScriptExecution.DoesNotExist:
+        logger.warning(f'Execution {execution_id} não encontrada para gerar variantes')
+        return
+
+    if not execution.screenshot_url:
+        return
+
+    try:
+        variants = generate_variants(execution.screenshot_url)
+    except Exception as e:
+        logger.error(f'Erro ao gerar variantes da screenshot {execution.screenshot_url}: {str(e)}')
+        return
+
+    ScriptExecution.objects.filter(id=execution_id).update(
+        screenshot_variants=variants)
+    logger.info(f'{len(variants)} variantes geradas para execution {execution_id}')
+
+
+def enqueue_screenshot_variants(execution_id: int) -> Optional[str]:
+    variant_settings = get_variant_settings()
+    if not variant_settings['ENABLED']:
+        return None
+
+    try:
+        import django_rq
+        queue = django_rq.get_queue(variant_settings['QUEUE'])
+        job = queue.enqueue(generate_screenshot_variants_job, execution_id)
+        return job.id
+    except Exception as e:
+        logger.error(f'Erro ao enfileirar variantes da execution {execution_id}: {str(e)}')
+        return None
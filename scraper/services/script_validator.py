@@ -0,0 +1,208 @@
+"""
+Validação de scripts Lua antes da execução no Splash.
+O código é quebrado em tokens por uma única expressão regular compilada na importação,
+de modo que comentários e strings não geram falsos positivos. Os vereditos ficam em
+cache pelo hash do script, então o mesmo script não é reanalisado a cada execução.
+"""
+
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+MAX_SCRIPT_LENGTH = 10000
+
+VALIDATION_CACHE_SIZE = 1024
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<long_comment>--\[(?P<comment_level>=*)\[.*?\](?P=comment_level)\])
+  | (?P<comment>--[^\n]*)
+  | (?P<long_string>\[(?P<string_level>=*)\[(?P<long_value>.*?)\](?P=string_level)\])
+  | (?P<string>"(?P<dq_value>(?:\\.|[^"\\\n])*)"|'(?P<sq_value>(?:\\.|[^'\\\n])*)')
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<number>0[xX][0-9A-Fa-f]*(?:\.[0-9A-Fa-f]*)?(?:[pP][+-]?\d+)?|\d+(?:\.(?!\.)\d*)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)
+  | (?P<op>\.\.\.|\.\.|::|==|~=|<=|>=|//|<<|>>|\S)
+""", re.DOTALL | re.VERBOSE)
+
+# Campos de módulos perigosos (os.execute, io["popen"] ...)
+DANGEROUS_FIELDS = {
+    ('os', 'execute'),
+    ('io', 'popen'),
+    ('package', 'loadlib'),
+}
+
+# Funções globais perigosas
+DANGEROUS_FUNCTIONS = {'loadfile', 'dofile'}
+
+# Módulos que não podem ser carregados com require
+DANGEROUS_MODULES = {'os', 'io'}
+
+# Módulos com campos perigosos: só podem ser usados com acesso direto a um campo literal
+# (`os.time()`); apelidos (`local o = os`) e índices dinâmicos (`os[x]`) são recusados
+GUARDED_MODULES = {module for module, _ in DANGEROUS_FIELDS}
+
+# Tabelas que dão acesso aos globais: `_G.os` é o mesmo que `os`
+GLOBAL_TABLES = {'_G', '_ENV'}
+
+# Operadores de acesso a campo; `..` (concatenação) e `...` são tokens próprios
+FIELD_OPERATORS = ('.', ':')
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def tokenize(code: str) -> list:
+    """
+    Retorna tuplas (tipo, valor, linha) de nomes, números, strings e operadores;
+    comentários são descartados.
+    """
+    tokens = []
+    line = 1
+    position = 0
+
+    for match in TOKEN_PATTERN.finditer(code):
+        line += code.count('\n', position, match.start())
+        position = match.start()
+        kind = match.lastgroup
+
+        if kind in ('long_string', 'string'):
+            value = next(value for value in match.group('long_value', 'dq_value', 'sq_value')
+                         if value is not None)
+            tokens.append(('string', value, line))
+        elif kind in ('name', 'number', 'op'):
+            tokens.append((kind, match.group(), line))
+
+    return tokens
+
+
+def _field_name(tokens: list, index: int) -> Optional[str]:
+    """Nome do campo acessado em tokens[index:] (`.campo`, `:campo` ou `["campo"]`)."""
+    if index + 1 >= len(tokens):
+        return None
+
+    kind, value, _ = tokens[index]
+    next_kind, next_value, _ = tokens[index + 1]
+
+    if kind == 'op' and value in FIELD_OPERATORS and next_kind == 'name':
+        return next_value
+    if (kind == 'op' and value == '[' and next_kind == 'string'
+            and index + 2 < len(tokens) and tokens[index + 2][1] == ']'):
+        return next_value
+    return None
+
+
+def _global_name(tokens: list, index: int) -> tuple:
+    """
+    Global acessado a partir de tokens[index], resolvendo prefixos `_G.`, `_ENV.` e
+    `_G["x"]`. Retorna (nome, índice do token seguinte); o nome continua sendo `_G` ou
+    `_ENV` quando a tabela é usada sem campo literal (apelido ou índice dinâmico).
+    """
+    name = tokens[index][1]
+    index += 1
+
+    while name in GLOBAL_TABLES:
+        field = _field_name(tokens, index)
+        if field is None:
+            break
+        index += 2 if tokens[index][1] in FIELD_OPERATORS else 3
+        name = field
+
+    return name, index
+
+
+def _required_module(tokens: list, index: int) -> Optional[str]:
+    """Módulo passado a `require "x"` ou `require("x")`."""
+    if index < len(tokens) and tokens[index][0] == 'string':
+        return tokens[index][1]
+    if (index + 1 < len(tokens) and tokens[index][1] == '('
+            and tokens[index + 1][0] == 'string'):
+        return tokens[index + 1][1]
+    return None
+
+
+def _violation(line: Optional[int], message: str) -> dict:
+    return {'line': line, 'message': message}
+
+
+def _analyze(code: str) -> List[dict]:
+    if not code.strip():
+        return [_violation(None, 'Script Lua é obrigatório')]
+
+    if len(code) > MAX_SCRIPT_LENGTH:
+        return [_violation(None, f'Script Lua muito longo (máx. {MAX_SCRIPT_LENGTH // 1000}KB)')]
+
+    tokens = tokenize(code)
+    violations = []
+    has_main = False
+
+    for index, (kind, value, line) in enumerate(tokens):
+        if kind != 'name':
+            continue
+
+        if value == 'function' and index + 1 < len(tokens) and tokens[index + 1][1] == 'main':
+            has_main = True
+            continue
+
+        # Campos (`x.os`) são analisados a partir do início da cadeia
+        previous = tokens[index - 1][1] if index > 0 else None
+        if previous in FIELD_OPERATORS:
+            continue
+
+        name, after = _global_name(tokens, index)
+        field = _field_name(tokens, after)
+
+        if name in GLOBAL_TABLES:
+            violations.append(_violation(line, f'Acesso direto à tabela global não permitido: {name}'))
+
+        elif (name, field) in DANGEROUS_FIELDS:
+            violations.append(_violation(line, f'Comando perigoso detectado: {name}.{field}'))
+
+        elif name in GUARDED_MODULES and field is None:
+            violations.append(_violation(
+                line, f'Comando perigoso detectado: uso indireto do módulo {name}'))
+
+        elif name in DANGEROUS_FUNCTIONS:
+            violations.append(_violation(line, f'Comando perigoso detectado: {name}'))
+
+        elif name == 'require':
+            module = _required_module(tokens, after)
+            if module is None:
+                violations.append(_violation(
+                    line, 'require deve receber o nome do módulo como string literal'))
+            elif module.split('.')[0] in DANGEROUS_MODULES:
+                violations.append(_violation(line, f'Comando perigoso detectado: require "{module}"'))
+
+    if not has_main:
+        violations.append(_violation(None, 'Script deve conter uma função main(splash, args)'))
+
+    return violations
+
+
+def validate_script(code: str) -> List[dict]:
+    """
+    Retorna todas as violações do script como dicionários {'line', 'message'}.
+    Lista vazia indica script válido.
+    """
+    code = code or ''
+    digest = hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+    with _cache_lock:
+        if digest in _cache:
+            _cache.move_to_end(digest)
+            return list(_cache[digest])
+
+    violations = _analyze(code)
+
+    with _cache_lock:
+        _cache[digest] = tuple(violations)
+        while len(_cache) > VALIDATION_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return violations
+
+
+def format_violation(violation: dict) -> str:
+    if violation['line'] is None:
+        return violation['message']
+    return f"Linha {violation['line']}: {violation['message']}"
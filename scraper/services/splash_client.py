@@ -0,0 +1,167 @@
+"""
+Cliente HTTP compartilhado para comunicação com o Splash.
+Mantém uma sessão com pool de conexões keep-alive reutilizada por todos os jobs do processo.
+"""
+
+import asyncio
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SETTINGS = {
+    'POOL_CONNECTIONS': 10,
+    'POOL_MAXSIZE': 10,
+    'POOL_BLOCK': False,
+    'MAX_RETRIES': 3,
+    'BACKOFF_FACTOR': 0.3,
+    'TIMEOUT': 30,
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+# Um cliente assíncrono por event loop (conexões não podem trocar de loop)
+_async_clients = {}
+
+
+def get_pool_settings() -> dict:
+    return {
+        **DEFAULT_POOL_SETTINGS,
+        **getattr(settings, 'SPLASH_HTTP_POOL', {}),
+    }
+
+
+def _build_session() -> requests.Session:
+    pool_settings = get_pool_settings()
+
+    # Repetir (com backoff) só falhas antes de o corpo ser enviado: recusa ou reset ao
+    # conectar. Conexões keep-alive derrubadas pelo Splash são detectadas pelo urllib3
+    # ao sair do pool, antes da escrita, e trocadas por uma nova conexão, que cai nesta
+    # mesma contagem. Um POST /execute que falha depois de enviado pode já ter rodado e
+    # não é reenviado; respostas HTTP (inclusive 503) voltam ao chamador, que escolhe
+    # outro nó pelo SplashCluster.
+    retry = Retry(
+        total=pool_settings['MAX_RETRIES'],
+        connect=pool_settings['MAX_RETRIES'],
+        read=0,
+        status=0,
+        other=0,
+        backoff_factor=pool_settings['BACKOFF_FACTOR'],
+        raise_on_status=False,
+    )
+
+    adapter = HTTPAdapter(
+        pool_connections=pool_settings['POOL_CONNECTIONS'],
+        pool_maxsize=pool_settings['POOL_MAXSIZE'],
+        pool_block=pool_settings['POOL_BLOCK'],
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'Connection': 'keep-alive'})
+
+    logger.info(
+        f'Sessão HTTP do Splash criada (pool por host: {pool_settings["POOL_MAXSIZE"]}, '
+        f'retries: {pool_settings["MAX_RETRIES"]})')
+
+    return session
+
+
+def get_splash_session() -> requests.Session:
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+
+    return _session
+
+
+def reset_splash_session():
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def splash_post(url: str, **kwargs) -> requests.Response:
+    kwargs.setdefault('timeout', get_pool_settings()['TIMEOUT'])
+    return get_splash_session().post(url, **kwargs)
+
+
+def get_connection_stats() -> dict:
+    """
+    Retorna contadores de conexões do pool.
+
+    `new_connections` é o total de conexões TCP abertas e `reused_connections`
+    o total de requisições atendidas por uma conexão já existente.
+    """
+    stats = {
+        'pools': 0,
+        'requests': 0,
+        'new_connections': 0,
+        'reused_connections': 0,
+    }
+
+    if _session is None:
+        return stats
+
+    seen = set()
+    for adapter in _session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+
+        pool_manager = adapter.poolmanager
+        for key in list(pool_manager.pools.keys()):
+            pool = pool_manager.pools.get(key)
+            if pool is None:
+                continue
+            stats['pools'] += 1
+            stats['requests'] += pool.num_requests
+            stats['new_connections'] += pool.num_connections
+
+    stats['reused_connections'] = max(
+        stats['requests'] - stats['new_connections'], 0)
+
+    return stats
+
+
+def get_async_splash_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+
+    if client is None or client.is_closed:
+        pool_settings = get_pool_settings()
+        transport = httpx.AsyncHTTPTransport(
+            retries=pool_settings['MAX_RETRIES'],
+            limits=httpx.Limits(
+                max_connections=None,
+                max_keepalive_connections=pool_settings['POOL_MAXSIZE'],
+            ),
+        )
+        client = httpx.AsyncClient(
+            transport=transport,
+            timeout=pool_settings['TIMEOUT'],
+        )
+        _async_clients[loop] = client
+
+    return client
+
+
+async def close_async_splash_client():
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,313 @@
+"""
+Registro de nós Splash com roteamento por menor número de requisições em andamento.
+Faz health check periódico via /_ping, ejeta nós lentos ou com falhas e respeita
+um limite de concorrência por nó (contabilizado por processo).
+"""
+
+import time
+import asyncio
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from typing import Optional
+
+import requests
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CLUSTER_SETTINGS = {
+    'MAX_CONCURRENCY_PER_NODE': 5,
+    'HEALTH_CHECK_INTERVAL': 10,
+    'HEALTH_CHECK_TIMEOUT': 2,
+    'SLOW_THRESHOLD': 60,
+    'MAX_FAILURES': 3,
+    'EJECTION_TIME': 30,
+    'ACQUIRE_TIMEOUT': 30,
+}
+
+
+# Splash sem slots livres: o nó está saturado, não com defeito, e não conta como falha
+BACKPRESSURE_STATUSES = (429, 503)
+
+
+class SplashUnavailableError(Exception):
+    pass
+
+
+def is_failure_status(status_code: int) -> bool:
+    return status_code >= 500 and status_code not in BACKPRESSURE_STATUSES
+
+
+class SplashLease:
+    """
+    Nó reservado por lease()/lease_async(). Respostas 5xx não levantam exceção, então
+    o chamador informa o status para que o nó seja contado como falha (exceto 429/503,
+    que indicam apenas fila cheia).
+    """
+
+    def __init__(self, node: 'SplashNode'):
+        self.node = node
+        self.success = True
+
+    def report_status(self, status_code: int):
+        if is_failure_status(status_code):
+            self.success = False
+
+
+class SplashNode:
+    # Peso da última latência na média móvel exponencial
+    LATENCY_ALPHA = 0.3
+
+    def __init__(self, url: str, max_concurrency: int):
+        self.url = url.rstrip('/')
+        self.max_concurrency = max_concurrency
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.avg_latency = None
+        self.total_requests = 0
+        self.total_failures = 0
+
+    @property
+    def execute_url(self) -> str:
+        return f'{self.url}/execute'
+
+    @property
+    def ping_url(self) -> str:
+        return f'{self.url}/_ping'
+
+    def is_ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def is_available(self, now: float, ignore_limits: bool = False) -> bool:
+        if not self.healthy or self.is_ejected(now):
+            return False
+        return ignore_limits or self.outstanding < self.max_concurrency
+
+    def record_latency(self, latency: float):
+        if self.avg_latency is None:
+            self.avg_latency = latency
+        else:
+            self.avg_latency = (self.LATENCY_ALPHA * latency +
+                                (1 - self.LATENCY_ALPHA) * self.avg_latency)
+
+    def to_dict(self, now: float) -> dict:
+        return {
+            'url': self.url,
+            'healthy': self.healthy,
+            'ejected': self.is_ejected(now),
+            'outstanding': self.outstanding,
+            'max_concurrency': self.max_concurrency,
+            'avg_latency': self.avg_latency,
+            'consecutive_failures': self.consecutive_failures,
+            'total_requests': self.total_requests,
+            'total_failures': self.total_failures,
+        }
+
+
+class SplashCluster:
+    def __init__(self, urls: list, session: Optional[requests.Session] = None, **options):
+        if not urls:
+            raise ValueError('Pelo menos um nó Splash deve ser configurado')
+
+        self.options = {**DEFAULT_CLUSTER_SETTINGS, **options}
+        self.nodes = [
+            SplashNode(url, self.options['MAX_CONCURRENCY_PER_NODE'])
+            for url in urls
+        ]
+        self.session = session or requests.Session()
+        self._condition = threading.Condition()
+        self._health_thread = None
+        self._stop_event = threading.Event()
+
+    def _select(self, ignore_limits: bool = False) -> Optional[SplashNode]:
+        now = time.monotonic()
+        candidates = [node for node in self.nodes
+                      if node.is_available(now, ignore_limits)]
+        if not candidates:
+            return None
+
+        return min(candidates, key=lambda node: (
+            node.outstanding,
+            node.avg_latency if node.avg_latency is not None else 0.0,
+        ))
+
+    def acquire(self, timeout: Optional[float] = None) -> SplashNode:
+        """
+        Reserva o nó saudável com menos requisições em andamento,
+        aguardando até `timeout` segundos por uma vaga.
+        """
+        if timeout is None:
+            timeout = self.options['ACQUIRE_TIMEOUT']
+
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                node = self._select()
+                if node:
+                    node.outstanding += 1
+                    return node
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise SplashUnavailableError(
+                        'Nenhum nó Splash disponível no momento')
+                self._condition.wait(remaining)
+
+    def try_acquire(self) -> Optional[SplashNode]:
+        with self._condition:
+            node = self._select()
+            if node:
+                node.outstanding += 1
+            return node
+
+    async def acquire_async(self, timeout: Optional[float] = None,
+                            poll_interval: float = 0.05) -> SplashNode:
+        """
+        Versão para event loop de `acquire`: não bloqueia a thread
+        enquanto aguarda uma vaga.
+        """
+        if timeout is None:
+            timeout = self.options['ACQUIRE_TIMEOUT']
+
+        deadline = time.monotonic() + timeout
+        while True:
+            node = self.try_acquire()
+            if node:
+                return node
+            if time.monotonic() >= deadline:
+                raise SplashUnavailableError(
+                    'Nenhum nó Splash disponível no momento')
+            await asyncio.sleep(poll_interval)
+
+    def pick(self) -> Optional[SplashNode]:
+        """
+        Reserva o nó menos ocupado sem bloquear nem respeitar o limite de
+        concorrência (para quem já controla concorrência, como o Scrapy).
+        """
+        with self._condition:
+            node = self._select(ignore_limits=True)
+            if node:
+                node.outstanding += 1
+            return node
+
+    def release(self, node: SplashNode, latency: Optional[float] = None, success: bool = True):
+        with self._condition:
+            node.outstanding = max(node.outstanding - 1, 0)
+            node.total_requests += 1
+
+            if latency is not None:
+                node.record_latency(latency)
+
+            if success:
+                node.consecutive_failures = 0
+            else:
+                node.consecutive_failures += 1
+                node.total_failures += 1
+                if node.consecutive_failures >= self.options['MAX_FAILURES']:
+                    self._eject(node, f'{node.consecutive_failures} falhas consecutivas')
+
+            if (node.avg_latency is not None and
+                    node.avg_latency > self.options['SLOW_THRESHOLD']):
+                self._eject(node, f'latência média de {node.avg_latency:.1f}s')
+
+            self._condition.notify_all()
+
+    def _eject(self, node: SplashNode, reason: str):
+        node.ejected_until = time.monotonic() + self.options['EJECTION_TIME']
+        # Zerar o histórico para o nó voltar com uma nova chance
+        node.consecutive_failures = 0
+        node.avg_latency = None
+        logger.warning(f'Nó Splash {node.url} ejetado por '
+                       f'{self.options["EJECTION_TIME"]}s: {reason}')
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None):
+        lease = SplashLease(self.acquire(timeout))
+        started = time.monotonic()
+        try:
+            yield lease
+        except BaseException:
+            lease.success = False
+            raise
+        finally:
+            self.release(lease.node, time.monotonic() - started, lease.success)
+
+    @asynccontextmanager
+    async def lease_async(self, timeout: Optional[float] = None):
+        lease = SplashLease(await self.acquire_async(timeout))
+        started = time.monotonic()
+        try:
+            yield lease
+        except BaseException:
+            lease.success = False
+            raise
+        finally:
+            self.release(lease.node, time.monotonic() - started, lease.success)
+
+    def check_health(self):
+        for node in self.nodes:
+            try:
+                response = self.session.get(
+                    node.ping_url, timeout=self.options['HEALTH_CHECK_TIMEOUT'])
+                healthy = response.status_code == 200
+            except requests.RequestException:
+                healthy = False
+
+            with self._condition:
+                if node.healthy != healthy:
+                    logger.warning(f'Nó Splash {node.url} '
+                                   f'{"recuperado" if healthy else "indisponível"}')
+                node.healthy = healthy
+                self._condition.notify_all()
+
+    def _health_loop(self):
+        while not self._stop_event.wait(self.options['HEALTH_CHECK_INTERVAL']):
+            try:
+                self.check_health()
+            except Exception as e:
+                logger.error(f'Erro no health check do Splash: {str(e)}')
+
+    def start_health_checks(self):
+        if self.options['HEALTH_CHECK_INTERVAL'] <= 0:
+            return
+        if self._health_thread and self._health_thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._health_thread = threading.Thread(
+            target=self._health_loop, name='splash-health-check', daemon=True)
+        self._health_thread.start()
+
+    def stop_health_checks(self):
+        self._stop_event.set()
+
+    def stats(self) -> list:
+        now = time.monotonic()
+        with self._condition:
+            return [node.to_dict(now) for node in self.nodes]
+
+
+_cluster = None
+_cluster_lock = threading.Lock()
+
+
+def get_splash_cluster() -> SplashCluster:
+    global _cluster
+
+    if _cluster is None:
+        with _cluster_lock:
+            if _cluster is None:
+                from django.conf import settings
+
+                # Health checks usam uma sessão própria, sem retries: um /_ping que
+                # falha deve marcar o nó na hora, sem esperar backoffs
+                _cluster = SplashCluster(
+                    settings.SPLASH_BACKENDS,
+                    **getattr(settings, 'SPLASH_CLUSTER', {}),
+                )
+                _cluster.start_health_checks()
+
+    return _cluster
@@ -0,0 +1,146 @@
+import gzip
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+from scrapy.settings import Settings
+
+from .models import ScrapingSession, Script, ScriptExecution
+from .scrapy_project.profiles import CrawlProfileAddon
+from .serializers import SubscribeInputSerializer
+from .services.script_validator import validate_script
+from .utils.client_messages import validate_client_message
+
+
+def wrap_main(body: str) -> str:
+    return f"function main(splash, args)\n{body}\nend"
+
+
+class ScriptValidatorTests(SimpleTestCase):
+    def assertRejected(self, body: str):
+        self.assertTrue(validate_script(wrap_main(body)), f'Script aceito: {body}')
+
+    def assertAccepted(self, body: str):
+        self.assertEqual(validate_script(wrap_main(body)), [])
+
+    def test_dangerous_calls(self):
+        self.assertRejected('os.execute("id")')
+        self.assertRejected('io["popen"]("id")')
+        self.assertRejected('loadfile("/etc/passwd")')
+        self.assertRejected('require "os"')
+
+    def test_concatenation_does_not_hide_dangerous_calls(self):
+        self.assertRejected('local a = "" .. os.execute("id")')
+        self.assertRejected('local a = ""..io.popen("id")')
+        self.assertRejected('local a = 1..os.execute("id")')
+        self.assertRejected('local a = x...os')
+
+    def test_global_table_access(self):
+        self.assertRejected('_G.os.execute("id")')
+        self.assertRejected('_G.loadfile("x")')
+        self.assertRejected('_G["io"].popen("id")')
+        self.assertRejected('local o = _G.os; o.execute("id")')
+        self.assertRejected('local g = _G')
+
+    def test_safe_scripts(self):
+        self.assertAccepted('splash:go(args.url)')
+        self.assertAccepted('return os.time()')
+        self.assertAccepted('local a = "x" .. os.time() .. args.os')
+        self.assertAccepted('local t = {...}; return 1.5e3 + 0x1F')
+
+    def test_main_is_required(self):
+        self.assertTrue(validate_script('return 1'))
+
+
+
+class ClientMessageTests(SimpleTestCase):
+    MESSAGES = [
+        {'action': 'subscribe', 'session_id': ' abc ', 'firehose': 'true'},
+        {'action': 'fetch_result', 'result_id': 42, 'compression': 'gzip'},
+        {'action': 'subscribe', 'session_id': ''},
+        {'action': 'subscribe', 'batch_id': '   '},
+        {'action': 'subscribe', 'session_id': ['a']},
+        {'action': 'nope', 'compression': 'zip'},
+        {'firehose': 'talvez'},
+    ]
+
+    def test_matches_subscribe_serializer(self):
+        for message in self.MESSAGES:
+            serializer = SubscribeInputSerializer(data=message)
+            valid = serializer.is_valid()
+            data, errors = validate_client_message(message)
+
+            self.assertEqual(sorted(errors), sorted(serializer.errors), message)
+            if valid:
+                self.assertEqual({k: v for k, v in data.items() if v is not None},
+                                 dict(serializer.validated_data), message)
+            else:
+                for field, messages in serializer.errors.items():
+                    self.assertEqual(errors[field], [str(m) for m in messages], message)
+
+
+class CrawlProfileAddonTests(TestCase):
+    def per_domain(self, **spider_args) -> int:
+        settings = Settings({'CRAWL_PROFILE': 'balanced', 'SPLASH_URLS': ['http://splash:8050']})
+        crawler = SimpleNamespace(spider=SimpleNamespace(**spider_args))
+        CrawlProfileAddon.from_crawler(crawler).update_settings(settings)
+        return settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN')
+
+    def test_session_profile_overrides_process_default(self):
+        ScrapingSession.objects.create(session_id='s1', crawl_profile='polite')
+        self.assertEqual(self.per_domain(session_id='s1'), 1)
+
+    def test_spider_argument_overrides_session(self):
+        ScrapingSession.objects.create(session_id='s1', crawl_profile='polite')
+        self.assertEqual(self.per_domain(session_id='s1', crawl_profile='bulk'), 8)
+
+    def test_falls_back_to_process_default(self):
+        ScrapingSession.objects.create(session_id='s1')
+        self.assertEqual(self.per_domain(session_id='s1'), 4)
+        self.assertEqual(self.per_domain(), 4)
+
+
+class ScriptExecutionApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('dono', password='x')
+        script = Script.objects.create(user=self.user, name='s', code='return 1')
+        self.execution = ScriptExecution.objects.create(script=script, status='success')
+        self.client = APIClient()
+
+    def test_requires_authentication(self):
+        response = self.client.get('/api/script-executions/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_lists_own_executions_with_fields(self):
+        other = User.objects.create_user('outro', password='x')
+        ScriptExecution.objects.create(
+            script=Script.objects.create(user=other, name='s', code='return 2'))
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/script-executions/?fields=id,status')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{'id': self.execution.id, 'status': 'success'}])
+
+        response = self.client.get(f'/api/script-executions/{self.execution.id}/payload/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_compacted_execution_detail_reads_archive(self):
+        self.client.force_authenticate(self.user)
+        url = f'/api/scripts/{self.execution.script_id}/executions/{self.execution.id}/'
+
+        with tempfile.TemporaryDirectory() as archive_dir:
+            archive_path = os.path.join(archive_dir, 'executions.jsonl.gz')
+            with gzip.open(archive_path, 'wt', encoding='utf-8') as f:
+                f.write(json.dumps({'id': self.execution.id, 'response_data': {'ok': 1}, 'logs': 'log'}))
+            ScriptExecution.objects.filter(id=self.execution.id).update(
+                compacted=True, response_data=None, logs='', archive_path=archive_path)
+
+            data = self.client.get(url).json()
+            self.assertEqual((data['response_data'], data['logs'], data['archived']), ({'ok': 1}, 'log', True))
+
+        data = self.client.get(url).json()
+        self.assertEqual((data['response_data'], data['archived']), (None, False))
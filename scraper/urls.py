@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import lua_editor, auth, scripts
+from .views import lua_editor, auth, scripts, scraping
 
 app_name = 'scraper'
 
@@ -8,6 +8,8 @@ router = DefaultRouter()
 router.register(r'scripts', scripts.ScriptViewSet, basename='script')
 router.register(r'script-executions',
                 scripts.ScriptExecutionViewSet, basename='script-execution')
+router.register(r'scraping-sessions',
+                scraping.ScrapingSessionViewSet, basename='scraping-session')
 
 urlpatterns = [
     path('api/', include(router.urls)),
@@ -15,6 +17,12 @@ urlpatterns = [
     # Lua execution
     path('api/lua/execute/', lua_editor.ExecuteLuaScriptAsyncView.as_view(),
          name='execute_lua_script_async'),
+    path('api/lua/execute/batch/', lua_editor.ExecuteLuaScriptBatchView.as_view(),
+         name='execute_lua_script_batch'),
+    path('api/lua/batches/<str:batch_id>/', lua_editor.LuaBatchStatusView.as_view(),
+         name='lua_batch_status'),
+    path('api/lua/results/<str:result_id>/', lua_editor.LuaResultView.as_view(),
+         name='lua_result'),
 
     # Authentication
     path('api/auth/csrf-token/', auth.csrf_token, name='csrf_token'),
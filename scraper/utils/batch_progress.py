@@ -0,0 +1,91 @@
+"""
+Progresso agregado de execuções em lote, guardado em um hash Redis por lote.
+"""
+
+import time
+from typing import Optional
+
+from django.conf import settings
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SETTINGS = {
+    'MAX_ITEMS': 10000,
+    'CHUNK_SIZE': 500,
+    'TTL': 86400,
+    'KEY_PREFIX': 'lua_batch',
+    'QUEUE': 'default',
+}
+
+COUNTER_FIELDS = ('total', 'completed', 'succeeded', 'failed')
+
+
+def get_batch_settings() -> dict:
+    return {
+        **DEFAULT_BATCH_SETTINGS,
+        **getattr(settings, 'LUA_BATCH', {}),
+    }
+
+
+def _get_connection():
+    import django_rq
+    return django_rq.get_connection(get_batch_settings()['QUEUE'])
+
+
+def _batch_key(batch_id: str) -> str:
+    return f"{get_batch_settings()['KEY_PREFIX']}:{batch_id}"
+
+
+def _decode(raw: dict) -> dict:
+    data = {
+        (key.decode() if isinstance(key, bytes) else key):
+        (value.decode() if isinstance(value, bytes) else value)
+        for key, value in raw.items()
+    }
+    for field in COUNTER_FIELDS:
+        data[field] = int(data.get(field, 0))
+    if 'created_at' in data:
+        data['created_at'] = float(data['created_at'])
+    return data
+
+
+def create_batch(batch_id: str, total: int):
+    key = _batch_key(batch_id)
+    pipeline = _get_connection().pipeline()
+    pipeline.hset(key, mapping={
+        'total': total,
+        'completed': 0,
+        'succeeded': 0,
+        'failed': 0,
+        'created_at': time.time(),
+    })
+    pipeline.expire(key, get_batch_settings()['TTL'])
+    pipeline.execute()
+
+
+def record_batch_result(batch_id: str, success: bool) -> Optional[dict]:
+    key = _batch_key(batch_id)
+
+    try:
+        connection = _get_connection()
+        # Lote expirado: HINCRBY recriaria o hash sem total e sem TTL
+        if not connection.exists(key):
+            return None
+
+        pipeline = connection.pipeline()
+        pipeline.hincrby(key, 'completed', 1)
+        pipeline.hincrby(key, 'succeeded' if success else 'failed', 1)
+        # Se o hash expirar entre o EXISTS e o MULTI, o recriado ainda recebe TTL
+        pipeline.expire(key, get_batch_settings()['TTL'], nx=True)
+        pipeline.hgetall(key)
+        return _decode(pipeline.execute()[-1])
+    except Exception as exc:
+        logger.error(f'Falha ao atualizar progresso do lote {batch_id}: {str(exc)}')
+        return None
+
+
+def get_batch(batch_id: str) -> Optional[dict]:
+    raw = _get_connection().hgetall(_batch_key(batch_id))
+    return _decode(raw) if raw else None
@@ -0,0 +1,36 @@
+"""
+IP do cliente para os limites por anônimo (escalonador e conexões WebSocket).
+O X-Forwarded-For só é considerado atrás de proxies confiáveis: cada proxy acrescenta
+à direita o endereço de quem o chamou, então o cliente real é a entrada na posição
+TRUSTED_PROXY_COUNT a partir da direita. As entradas à esquerda dela vêm do próprio
+cliente e podem ser forjadas.
+"""
+
+from typing import Optional
+
+from django.conf import settings
+
+
+def get_trusted_proxy_count() -> int:
+    return getattr(settings, 'TRUSTED_PROXY_COUNT', 0)
+
+
+def resolve_client_ip(remote_addr: Optional[str], forwarded_for: Optional[str]) -> Optional[str]:
+    """
+    `remote_addr` é o endereço da conexão e `forwarded_for` o valor do X-Forwarded-For.
+    Sem proxies confiáveis, ou com um cabeçalho mais curto que a cadeia configurada,
+    vale o endereço da conexão.
+    """
+    proxy_count = get_trusted_proxy_count()
+    if proxy_count <= 0 or not forwarded_for:
+        return remote_addr
+
+    hops = [hop.strip() for hop in forwarded_for.split(',') if hop.strip()]
+    if len(hops) < proxy_count:
+        return remote_addr
+    return hops[-proxy_count]
+
+
+def get_request_ip(request) -> Optional[str]:
+    return resolve_client_ip(
+        request.META.get('REMOTE_ADDR'), request.META.get('HTTP_X_FORWARDED_FOR'))
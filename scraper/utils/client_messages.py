@@ -0,0 +1,62 @@
+"""
+Validação leve das mensagens que o cliente envia pelo WebSocket.
+Aplica as mesmas regras do SubscribeInputSerializer (que continua documentando o
+formato) sem instanciar um serializer do DRF a cada mensagem recebida.
+"""
+
+ACTIONS = ('subscribe', 'fetch_result', 'ping', 'pong')
+COMPRESSIONS = ('none', 'gzip')
+OPTIONAL_STRING_FIELDS = ('session_id', 'batch_id', 'result_id')
+
+TRUE_VALUES = (True, 'true', 'True', '1', 1)
+FALSE_VALUES = (False, 'false', 'False', '0', 0)
+
+
+def validate_client_message(content) -> tuple:
+    """
+    Retorna (dados validados, erros). Os erros seguem o formato do DRF,
+    `{campo: [mensagens]}`, e ficam vazios quando a mensagem é válida.
+    """
+    if not isinstance(content, dict):
+        return {}, {'non_field_errors': ['Dados inválidos. Era esperado um objeto.']}
+
+    errors = {}
+    data = {}
+
+    action = content.get('action')
+    if action is None:
+        errors['action'] = ['Este campo é obrigatório.']
+    elif not isinstance(action, str) or action not in ACTIONS:
+        errors['action'] = [f'"{action}" não é uma escolha válida.']
+    else:
+        data['action'] = action
+
+    for field in OPTIONAL_STRING_FIELDS:
+        value = content.get(field)
+        if value is None:
+            data[field] = None
+        elif isinstance(value, (str, int, float)) and not isinstance(value, bool):
+            # Como o CharField do DRF: espaços nas pontas são removidos e vazio é erro
+            value = str(value).strip()
+            if value:
+                data[field] = value
+            else:
+                errors[field] = ['Este campo pode não estar em branco.']
+        else:
+            errors[field] = ['Não é uma string válida.']
+
+    firehose = content.get('firehose', False)
+    if firehose in TRUE_VALUES:
+        data['firehose'] = True
+    elif firehose in FALSE_VALUES:
+        data['firehose'] = False
+    else:
+        errors['firehose'] = ['Deve ser um valor booleano válido.']
+
+    compression = content.get('compression', 'none')
+    if compression not in COMPRESSIONS:
+        errors['compression'] = [f'"{compression}" não é uma escolha válida.']
+    else:
+        data['compression'] = compression
+
+    return data, errors
@@ -0,0 +1,100 @@
+"""
+Buffer de eventos de execução por sessão em um Redis Stream com TTL curto.
+Permite reenviar ao cliente os eventos emitidos antes da inscrição no WebSocket.
+"""
+
+from typing import Optional
+
+from django.conf import settings
+
+from . import json_codec
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_SETTINGS = {
+    'TTL': 300,
+    'MAX_EVENTS': 500,
+    'KEY_PREFIX': 'lua_events',
+    'QUEUE': 'default',
+}
+
+
+def get_buffer_settings() -> dict:
+    return {
+        **DEFAULT_BUFFER_SETTINGS,
+        **getattr(settings, 'LUA_EVENT_BUFFER', {}),
+    }
+
+
+def _get_connection():
+    import django_rq
+    return django_rq.get_connection(get_buffer_settings()['QUEUE'])
+
+
+def _stream_key(session_id: str) -> str:
+    return f"{get_buffer_settings()['KEY_PREFIX']}:{session_id}"
+
+
+def parse_event_id(event_id: str) -> tuple:
+    milliseconds, _, sequence = event_id.partition('-')
+    return int(milliseconds), int(sequence or 0)
+
+
+def append_event(session_id: str, event: dict) -> Optional[str]:
+    buffer_settings = get_buffer_settings()
+    key = _stream_key(session_id)
+
+    try:
+        pipeline = _get_connection().pipeline()
+        pipeline.xadd(key, {'data': json_codec.dumps(event)},
+                      maxlen=buffer_settings['MAX_EVENTS'], approximate=True)
+        pipeline.expire(key, buffer_settings['TTL'])
+        event_id = pipeline.execute()[0]
+        return event_id.decode() if isinstance(event_id, bytes) else event_id
+    except Exception as exc:
+        logger.error('Falha ao salvar evento da sessão %s: %s', session_id, exc)
+        return None
+
+
+def append_events(events: list) -> list:
+    """Grava vários eventos (de uma ou mais sessões) em uma única ida ao Redis."""
+    if not events:
+        return []
+
+    buffer_settings = get_buffer_settings()
+
+    try:
+        pipeline = _get_connection().pipeline(transaction=False)
+        for event in events:
+            pipeline.xadd(_stream_key(event['session_id']),
+                          {'data': json_codec.dumps(event)},
+                          maxlen=buffer_settings['MAX_EVENTS'], approximate=True)
+        for session_id in {event['session_id'] for event in events}:
+            pipeline.expire(_stream_key(session_id), buffer_settings['TTL'])
+        event_ids = pipeline.execute()[:len(events)]
+        return [
+            event_id.decode() if isinstance(event_id, bytes) else event_id
+            for event_id in event_ids
+        ]
+    except Exception as exc:
+        logger.error('Falha ao salvar %s eventos: %s', len(events), exc)
+        return [None] * len(events)
+
+
+def get_events(session_id: str) -> list:
+    try:
+        entries = _get_connection().xrange(_stream_key(session_id))
+    except Exception as exc:
+        logger.error('Falha ao ler eventos da sessão %s: %s', session_id, exc)
+        return []
+
+    events = []
+    for event_id, fields in entries:
+        data = fields.get(b'data', fields.get('data'))
+        event = json_codec.loads(data)
+        event['event_id'] = event_id.decode() if isinstance(event_id, bytes) else event_id
+        events.append(event)
+
+    return events
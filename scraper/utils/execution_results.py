@@ -0,0 +1,190 @@
+"""
+Resultados completos de execuções Lua guardados no Redis por um tempo limitado.
+Os eventos de conclusão levam apenas um resumo e a referência (result_id/result_url);
+o resultado completo (HTML, resposta do Splash) é baixado pela API, inteiro ou por
+faixas de bytes, ou pelo WebSocket em blocos numerados (ação fetch_result).
+O result_id é aleatório (não é o session_id, que o cliente escolhe) e cada resultado
+guarda quem pode lê-lo: os usuários das sessões que o receberam, ou qualquer portador
+do result_id quando a execução foi anônima.
+"""
+
+import uuid
+from typing import Iterable, Optional
+
+from django.conf import settings
+
+from .json_codec import dumps_bytes
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESULTS_SETTINGS = {
+    'TTL': 3600,
+    'KEY_PREFIX': 'lua_results',
+    'QUEUE': 'default',
+    # Resultados até este tamanho seguem completos no próprio evento
+    'INLINE_MAX_BYTES': 16 * 1024,
+    # Tamanho dos blocos enviados pelo WebSocket (antes do base64)
+    'CHUNK_SIZE': 256 * 1024,
+}
+
+SUMMARY_FIELDS = ('script_executed', 'timestamp', 'screenshot_url', 'screenshot_error', 'error')
+
+# Membro do conjunto de leitores quando alguma sessão que recebeu o resultado é anônima
+ANONYMOUS_READER = '*'
+
+
+def get_results_settings() -> dict:
+    return {
+        **DEFAULT_RESULTS_SETTINGS,
+        **getattr(settings, 'LUA_RESULTS', {}),
+    }
+
+
+def _get_connection():
+    import django_rq
+    return django_rq.get_connection(get_results_settings()['QUEUE'])
+
+
+def _result_key(result_id: str) -> str:
+    return f"{get_results_settings()['KEY_PREFIX']}:{result_id}"
+
+
+def _readers_key(result_id: str) -> str:
+    return f"{_result_key(result_id)}:readers"
+
+
+def _reader(user_id: Optional[int]) -> str:
+    return str(user_id) if user_id else ANONYMOUS_READER
+
+
+def result_url(result_id: str) -> str:
+    return f"/api/lua/results/{result_id}/"
+
+
+def store_result(result_id: str, result: dict, user_id: Optional[int] = None) -> Optional[int]:
+    """Grava o resultado completo e retorna o tamanho em bytes do JSON."""
+    payload = dumps_bytes(result)
+    ttl = get_results_settings()['TTL']
+
+    try:
+        pipeline = _get_connection().pipeline()
+        pipeline.set(_result_key(result_id), payload, ex=ttl)
+        pipeline.sadd(_readers_key(result_id), _reader(user_id))
+        pipeline.expire(_readers_key(result_id), ttl)
+        pipeline.execute()
+        return len(payload)
+    except Exception as exc:
+        logger.error(f'Falha ao salvar resultado {result_id}: {exc}')
+        return None
+
+
+def grant_result(result_id: str, user_ids: Iterable[Optional[int]]):
+    """Libera a leitura para as sessões seguidoras que receberam o mesmo resultado."""
+    readers = {_reader(user_id) for user_id in user_ids}
+    if not readers:
+        return
+
+    try:
+        pipeline = _get_connection().pipeline()
+        pipeline.sadd(_readers_key(result_id), *readers)
+        pipeline.expire(_readers_key(result_id), get_results_settings()['TTL'])
+        pipeline.execute()
+    except Exception as exc:
+        logger.error(f'Falha ao liberar resultado {result_id}: {exc}')
+
+
+def can_read_result(result_id: str, user) -> bool:
+    """Usuário dono de uma das sessões, equipe, ou qualquer um se a execução foi anônima."""
+    if user is not None and user.is_authenticated and user.is_staff:
+        return True
+
+    candidates = [ANONYMOUS_READER]
+    if user is not None and user.is_authenticated:
+        candidates.append(str(user.id))
+
+    try:
+        return any(_get_connection().smismember(_readers_key(result_id), candidates))
+    except Exception as exc:
+        logger.error(f'Falha ao verificar acesso ao resultado {result_id}: {exc}')
+        return False
+
+
+def load_result_payload(result_id: str) -> Optional[bytes]:
+    """JSON do resultado como gravado, sem decodificar."""
+    try:
+        return _get_connection().get(_result_key(result_id))
+    except Exception as exc:
+        logger.error(f'Falha ao ler resultado {result_id}: {exc}')
+        return None
+
+
+def get_result_size(result_id: str) -> Optional[int]:
+    """Tamanho em bytes do JSON gravado, ou None se não existir."""
+    try:
+        return _get_connection().strlen(_result_key(result_id)) or None
+    except Exception as exc:
+        logger.error(f'Falha ao ler tamanho do resultado {result_id}: {exc}')
+        return None
+
+
+def load_result_range(result_id: str, start: int, end: int) -> Optional[bytes]:
+    """Bytes de `start` a `end` (inclusive) do JSON gravado."""
+    try:
+        return _get_connection().getrange(_result_key(result_id), start, end)
+    except Exception as exc:
+        logger.error(f'Falha ao ler faixa do resultado {result_id}: {exc}')
+        return None
+
+
+def parse_byte_range(header: str, size: int) -> Optional[tuple]:
+    """
+    Interpreta um cabeçalho Range com uma única faixa (`bytes=0-99`, `bytes=100-`
+    ou `bytes=-100`). Retorna (início, fim) inclusivo, ou None se não for satisfazível.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip() != 'bytes' or ',' in spec:
+        return None
+
+    first, _, last = spec.strip().partition('-')
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                return None
+            return max(size - length, 0), size - 1
+
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def share_result(session_id: str, result: dict, user_id: Optional[int] = None) -> dict:
+    """
+    Grava o resultado da sessão e retorna a versão que vai nos eventos: o resultado
+    inteiro se for pequeno, ou um resumo com a referência para download.
+    """
+    result_id = uuid.uuid4().hex
+    size = store_result(result_id, result, user_id)
+    if size is None:
+        logger.warning(f'Resultado da sessão {session_id} enviado completo no evento')
+        # Sem onde guardar: mantém o comportamento antigo (resultado no evento)
+        return result
+
+    if size <= get_results_settings()['INLINE_MAX_BYTES']:
+        return {**result, 'result_id': result_id, 'result_url': result_url(result_id), 'size': size}
+
+    summary = {field: result[field] for field in SUMMARY_FIELDS if field in result}
+    summary.update({
+        'result_id': result_id,
+        'result_url': result_url(result_id),
+        'size': size,
+        'truncated': True,
+    })
+    return summary
@@ -0,0 +1,126 @@
+"""
+Codec JSON plugável para o tráfego do WebSocket e do channel layer.
+Usa orjson quando instalado, depois ujson e, por fim, o json da biblioteca padrão.
+O backend pode ser fixado com JSON_CODEC['BACKEND'] (auto, orjson, ujson ou json).
+Valores que não são JSON (datas, Decimal...) viram string, como `default=str`.
+"""
+
+import json
+from collections import namedtuple
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+BACKEND_ORDER = ('orjson', 'ujson', 'json')
+
+Codec = namedtuple('Codec', ['name', 'dumps', 'dumps_bytes', 'loads'])
+
+
+def _orjson_codec():
+    import orjson
+
+    options = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj):
+        return orjson.dumps(obj, default=str, option=options)
+
+    return Codec('orjson', lambda obj: dumps_bytes(obj).decode('utf-8'), dumps_bytes, orjson.loads)
+
+
+def _ujson_codec():
+    import ujson
+
+    def dumps(obj):
+        return ujson.dumps(obj, ensure_ascii=False, default=str)
+
+    return Codec('ujson', dumps, lambda obj: dumps(obj).encode('utf-8'), ujson.loads)
+
+
+def _json_codec():
+    def dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, default=str)
+
+    return Codec('json', dumps, lambda obj: dumps(obj).encode('utf-8'), json.loads)
+
+
+CODEC_FACTORIES = {
+    'orjson': _orjson_codec,
+    'ujson': _ujson_codec,
+    'json': _json_codec,
+}
+
+
+def load_codec(backend: str = 'auto') -> Codec:
+    """Codec do backend pedido; em `auto`, o primeiro disponível de BACKEND_ORDER."""
+    if backend != 'auto':
+        return CODEC_FACTORIES[backend]()
+
+    for name in BACKEND_ORDER:
+        try:
+            return CODEC_FACTORIES[name]()
+        except ImportError:
+            continue
+
+    return _json_codec()
+
+
+def get_codec_backend() -> str:
+    try:
+        from django.conf import settings
+        if settings.configured:
+            return getattr(settings, 'JSON_CODEC', {}).get('BACKEND', 'auto')
+    except ImportError:
+        pass
+    return 'auto'
+
+
+_codec = None
+
+
+def get_codec() -> Codec:
+    global _codec
+
+    if _codec is None:
+        backend = get_codec_backend()
+        try:
+            _codec = load_codec(backend)
+        except ImportError:
+            logger.warning(f'Backend JSON {backend} não instalado; usando o automático')
+            _codec = load_codec('auto')
+        logger.debug(f'Codec JSON: {_codec.name}')
+
+    return _codec
+
+
+def dumps(obj) -> str:
+    return get_codec().dumps(obj)
+
+
+def dumps_bytes(obj) -> bytes:
+    return get_codec().dumps_bytes(obj)
+
+
+def loads(data):
+    return get_codec().loads(data)
+
+
+try:
+    from channels_redis.serializers import BaseMessageSerializer, registry
+except ImportError:
+    BaseMessageSerializer = registry = None
+else:
+    class FastJSONSerializer(BaseMessageSerializer):
+        """Serializer do channels_redis com o codec acima (serializer_format='fastjson')."""
+
+        def as_bytes(self, message, *args, **kwargs):
+            return dumps_bytes(message)
+
+        def from_bytes(self, message, *args, **kwargs):
+            return loads(message)
+
+
+def register_channel_layer_serializer():
+    # register_serializer só sobrescreve a entrada, então chamar de novo não tem efeito
+    if registry is not None:
+        registry.register_serializer('fastjson', FastJSONSerializer)
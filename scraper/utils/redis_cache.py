@@ -1,3 +1,11 @@
+"""
+Armazenamento do progresso de sessões de scraping.
+Por padrão usa um hash Redis por sessão com expiração; o backend em arquivos JSON
+(um por sessão em media/progress) continua disponível via PROGRESS_STORE['BACKEND'].
+Pode ser usado fora do Django (processos Scrapy): nesse caso a configuração vem das
+variáveis de ambiente PROGRESS_BACKEND e REDIS_URL.
+"""
+
 import json
 import time
 import os
@@ -9,35 +17,181 @@ logger = logging.getLogger(__name__)
 BASE_DIR = os.environ.get('DJANGO_BASE_DIR', os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 PROGRESS_DIR = os.path.join(BASE_DIR, 'media', 'progress')
 
-def ensure_progress_dir():
-    os.makedirs(PROGRESS_DIR, exist_ok=True)
+DEFAULT_PROGRESS_SETTINGS = {
+    'BACKEND': 'redis',
+    'REDIS_URL': 'redis://127.0.0.1:6379/1',
+    'KEY_PREFIX': 'progress',
+    'TTL': 86400,
+    'DIRECTORY': PROGRESS_DIR,
+}
+
+
+def get_progress_settings() -> dict:
+    progress_settings = dict(DEFAULT_PROGRESS_SETTINGS)
+
+    try:
+        from django.conf import settings
+        if settings.configured:
+            progress_settings['REDIS_URL'] = getattr(
+                settings, 'REDIS_URL', progress_settings['REDIS_URL'])
+            progress_settings.update(getattr(settings, 'PROGRESS_STORE', {}))
+            return progress_settings
+    except ImportError:
+        pass
+
+    progress_settings['BACKEND'] = os.environ.get('PROGRESS_BACKEND', progress_settings['BACKEND'])
+    progress_settings['REDIS_URL'] = os.environ.get('REDIS_URL', progress_settings['REDIS_URL'])
+    return progress_settings
+
+
+class FileProgressBackend:
+    """Um arquivo JSON por sessão. Mantido como alternativa quando não há Redis."""
+
+    def __init__(self, directory: str = PROGRESS_DIR, ttl: int = 86400, **options):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(self.directory, exist_ok=True)
+        self.prune()
+
+    def prune(self):
+        """Remove arquivos de progresso mais antigos que o TTL."""
+        cutoff = time.time() - self.ttl
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.name.endswith('.json') and entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def save(self, session_id: str, payload: dict):
+        with open(self._path(session_id), 'w') as f:
+            json.dump(payload, f, indent=2)
+
+    def update(self, session_id: str, fields: dict):
+        self.save(session_id, {**(self.load(session_id) or {}), **fields})
+
+    def load(self, session_id: str) -> dict | None:
+        try:
+            with open(self._path(session_id), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def delete(self, session_id: str):
+        try:
+            os.unlink(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+
+class RedisProgressBackend:
+    """
+    Um hash por sessão, com cada campo codificado em JSON para preservar os tipos.
+    Escritas usam MULTI/EXEC e renovam o TTL; a leitura é um único HGETALL.
+    """
+
+    def __init__(self, redis_url: str, key_prefix: str = 'progress', ttl: int = 86400, **options):
+        import redis
+
+        self.client = redis.Redis.from_url(redis_url)
+        self.key_prefix = key_prefix
+        self.ttl = ttl
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.key_prefix}:{session_id}"
+
+    @staticmethod
+    def _encode(fields: dict) -> dict:
+        return {
+            field: json.dumps(value, ensure_ascii=False, default=str)
+            for field, value in fields.items()
+        }
+
+    def save(self, session_id: str, payload: dict):
+        key = self._key(session_id)
+        with self.client.pipeline(transaction=True) as pipeline:
+            pipeline.delete(key)
+            pipeline.hset(key, mapping=self._encode(payload))
+            pipeline.expire(key, self.ttl)
+            pipeline.execute()
+
+    def update(self, session_id: str, fields: dict):
+        key = self._key(session_id)
+        with self.client.pipeline(transaction=True) as pipeline:
+            pipeline.hset(key, mapping=self._encode(fields))
+            pipeline.expire(key, self.ttl)
+            pipeline.execute()
+
+    def load(self, session_id: str) -> dict | None:
+        raw = self.client.hgetall(self._key(session_id))
+        if not raw:
+            return None
+
+        return {
+            field.decode(): json.loads(value)
+            for field, value in raw.items()
+        }
+
+    def delete(self, session_id: str):
+        self.client.delete(self._key(session_id))
+
+
+_backend = None
+
+
+def get_progress_backend():
+    global _backend
+
+    if _backend is None:
+        progress_settings = get_progress_settings()
+        if progress_settings['BACKEND'] == 'file':
+            _backend = FileProgressBackend(
+                progress_settings['DIRECTORY'], ttl=progress_settings['TTL'])
+        else:
+            _backend = RedisProgressBackend(
+                progress_settings['REDIS_URL'],
+                key_prefix=progress_settings['KEY_PREFIX'],
+                ttl=progress_settings['TTL'],
+            )
+
+    return _backend
 
 
 def cache_progress(session_id: str, data: dict):
+    """Substitui o progresso da sessão por `data` (com timestamp)."""
     try:
-        ensure_progress_dir()
-        progress_file = os.path.join(PROGRESS_DIR, f"{session_id}.json")
         payload = {
             'timestamp': time.time(),
             **data
         }
-        with open(progress_file, 'w') as f:
-            json.dump(payload, f, indent=2)
+        get_progress_backend().save(session_id, payload)
         logger.debug(f'Progresso salvo para sessão {session_id}: {data.get("message", "")}')
     except Exception as exc:
-        logger.error('Falha ao salvar progresso: %s', exc)
+        logger.error(f'Falha ao salvar progresso: {exc}')
 
 
-def get_progress(session_id: str) -> dict | None:   
+def update_progress(session_id: str, **fields):
+    """Atualiza apenas os campos informados, preservando os demais."""
     try:
-        ensure_progress_dir()
-        progress_file = os.path.join(PROGRESS_DIR, f"{session_id}.json")
-        if not os.path.exists(progress_file):
-            return None
+        get_progress_backend().update(session_id, {'timestamp': time.time(), **fields})
+    except Exception as exc:
+        logger.error(f'Falha ao atualizar progresso: {exc}')
 
-        with open(progress_file, 'r') as f:
-            return json.load(f)
+
+def get_progress(session_id: str) -> dict | None:
+    try:
+        return get_progress_backend().load(session_id)
     except Exception as exc:
-        logger.error('Falha ao ler progresso: %s', exc)
+        logger.error(f'Falha ao ler progresso: {exc}')
         return None
 
+
+def clear_progress(session_id: str):
+    try:
+        get_progress_backend().delete(session_id)
+    except Exception as exc:
+        logger.error(f'Falha ao remover progresso: {exc}')
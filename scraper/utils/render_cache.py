@@ -0,0 +1,155 @@
+"""
+Cache em disco de renderizações do Splash, em um único arquivo SQLite.
+A chave combina endpoint, URL, hash do código Lua e os argumentos relevantes da
+renderização, sempre calculada sobre o corpo enviado ao Splash (make_splash_key), de
+modo que Scrapy e editor Lua acertam as mesmas entradas para a mesma requisição.
+Os corpos são comprimidos com zlib; entradas expiram pelo TTL e, acima do tamanho
+máximo, as menos usadas recentemente são removidas.
+Não depende do Django: é usado tanto pelo Scrapy quanto por execute_lua_script.
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Argumentos que não alteram o resultado da renderização
+IGNORED_ARGS = {'timeout', 'resource_timeout', 'lua_source', 'save_args', 'load_args'}
+
+# A expiração e o limite de tamanho são verificados a cada N gravações
+EVICT_EVERY = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS render_cache (
+    key TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS render_cache_accessed ON render_cache (accessed_at);
+CREATE INDEX IF NOT EXISTS render_cache_created ON render_cache (created_at);
+"""
+
+
+def make_render_key(url: str, lua_source: str = '', args: Optional[dict] = None) -> str:
+    relevant_args = {
+        key: value for key, value in (args or {}).items()
+        if key not in IGNORED_ARGS
+    }
+    lua_hash = hashlib.sha256((lua_source or '').encode('utf-8')).hexdigest()
+    normalized = json.dumps(
+        [url or '', lua_hash, relevant_args],
+        sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def make_splash_key(endpoint: str, splash_args: dict) -> str:
+    """Chave de uma requisição ao Splash: endpoint (ex.: 'execute') e argumentos enviados."""
+    return make_render_key(
+        splash_args.get('url', ''),
+        splash_args.get('lua_source', ''),
+        {**splash_args, 'endpoint': (endpoint or '').strip('/')},
+    )
+
+
+class RenderCache:
+    def __init__(self, path: str, ttl: float = 86400, max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(SCHEMA)
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT status, headers, body, created_at FROM render_cache WHERE key = ?',
+                (key,)).fetchone()
+            if row is None:
+                return None
+
+            status, headers, body, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                self._connection.execute('DELETE FROM render_cache WHERE key = ?', (key,))
+                return None
+
+            self._connection.execute(
+                'UPDATE render_cache SET accessed_at = ? WHERE key = ?', (now, key))
+
+        return {
+            'status': status,
+            'headers': json.loads(headers),
+            'body': zlib.decompress(body),
+            'created_at': created_at,
+        }
+
+    def set(self, key: str, status: int, body: bytes, headers: Optional[dict] = None):
+        compressed = zlib.compress(body, 6)
+        now = time.time()
+
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO render_cache '
+                '(key, status, headers, body, size, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, status, json.dumps(headers or {}), compressed,
+                 len(compressed), now, now))
+
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 1:
+                self._evict()
+
+    def _evict(self):
+        if self.ttl:
+            self._connection.execute(
+                'DELETE FROM render_cache WHERE created_at < ?', (time.time() - self.ttl,))
+
+        if not self.max_bytes:
+            return
+
+        total = self._connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM render_cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Remove as menos acessadas até ficar 10% abaixo do limite
+        target = total - int(self.max_bytes * 0.9)
+        removed = 0
+        victims = []
+        for key, size in self._connection.execute(
+                'SELECT key, size FROM render_cache ORDER BY accessed_at'):
+            victims.append((key,))
+            removed += size
+            if removed >= target:
+                break
+
+        self._connection.executemany('DELETE FROM render_cache WHERE key = ?', victims)
+        logger.debug(f'{len(victims)} renderizações removidas do cache ({removed} bytes)')
+
+    def delete(self, key: str):
+        with self._lock:
+            self._connection.execute('DELETE FROM render_cache WHERE key = ?', (key,))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,104 @@
+"""
+Cache de resultados de execuções Lua no Redis.
+A chave é o hash do script já embrulhado e dos argumentos normalizados; as entradas
+expiram por TTL e as mais antigas são removidas quando o limite de tamanho é atingido.
+"""
+
+import json
+import time
+import hashlib
+from typing import Optional
+
+from django.conf import settings
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SETTINGS = {
+    'ENABLED': False,
+    'TTL': 300,
+    'MAX_ENTRIES': 1000,
+    'KEY_PREFIX': 'lua_result_cache',
+    'QUEUE': 'default',
+}
+
+
+def get_cache_settings() -> dict:
+    return {
+        **DEFAULT_CACHE_SETTINGS,
+        **getattr(settings, 'LUA_RESULT_CACHE', {}),
+    }
+
+
+def _get_connection():
+    import django_rq
+    return django_rq.get_connection(get_cache_settings()['QUEUE'])
+
+
+def _index_key() -> str:
+    return f"{get_cache_settings()['KEY_PREFIX']}:index"
+
+
+def make_cache_key(lua_script: str, args: dict) -> str:
+    from ..services.lua_executor import wrap_lua_script
+
+    normalized = json.dumps(
+        {'script': wrap_lua_script(lua_script), 'args': args},
+        sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    digest = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+    return f"{get_cache_settings()['KEY_PREFIX']}:{digest}"
+
+
+def is_cache_enabled(request_cache: Optional[bool] = None) -> bool:
+    if request_cache is False:
+        return False
+    return bool(get_cache_settings()['ENABLED'])
+
+
+def get_cached_result(cache_key: str, max_age: Optional[float] = None) -> Optional[dict]:
+    try:
+        payload = _get_connection().get(cache_key)
+        if payload is None:
+            return None
+
+        entry = json.loads(payload)
+        if max_age is not None and time.time() - entry['cached_at'] > max_age:
+            return None
+
+        return {
+            **entry['result'],
+            'cached': True,
+            'cached_at': entry['cached_at'],
+        }
+    except Exception as exc:
+        logger.error('Falha ao ler cache de resultado: %s', exc)
+        return None
+
+
+def set_cached_result(cache_key: str, result: dict):
+    cache_settings = get_cache_settings()
+    ttl = cache_settings['TTL']
+    now = time.time()
+
+    try:
+        connection = _get_connection()
+        index_key = _index_key()
+
+        pipeline = connection.pipeline()
+        pipeline.set(cache_key, json.dumps(
+            {'cached_at': now, 'result': result}, default=str), ex=ttl)
+        pipeline.zadd(index_key, {cache_key: now})
+        # Entradas já expiradas pelo TTL só precisam sair do índice
+        pipeline.zremrangebyscore(index_key, 0, now - ttl)
+        pipeline.zcard(index_key)
+        size = pipeline.execute()[-1]
+
+        excess = size - cache_settings['MAX_ENTRIES']
+        if excess > 0:
+            evicted = [key for key, _ in connection.zpopmin(index_key, excess)]
+            if evicted:
+                connection.delete(*evicted)
+                logger.debug(f'{len(evicted)} resultados removidos do cache')
+    except Exception as exc:
+        logger.error('Falha ao salvar cache de resultado: %s', exc)
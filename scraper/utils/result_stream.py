@@ -0,0 +1,149 @@
+"""
+Gravação e leitura de resultados de scraping em JSON Lines.
+Cada item é anexado ao arquivo da sessão (opcionalmente comprimido com gzip ou zstd),
+sem reler o que já foi gravado. O formato antigo (array JSON em {session}_results.json)
+pode ser reconstruído sob demanda por `materialize_json_array`.
+"""
+
+import io
+import os
+import gzip
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_EXTENSIONS = {
+    'none': '',
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+def result_path(results_dir: str, session_id: str, compression: str = 'none') -> str:
+    return os.path.join(
+        results_dir, f"{session_id}_results.jsonl{COMPRESSION_EXTENSIONS[compression]}")
+
+
+def legacy_result_path(results_dir: str, session_id: str) -> str:
+    return os.path.join(results_dir, f"{session_id}_results.json")
+
+
+class JsonLinesWriter:
+    """
+    Mantém o arquivo da sessão aberto em modo append. Os dados vão para o disco
+    (flush + fsync) a cada `fsync_every` itens e no `close`.
+    """
+
+    def __init__(self, path: str, compression: str = 'none', fsync_every: int = 100):
+        self.path = path
+        self.compression = compression
+        self.fsync_every = fsync_every
+        self.pending = 0
+        self.count = 0
+
+        self._raw = open(path, 'ab')
+        if compression == 'gzip':
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode='ab')
+        elif compression == 'zstd':
+            import zstandard
+            self._stream = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = self._raw
+
+    def write(self, item: dict):
+        line = json.dumps(item, ensure_ascii=False, default=str) + '\n'
+        self._stream.write(line.encode('utf-8'))
+        self.count += 1
+        self.pending += 1
+
+        if self.fsync_every and self.pending >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        if self._stream is not self._raw:
+            if self.compression == 'zstd':
+                import zstandard
+                self._stream.flush(zstandard.FLUSH_BLOCK)
+            else:
+                self._stream.flush()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self.pending = 0
+
+    def close(self):
+        try:
+            if self.pending:
+                self.sync()
+            if self._stream is not self._raw:
+                self._stream.close()
+        finally:
+            self._raw.close()
+
+
+def _open_for_read(path: str):
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8')
+    if path.endswith('.zst'):
+        import zstandard
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            open(path, 'rb'), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def find_result_file(results_dir: str, session_id: str):
+    for compression in COMPRESSION_EXTENSIONS:
+        path = result_path(results_dir, session_id, compression)
+        if os.path.exists(path):
+            return path
+
+    path = legacy_result_path(results_dir, session_id)
+    return path if os.path.exists(path) else None
+
+
+def iter_results(results_dir: str, session_id: str):
+    """Itera os itens da sessão, seja em JSON Lines (comprimido ou não) ou no array legado."""
+    path = find_result_file(results_dir, session_id)
+    if path is None:
+        return
+
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+        return
+
+    with _open_for_read(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Última linha incompleta de um crawl interrompido
+                logger.warning(f'Linha {line_number} inválida em {path}')
+
+
+def read_results(results_dir: str, session_id: str) -> list:
+    return list(iter_results(results_dir, session_id))
+
+
+def materialize_json_array(results_dir: str, session_id: str) -> str:
+    """Grava {session}_results.json no formato antigo (array JSON) e retorna o caminho."""
+    target = legacy_result_path(results_dir, session_id)
+    source = find_result_file(results_dir, session_id)
+    if source == target:
+        return target
+
+    tmp_path = f'{target}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for index, item in enumerate(iter_results(results_dir, session_id)):
+            if index:
+                f.write(',')
+            f.write('\n  ')
+            f.write(json.dumps(item, ensure_ascii=False, default=str))
+        f.write('\n]')
+
+    os.replace(tmp_path, target)
+    return target
@@ -0,0 +1,167 @@
+"""
+Coalescência de execuções idênticas em andamento (single-flight).
+A primeira requisição para um script + args vira a líder e enfileira o job; as que
+chegam enquanto ela roda se anexam como seguidoras e recebem os mesmos eventos.
+Guardado no Redis: uma chave com o session_id e o job_id da líder e uma lista de
+seguidoras por líder. A entrada e a saída usam WATCH, então uma seguidora nunca fica presa a um
+voo que já terminou: nesse caso ela vira a nova líder.
+"""
+
+import json
+import hashlib
+from typing import Optional
+
+from django.conf import settings
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLIGHT_SETTINGS = {
+    'ENABLED': True,
+    'TTL': 600,
+    'KEY_PREFIX': 'lua_flight',
+    'QUEUE': 'default',
+}
+
+# Tentativas antes de desistir de coalescer (a requisição segue como líder)
+MAX_ATTEMPTS = 5
+
+
+def get_flight_settings() -> dict:
+    return {
+        **DEFAULT_FLIGHT_SETTINGS,
+        **getattr(settings, 'LUA_SINGLE_FLIGHT', {}),
+    }
+
+
+def is_flight_enabled() -> bool:
+    return bool(get_flight_settings()['ENABLED'])
+
+
+def _get_connection():
+    import django_rq
+    return django_rq.get_connection(get_flight_settings()['QUEUE'])
+
+
+def _decode(value) -> Optional[str]:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _parse_flight(value) -> tuple:
+    """Valor da chave do voo: `session_id|job_id` da líder."""
+    value = _decode(value)
+    if value is None:
+        return None, None
+    leader_session_id, separator, job_id = value.rpartition('|')
+    return (leader_session_id, job_id) if separator else (value, None)
+
+
+def _followers_key(flight_key: str, leader_session_id: str) -> str:
+    return f"{flight_key}:followers:{leader_session_id}"
+
+
+def make_flight_key(lua_script: str, args: dict) -> str:
+    from ..services.lua_executor import wrap_lua_script
+
+    normalized = json.dumps(
+        {'script': wrap_lua_script(lua_script), 'args': args},
+        sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    digest = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+    return f"{get_flight_settings()['KEY_PREFIX']}:{digest}"
+
+
+def join_flight(flight_key: str, session_id: str, job_id: str, steps: list = None,
+                execution_id: int = None, user_id: int = None) -> Optional[tuple]:
+    """
+    Entra no voo de `flight_key`. Retorna None quando a sessão vira a líder (e deve
+    enfileirar o job com `job_id`) ou `(session_id, job_id)` da líder quando foi
+    anexada como seguidora. O job_id da líder é gravado junto com o voo, então a
+    seguidora sempre recebe um job real, mesmo antes de o job ser enfileirado.
+    """
+    import redis
+
+    ttl = get_flight_settings()['TTL']
+    follower = json.dumps({
+        'session_id': session_id,
+        'steps': steps or [],
+        'execution_id': execution_id,
+        'user_id': user_id,
+    }, default=str)
+
+    try:
+        connection = _get_connection()
+        for _ in range(MAX_ATTEMPTS):
+            if connection.set(flight_key, f'{session_id}|{job_id}', nx=True, ex=ttl):
+                return None
+
+            with connection.pipeline() as pipeline:
+                try:
+                    pipeline.watch(flight_key)
+                    leader_session_id, leader_job_id = _parse_flight(pipeline.get(flight_key))
+                    if leader_session_id is None:
+                        continue
+                    if leader_session_id == session_id:
+                        return leader_session_id, leader_job_id
+
+                    followers_key = _followers_key(flight_key, leader_session_id)
+                    pipeline.multi()
+                    pipeline.rpush(followers_key, follower)
+                    pipeline.expire(followers_key, ttl)
+                    pipeline.execute()
+                    return leader_session_id, leader_job_id
+                except redis.WatchError:
+                    continue
+
+    except Exception as exc:
+        logger.error(f'Falha ao coalescer execução {flight_key}: {exc}')
+
+    return None
+
+
+def get_followers(flight_key: str, leader_session_id: str) -> list:
+    """Seguidoras anexadas até agora, sem removê-las do voo."""
+    try:
+        raw = _get_connection().lrange(_followers_key(flight_key, leader_session_id), 0, -1)
+    except Exception as exc:
+        logger.error(f'Falha ao ler seguidoras do voo {flight_key}: {exc}')
+        return []
+
+    return [json.loads(entry) for entry in raw]
+
+
+def finish_flight(flight_key: str, leader_session_id: str) -> list:
+    """
+    Encerra o voo da líder e retorna todas as seguidoras. Depois disso, novas
+    requisições idênticas abrem um novo voo. Também é chamado quando o job da líder
+    não chega a rodar (falha ao enfileirar, job abandonado), para não deixar o voo
+    preso até o TTL.
+    """
+    import redis
+
+    followers_key = _followers_key(flight_key, leader_session_id)
+
+    try:
+        connection = _get_connection()
+        for _ in range(MAX_ATTEMPTS):
+            with connection.pipeline() as pipeline:
+                try:
+                    pipeline.watch(flight_key)
+                    is_leader = _parse_flight(pipeline.get(flight_key))[0] == leader_session_id
+
+                    pipeline.multi()
+                    pipeline.lrange(followers_key, 0, -1)
+                    pipeline.delete(followers_key)
+                    if is_leader:
+                        pipeline.delete(flight_key)
+                    raw = pipeline.execute()[0]
+                    return [json.loads(entry) for entry in raw]
+                except redis.WatchError:
+                    continue
+
+        logger.warning(f'Voo {flight_key} não encerrado após {MAX_ATTEMPTS} tentativas')
+
+    except Exception as exc:
+        logger.error(f'Falha ao encerrar voo {flight_key}: {exc}')
+
+    return []
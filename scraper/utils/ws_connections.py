@@ -0,0 +1,194 @@
+"""
+Contabilidade e limites das conexões WebSocket.
+Cada conexão aberta fica registrada em um sorted set por dono (usuário autenticado
+ou IP dos anônimos) com o horário do último heartbeat. Conexões de processos que
+morreram sem desconectar (deploy, crash) param de ser renovadas e saem da contagem
+depois de STALE_AFTER segundos, sem ficar ocupando o limite para sempre.
+Com ACCOUNTING='local' a contagem é só do processo atual; com 'off' não há limite.
+"""
+
+import time
+from typing import Optional
+
+from django.conf import settings
+
+from .client_ip import resolve_client_ip
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WS_SETTINGS = {
+    'MAX_CONNECTIONS_PER_USER': 20,
+    # Conexões anônimas são contadas por IP
+    'MAX_CONNECTIONS_PER_IP': 50,
+    'HEARTBEAT_INTERVAL': 25,
+    # Sem nenhuma mensagem do cliente (pong incluído) por este tempo, a conexão é fechada
+    'IDLE_TIMEOUT': 75,
+    'SEND_QUEUE_SIZE': 256,
+    # drop_oldest | drop_newest | close
+    'SEND_QUEUE_POLICY': 'drop_oldest',
+    # Tempo máximo esperando o cliente aceitar um frame antes de fechar a conexão
+    'SEND_TIMEOUT': 10,
+    # Reinscrição periódica nos grupos, para que expirem no channel layer se o processo morrer
+    'GROUP_REFRESH_INTERVAL': 300,
+    # redis | local | off
+    'ACCOUNTING': 'redis',
+    'KEY_PREFIX': 'ws_connections',
+    'QUEUE': 'default',
+}
+
+# Códigos de fechamento (faixa 4000-4999, reservada para a aplicação)
+CLOSE_CONNECTION_LIMIT = 4429
+CLOSE_IDLE_TIMEOUT = 4408
+CLOSE_SLOW_CONSUMER = 4503
+
+# Conexões por dono quando ACCOUNTING='local': {dono: {channel_name: último heartbeat}}
+_local_connections = {}
+
+
+def get_ws_settings() -> dict:
+    return {
+        **DEFAULT_WS_SETTINGS,
+        **getattr(settings, 'WS_LIMITS', {}),
+    }
+
+
+def _get_connection():
+    import django_rq
+    return django_rq.get_connection(get_ws_settings()['QUEUE'])
+
+
+def _connections_key(owner: str) -> str:
+    return f"{get_ws_settings()['KEY_PREFIX']}:{owner}"
+
+
+def stale_after() -> int:
+    """Idade a partir da qual uma conexão sem heartbeat deixa de contar."""
+    return get_ws_settings()['IDLE_TIMEOUT'] * 2
+
+
+def connection_owner(scope: dict) -> Optional[str]:
+    """
+    Usuário autenticado ou IP do cliente. Atrás do nginx o endereço da conexão é o do
+    proxy, então o IP vem do X-Forwarded-For com a mesma regra de proxies confiáveis
+    (TRUSTED_PROXY_COUNT) usada no escalonador.
+    """
+    user = scope.get('user')
+    if user is not None and user.is_authenticated:
+        return f"user:{user.id}"
+
+    client = scope.get('client')
+    forwarded_for = ','.join(
+        value.decode('latin-1') for name, value in scope.get('headers', [])
+        if name.lower() == b'x-forwarded-for')
+    address = resolve_client_ip(client[0] if client else None, forwarded_for)
+    if address:
+        return f"ip:{address}"
+    return None
+
+
+def connection_limit(owner: str) -> int:
+    ws_settings = get_ws_settings()
+    if owner.startswith('user:'):
+        return ws_settings['MAX_CONNECTIONS_PER_USER']
+    return ws_settings['MAX_CONNECTIONS_PER_IP']
+
+
+def register_connection(owner: Optional[str], channel_name: str) -> bool:
+    """
+    Registra a conexão e retorna False se o dono já atingiu o limite (nesse caso
+    ela não fica registrada). Falhas no Redis liberam a conexão.
+    """
+    accounting = get_ws_settings()['ACCOUNTING']
+    if owner is None or accounting == 'off':
+        return True
+
+    now = time.time()
+    limit = connection_limit(owner)
+
+    if accounting == 'local':
+        connections = _local_connections.setdefault(owner, {})
+        for stale in [name for name, seen in connections.items() if seen < now - stale_after()]:
+            del connections[stale]
+        if len(connections) >= limit:
+            return False
+        connections[channel_name] = now
+        return True
+
+    key = _connections_key(owner)
+    try:
+        connection = _get_connection()
+        pipeline = connection.pipeline()
+        pipeline.zremrangebyscore(key, 0, now - stale_after())
+        pipeline.zadd(key, {channel_name: now})
+        pipeline.zcard(key)
+        pipeline.expire(key, stale_after())
+        count = pipeline.execute()[2]
+
+        if count > limit:
+            connection.zrem(key, channel_name)
+            return False
+        return True
+    except Exception as exc:
+        logger.error(f'Falha ao registrar conexão WebSocket de {owner}: {exc}')
+        return True
+
+
+def touch_connection(owner: Optional[str], channel_name: str):
+    """Renova o registro da conexão (chamado a cada heartbeat)."""
+    accounting = get_ws_settings()['ACCOUNTING']
+    if owner is None or accounting == 'off':
+        return
+
+    now = time.time()
+
+    if accounting == 'local':
+        connections = _local_connections.get(owner)
+        if connections is not None and channel_name in connections:
+            connections[channel_name] = now
+        return
+
+    key = _connections_key(owner)
+    try:
+        pipeline = _get_connection().pipeline()
+        pipeline.zadd(key, {channel_name: now}, xx=True)
+        pipeline.expire(key, stale_after())
+        pipeline.execute()
+    except Exception as exc:
+        logger.error(f'Falha ao renovar conexão WebSocket de {owner}: {exc}')
+
+
+def unregister_connection(owner: Optional[str], channel_name: str):
+    accounting = get_ws_settings()['ACCOUNTING']
+    if owner is None or accounting == 'off':
+        return
+
+    if accounting == 'local':
+        connections = _local_connections.get(owner, {})
+        connections.pop(channel_name, None)
+        if not connections:
+            _local_connections.pop(owner, None)
+        return
+
+    try:
+        _get_connection().zrem(_connections_key(owner), channel_name)
+    except Exception as exc:
+        logger.error(f'Falha ao remover conexão WebSocket de {owner}: {exc}')
+
+
+def count_connections(owner: str) -> int:
+    accounting = get_ws_settings()['ACCOUNTING']
+    if accounting == 'off':
+        return 0
+    if accounting == 'local':
+        return len(_local_connections.get(owner, {}))
+
+    try:
+        key = _connections_key(owner)
+        connection = _get_connection()
+        connection.zremrangebyscore(key, 0, time.time() - stale_after())
+        return connection.zcard(key)
+    except Exception as exc:
+        logger.error(f'Falha ao contar conexões WebSocket de {owner}: {exc}')
+        return 0
@@ -1,14 +1,36 @@
 
 import json
 import uuid
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 from drf_spectacular.utils import extend_schema
+from channels.layers import get_channel_layer
 
-from ..utils.error_responses import validation_error, not_found_error, internal_server_error
-from ..services.lua_executor import run_lua_script_job
+from ..utils.error_responses import error_response, validation_error, not_found_error, internal_server_error
+from ..services.lua_executor import deliver_cached_result_job, fail_job
+from ..services.execution_scheduler import (
+    LANE_BULK,
+    LANE_INTERACTIVE,
+    get_owner,
+    submit_execution,
+    submit_executions,
+)
+from ..services.script_validator import validate_script, format_violation
+from ..utils.result_cache import is_cache_enabled, make_cache_key, get_cached_result
+from ..utils.batch_progress import create_batch, get_batch, get_batch_settings
+from ..utils.execution_results import (
+    can_read_result,
+    get_result_size,
+    load_result_payload,
+    load_result_range,
+    parse_byte_range,
+)
+from ..utils.single_flight import is_flight_enabled, make_flight_key, join_flight
 from ..models import Script, ScriptExecution
 
 import django_rq
@@ -17,6 +39,32 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def validate_lua_script(lua_script: str):
+    """Retorna a resposta de erro de validação do script, ou None se válido."""
+    violations = validate_script(lua_script)
+    if not violations:
+        return None
+
+    return validation_error(
+        format_violation(violations[0]),
+        errors={'script': [format_violation(violation) for violation in violations]})
+
+
+def get_user_script(request, script_id):
+    """Retorna (script, resposta_de_erro) para o script_id opcional da requisição."""
+    if not script_id:
+        return None, None
+
+    # Se script_id for fornecido, o usuário deve estar autenticado
+    if not request.user.is_authenticated:
+        return None, validation_error('script_id requer autenticação')
+
+    try:
+        return Script.objects.get(id=script_id, user=request.user), None
+    except Script.DoesNotExist:
+        return None, not_found_error('Script não encontrado ou não pertence ao usuário')
+
+
 class ExecuteLuaScriptAsyncView(APIView):
     permission_classes = [AllowAny]
 
@@ -44,9 +92,18 @@ inscreva-se na sessão retornada.
 5. Receba notificações de progresso e resultado via WebSocket
 
 **Tipos de mensagens WebSocket recebidas:**
-- `lua_execution_progress`: Progresso de cada passo da execução
+- `lua_execution_progress`: Progresso de um passo da execução
+- `lua_execution_steps`: Progresso de vários passos em uma única mensagem (`steps`)
 - `lua_execution_completed`: Execução finalizada com sucesso
 - `lua_execution_error`: Erro durante a execução
+
+Se um script idêntico (mesmo código e args) já estiver em execução, a requisição é
+anexada a ela (`coalesced: true`) e recebe os mesmos eventos na própria sessão.
+
+Resultados grandes chegam em `lua_execution_completed` apenas como resumo (`truncated: true`).
+O resultado completo pode ser baixado em `result_url` (com suporte a `Range`) ou pelo
+WebSocket com `{"action": "fetch_result", "result_id": "...", "compression": "gzip"}`,
+que responde com blocos `lua_result_chunk` numerados.
 """,
         request={
             'application/json': {
@@ -82,6 +139,14 @@ inscreva-se na sessão retornada.
                     'script_id': {
                         'type': 'integer',
                         'description': 'ID do script salvo (opcional, para usuários autenticados)'
+                    },
+                    'cache': {
+                        'type': 'boolean',
+                        'description': 'Use false para ignorar o cache de resultados (opcional)'
+                    },
+                    'max_age': {
+                        'type': 'number',
+                        'description': 'Idade máxima em segundos de um resultado em cache (opcional)'
                     }
                 },
                 'required': ['script', 'args']
@@ -96,6 +161,8 @@ inscreva-se na sessão retornada.
                             'session_id': '550e8400-e29b-41d4-a716-446655440000',
                             'job_id': 'abc123',
                             'status': 'enqueued',
+                            'cached': False,
+                            'coalesced': False,
                             'message': 'Script Lua enfileirado para execução',
                             'websocket_url': 'ws://localhost:8000/ws/notifications/',
                             'note': 'Conecte-se ao WebSocket e inscreva-se usando o session_id para receber atualizações'
@@ -148,44 +215,27 @@ inscreva-se na sessão retornada.
             args = data.get('args', {})
             steps = data.get('steps', [])
             script_id = data.get('script_id')
+            use_cache = data.get('cache')
+            max_age = data.get('max_age')
             session_id = data.get('session_id', '').strip(
             ) if data.get('session_id') else None
 
             # Log para debug
             logger.info(f'Session ID recebido: {session_id}')
 
-            if not lua_script:
-                return validation_error('Script Lua é obrigatório')
-
-            if len(lua_script) > 10000:
-                return validation_error('Script Lua muito longo (máx. 10KB)')
+            script_error = validate_lua_script(lua_script)
+            if script_error:
+                return script_error
 
             if not isinstance(args, dict):
                 return validation_error('args deve ser um objeto JSON')
 
-            dangerous_patterns = [
-                'os.execute', 'io.popen', 'loadfile', 'dofile',
-                'require.*os', 'require.*io', 'package.loadlib'
-            ]
+            if max_age is not None and (not isinstance(max_age, (int, float)) or max_age < 0):
+                return validation_error('max_age deve ser um número não negativo')
 
-            import re
-            for pattern in dangerous_patterns:
-                if re.search(pattern, lua_script, re.IGNORECASE):
-                    return validation_error(f'Comando perigoso detectado: {pattern}')
-
-            if 'function main' not in lua_script:
-                return validation_error('Script deve conter uma função main(splash, args)')
-
-            script = None
-            if script_id:
-                # Se script_id for fornecido, o usuário deve estar autenticado
-                if not request.user.is_authenticated:
-                    return validation_error('script_id requer autenticação')
-                try:
-                    script = Script.objects.get(
-                        id=script_id, user=request.user)
-                except Script.DoesNotExist:
-                    return not_found_error('Script não encontrado ou não pertence ao usuário')
+            script, error = get_user_script(request, script_id)
+            if error:
+                return error
 
             execution = None
             if request.user.is_authenticated and script:
@@ -202,23 +252,69 @@ inscreva-se na sessão retornada.
             else:
                 logger.info(f'Usando session_id fornecido: {session_id}')
 
-            queue = django_rq.get_queue('lua_execution', default_timeout=300)
-            job = queue.enqueue(
-                run_lua_script_job,
-                session_id,
-                lua_script,
-                args,
-                steps,
-                execution.id if execution else None
-            )
+            cache_key = None
+            cached_result = None
+            if is_cache_enabled(use_cache):
+                cache_key = make_cache_key(lua_script, args)
+                cached_result = get_cached_result(cache_key, max_age)
 
-            logger.info(
-                f'Job Lua enfileirado: {job.id} para sessão {session_id}')
+            user_id = request.user.id if request.user.is_authenticated else None
+
+            # Execuções idênticas em andamento são coalescidas: a sessão recebe os
+            # eventos da execução líder em vez de enfileirar outra renderização
+            flight_key = None
+            leader = None
+            job_id = str(uuid.uuid4())
+            if not cached_result and is_flight_enabled():
+                flight_key = make_flight_key(lua_script, args)
+                leader = join_flight(
+                    flight_key, session_id, job_id, steps, execution.id if execution else None, user_id)
+
+            if cached_result:
+                queue = django_rq.get_queue('lua_execution', default_timeout=300)
+                job_id = queue.enqueue(
+                    deliver_cached_result_job,
+                    session_id,
+                    cached_result,
+                    steps,
+                    execution.id if execution else None,
+                    user_id
+                ).id
+                logger.info(
+                    f'Resultado em cache para sessão {session_id}: {job_id}')
+            elif leader:
+                leader_session_id, job_id = leader
+                logger.info(
+                    f'Sessão {session_id} anexada à execução da sessão {leader_session_id}')
+            else:
+                try:
+                    submit_execution(get_owner(request), LANE_INTERACTIVE, [
+                        session_id,
+                        lua_script,
+                        args,
+                        steps,
+                        execution.id if execution else None,
+                        cache_key,
+                        None,
+                        flight_key,
+                        user_id
+                    ], job_id=job_id)
+                except Exception as e:
+                    # Sem job, o voo ficaria preso até o TTL com as seguidoras esperando
+                    if flight_key:
+                        fail_job(get_channel_layer(), session_id,
+                                 f'Falha ao enfileirar execução: {str(e)}',
+                                 execution, flight_key, user_id=user_id)
+                    raise
+                logger.info(
+                    f'Job Lua enfileirado: {job_id} para sessão {session_id}')
 
             return Response({
                 'session_id': session_id,
-                'job_id': job.id,
+                'job_id': job_id,
                 'status': 'enqueued',
+                'cached': bool(cached_result),
+                'coalesced': bool(leader),
                 'message': 'Script Lua enfileirado para execução'
             }, status=status.HTTP_200_OK)
 
@@ -228,3 +324,232 @@ inscreva-se na sessão retornada.
             logger.error(
                 f'Erro ao iniciar execução Lua assíncrona: {str(e)}', exc_info=True)
             return internal_server_error(f'Erro interno: {str(e)}')
+
+
+class ExecuteLuaScriptBatchView(APIView):
+    permission_classes = [AllowAny]
+
+    @extend_schema(
+        tags=['script-executions'],
+        summary='Executar script Lua em lote',
+        description="""
+Executa o mesmo script Lua para vários conjuntos de argumentos (ex.: uma lista de URLs).
+O script é validado uma única vez e os jobs são enfileirados em blocos.
+
+Cada item recebe o `session_id` `<batch_id>-<índice>`. O progresso agregado é enviado
+via WebSocket (`lua_batch_progress`) para quem se inscrever com o `batch_id`:
+```json
+{
+  "action": "subscribe",
+  "batch_id": "batch-id-retornado"
+}
+```
+""",
+        request={
+            'application/json': {
+                'type': 'object',
+                'properties': {
+                    'script': {
+                        'type': 'string',
+                        'description': 'Script Lua a ser executado'
+                    },
+                    'args_list': {
+                        'type': 'array',
+                        'description': 'Lista de argumentos, um job por item',
+                        'items': {'type': 'object'},
+                        'example': [{'url': 'https://example.com'}, {'url': 'https://example.org'}]
+                    },
+                    'script_id': {
+                        'type': 'integer',
+                        'description': 'ID do script salvo (opcional, para usuários autenticados)'
+                    }
+                },
+                'required': ['script', 'args_list']
+            }
+        },
+        responses={
+            200: {
+                'description': 'Lote enfileirado com sucesso',
+                'content': {
+                    'application/json': {
+                        'example': {
+                            'batch_id': '550e8400-e29b-41d4-a716-446655440000',
+                            'total': 2,
+                            'status': 'enqueued',
+                            'message': 'Lote enfileirado para execução'
+                        }
+                    }
+                }
+            },
+            400: {'description': 'Erro de validação'},
+            404: {'description': 'Script não encontrado'},
+        }
+    )
+    def post(self, request):
+        try:
+            data = request.data
+            lua_script = data.get('script', '').strip()
+            args_list = data.get('args_list')
+            script_id = data.get('script_id')
+            batch_settings = get_batch_settings()
+
+            script_error = validate_lua_script(lua_script)
+            if script_error:
+                return script_error
+
+            if not isinstance(args_list, list) or not args_list:
+                return validation_error('args_list deve ser uma lista não vazia')
+
+            if len(args_list) > batch_settings['MAX_ITEMS']:
+                return validation_error(
+                    f'Lote muito grande (máx. {batch_settings["MAX_ITEMS"]} itens)')
+
+            invalid_items = [index for index, args in enumerate(args_list)
+                             if not isinstance(args, dict)]
+            if invalid_items:
+                return validation_error(
+                    'Todos os itens de args_list devem ser objetos JSON',
+                    errors={'args_list': invalid_items[:20]})
+
+            script, error = get_user_script(request, script_id)
+            if error:
+                return error
+
+            batch_id = str(uuid.uuid4())
+            create_batch(batch_id, len(args_list))
+
+            execution_ids = [None] * len(args_list)
+            if request.user.is_authenticated and script:
+                executions = ScriptExecution.objects.bulk_create([
+                    ScriptExecution(script=script, status='pending', request_args=args)
+                    for args in args_list
+                ], batch_size=batch_settings['CHUNK_SIZE'])
+                execution_ids = [execution.id for execution in executions]
+
+            user_id = request.user.id if request.user.is_authenticated else None
+            submit_executions(get_owner(request), LANE_BULK, [
+                [f'{batch_id}-{index}', lua_script, args, [],
+                 execution_ids[index], None, batch_id, None, user_id]
+                for index, args in enumerate(args_list)
+            ])
+
+            logger.info(
+                f'Lote {batch_id} enfileirado com {len(args_list)} jobs')
+
+            return Response({
+                'batch_id': batch_id,
+                'total': len(args_list),
+                'status': 'enqueued',
+                'message': 'Lote enfileirado para execução'
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.error(
+                f'Erro ao iniciar execução Lua em lote: {str(e)}', exc_info=True)
+            return internal_server_error(f'Erro interno: {str(e)}')
+
+
+class LuaBatchStatusView(APIView):
+    permission_classes = [AllowAny]
+
+    @extend_schema(
+        tags=['script-executions'],
+        summary='Progresso de um lote',
+        description='Retorna os contadores agregados (total, concluídos, sucesso e falha) de um lote.',
+        responses={
+            200: {
+                'description': 'Progresso do lote',
+                'content': {
+                    'application/json': {
+                        'example': {
+                            'batch_id': '550e8400-e29b-41d4-a716-446655440000',
+                            'total': 2,
+                            'completed': 1,
+                            'succeeded': 1,
+                            'failed': 0
+                        }
+                    }
+                }
+            },
+            404: {'description': 'Lote não encontrado ou expirado'},
+        }
+    )
+    def get(self, request, batch_id):
+        progress = get_batch(batch_id)
+        if not progress:
+            return not_found_error('Lote não encontrado ou expirado')
+
+        return Response({
+            'batch_id': batch_id,
+            'total': progress['total'],
+            'completed': progress['completed'],
+            'succeeded': progress['succeeded'],
+            'failed': progress['failed'],
+        })
+
+
+class LuaResultView(APIView):
+    permission_classes = [AllowAny]
+
+    @extend_schema(
+        tags=['script-executions'],
+        summary='Resultado completo de uma execução',
+        description="""
+Retorna o resultado completo (incluindo `splash_response`) de uma execução recente.
+Só o usuário que executou (ou recebeu a execução coalescida) e a equipe podem lê-lo;
+resultados de execuções anônimas ficam acessíveis a quem tem o `result_id`.
+O evento `lua_execution_completed` traz apenas um resumo com `result_id` e `result_url`
+quando o resultado é grande; use esta rota para baixá-lo. Os resultados expiram.
+
+Suporta download parcial com o cabeçalho `Range` (ex.: `Range: bytes=0-1048575`),
+respondendo `206` com `Content-Range`. Sem `Range`, o corpo é comprimido com gzip
+quando o cliente aceita (`Accept-Encoding: gzip`).
+""",
+        responses={
+            200: {'description': 'Resultado completo da execução'},
+            206: {'description': 'Faixa de bytes do resultado'},
+            404: {'description': 'Resultado não encontrado ou expirado'},
+            416: {'description': 'Faixa de bytes inválida'},
+        }
+    )
+    def get(self, request, result_id):
+        # Sem permissão responde como inexistente, para não revelar quais IDs existem
+        if not can_read_result(result_id, request.user):
+            return not_found_error('Resultado não encontrado ou expirado')
+
+        size = get_result_size(result_id)
+        if size is None:
+            return not_found_error('Resultado não encontrado ou expirado')
+
+        range_header = request.headers.get('Range')
+        if range_header:
+            byte_range = parse_byte_range(range_header, size)
+            if byte_range is None:
+                response = error_response(
+                    'Faixa de bytes inválida', code='range_not_satisfiable', status_code=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+            start, end = byte_range
+            payload = load_result_range(result_id, start, end)
+            if payload is None:
+                return not_found_error('Resultado não encontrado ou expirado')
+
+            response = HttpResponse(payload, status=206, content_type='application/json')
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Accept-Ranges'] = 'bytes'
+            return response
+
+        # O JSON já está pronto no Redis; não há por que decodificar e codificar de novo
+        payload = load_result_payload(result_id)
+        if payload is None:
+            return not_found_error('Resultado não encontrado ou expirado')
+
+        response = HttpResponse(content_type='application/json')
+        if 'gzip' in request.headers.get('Accept-Encoding', ''):
+            payload = compress_string(payload)
+            response['Content-Encoding'] = 'gzip'
+        response.content = payload
+        response['Accept-Ranges'] = 'bytes'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
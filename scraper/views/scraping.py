@@ -0,0 +1,91 @@
+from django.utils.dateparse import parse_datetime
+from rest_framework import viewsets, mixins
+from rest_framework.decorators import action
+from ..models import ScrapingSession, url_digest
+from ..pagination import (
+    ScrapingResultCursorPagination,
+    ScrapingUrlCursorPagination,
+    ScrapingScreenshotCursorPagination,
+)
+from ..serializers import (
+    ScrapingSessionSerializer,
+    ScrapingUrlSerializer,
+    ScrapingResultSerializer,
+    ScrapingScreenshotSerializer,
+)
+from ..utils.error_responses import validation_error
+
+
+def parse_datetime_param(request, name):
+    """Lê um parâmetro ISO 8601. Retorna (valor, erro)."""
+    raw_value = request.query_params.get(name)
+    if not raw_value:
+        return None, None
+
+    value = parse_datetime(raw_value)
+    if value is None:
+        return None, validation_error(f'{name} deve ser uma data ISO 8601')
+    return value, None
+
+
+class ScrapingSessionViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Sessões são acessadas pelo session_id (UUID gerado no início do scraping);
+    resultados, URLs e screenshots são filtrados e paginados no banco.
+    Sessões não têm dono (são criadas pelo pipeline do Scrapy), então só a equipe
+    (is_staff) as enxerga; para os demais usuários autenticados elas não existem.
+    """
+    serializer_class = ScrapingSessionSerializer
+    queryset = ScrapingSession.objects.all()
+    lookup_field = 'session_id'
+
+    def get_queryset(self):
+        if not self.request.user.is_staff:
+            return ScrapingSession.objects.none()
+        return super().get_queryset()
+
+    def paginate(self, request, queryset, paginator, serializer_class):
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = serializer_class(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def results(self, request, session_id=None):
+        session = self.get_object()
+        results = session.items.all()
+
+        url = request.query_params.get('url')
+        if url:
+            results = results.filter(url_hash=url_digest(url), url=url)
+
+        for name, lookup in (('since', 'scraped_at__gte'), ('until', 'scraped_at__lt')):
+            value, error = parse_datetime_param(request, name)
+            if error:
+                return error
+            if value:
+                results = results.filter(**{lookup: value})
+
+        if request.query_params.get('has_screenshot') in ('1', 'true'):
+            results = results.exclude(screenshot_path='')
+
+        return self.paginate(
+            request, results, ScrapingResultCursorPagination(), ScrapingResultSerializer)
+
+    @action(detail=True, methods=['get'])
+    def urls(self, request, session_id=None):
+        session = self.get_object()
+        urls = session.session_urls.all()
+
+        url = request.query_params.get('url')
+        if url:
+            urls = urls.filter(url_hash=url_digest(url), url=url)
+
+        return self.paginate(
+            request, urls, ScrapingUrlCursorPagination(), ScrapingUrlSerializer)
+
+    @action(detail=True, methods=['get'])
+    def screenshots(self, request, session_id=None):
+        session = self.get_object()
+        return self.paginate(
+            request, session.screenshot_files.all(),
+            ScrapingScreenshotCursorPagination(), ScrapingScreenshotSerializer)
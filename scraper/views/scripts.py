@@ -1,9 +1,88 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
 from ..models import Script, ScriptExecution
-from ..serializers import ScriptSerializer, ScriptExecutionSerializer
+from ..pagination import ExecutionCursorPagination
+from ..serializers import (
+    ScriptSerializer,
+    ScriptExecutionSerializer,
+    ScriptExecutionSummarySerializer,
+    ScriptExecutionPayloadSerializer,
+)
+from ..utils.error_responses import validation_error
+from ..services.lua_modules import register_script
+from ..services.execution_retention import load_archived_payload
+
+# Colunas pesadas (HTML completo, logs) carregadas apenas no endpoint de payload
+HEAVY_EXECUTION_FIELDS = ['response_data', 'logs']
+
+# Colunas do banco necessárias para cada campo do resumo
+SUMMARY_FIELD_COLUMNS = {
+    'id': ['id'],
+    'script': ['script'],
+    'script_name': ['script__name'],
+    'status': ['status'],
+    'started_at': ['started_at'],
+    'finished_at': ['finished_at'],
+    'request_args': ['request_args'],
+    'screenshot_url': ['screenshot_url'],
+    'screenshot_variants': ['screenshot_variants'],
+    'compacted': ['compacted'],
+    'duration': ['started_at', 'finished_at'],
+}
+
+
+def parse_fields_param(request):
+    """
+    Lê `?fields=a,b,c`. Retorna (campos, erro); campos é None quando o
+    parâmetro não foi informado.
+    """
+    raw_fields = request.query_params.get('fields')
+    if not raw_fields:
+        return None, None
+
+    fields = [field.strip() for field in raw_fields.split(',') if field.strip()]
+    invalid = [field for field in fields if field not in SUMMARY_FIELD_COLUMNS]
+    if invalid:
+        return None, validation_error(
+            f'Campos inválidos: {", ".join(invalid)}',
+            errors={'fields': sorted(SUMMARY_FIELD_COLUMNS)})
+
+    return fields, None
+
+
+def summary_queryset(queryset, fields=None):
+    if not fields:
+        return queryset.select_related('script').defer(
+            *HEAVY_EXECUTION_FIELDS, 'script__code')
+
+    # id e started_at são sempre necessários para a paginação por cursor
+    columns = {'id', 'started_at'}
+    for field in fields:
+        columns.update(SUMMARY_FIELD_COLUMNS[field])
+
+    queryset = queryset.select_related(None)
+    if 'script__name' in columns:
+        columns.add('script')
+        queryset = queryset.select_related('script')
+
+    return queryset.only(*columns)
+
+
+def serialize_execution(execution, serializer_class=ScriptExecutionSerializer) -> dict:
+    """
+    Dados da execução com o payload completo. Execuções compactadas não têm mais
+    response_data e logs no banco: eles vêm do arquivo, e `archived` indica se a leitura
+    falhou (o cliente recebe os campos nulos em vez de dados incompletos sem aviso).
+    """
+    data = serializer_class(execution).data
+    if not execution.compacted:
+        return data
+
+    archived = load_archived_payload(execution)
+    if archived is None:
+        return {**data, 'archived': False}
+    return {**data, **archived, 'archived': True}
 
 
 class ScriptViewSet(viewsets.ModelViewSet):
@@ -14,14 +93,39 @@ class ScriptViewSet(viewsets.ModelViewSet):
         return Script.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        script = serializer.save(user=self.request.user)
+        register_script(script.code)
+
+    def perform_update(self, serializer):
+        script = serializer.save()
+        register_script(script.code)
 
     @action(detail=True, methods=['get'])
     def executions(self, request, pk=None):
         script = self.get_object()
-        executions = script.executions.all()
-        serializer = ScriptExecutionSerializer(executions, many=True)
-        return Response(serializer.data)
+
+        fields, error = parse_fields_param(request)
+        if error:
+            return error
+
+        executions = summary_queryset(script.executions.all(), fields)
+
+        paginator = ExecutionCursorPagination()
+        page = paginator.paginate_queryset(executions, request, view=self)
+        serializer = ScriptExecutionSummarySerializer(
+            page, many=True, fields=fields)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'],
+            url_path=r'executions/(?P<execution_id>[0-9]+)')
+    def execution_detail(self, request, pk=None, execution_id=None):
+        script = self.get_object()
+        execution = script.executions.filter(id=execution_id).first()
+
+        if not execution:
+            return Response({'message': 'Execução não encontrada'}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response(serialize_execution(execution))
 
     @action(detail=True, methods=['get'])
     def latest_execution(self, request, pk=None):
@@ -29,8 +133,7 @@ class ScriptViewSet(viewsets.ModelViewSet):
         latest_execution = script.executions.order_by('-started_at').first()
 
         if latest_execution:
-            serializer = ScriptExecutionSerializer(latest_execution)
-            return Response(serializer.data)
+            return Response(serialize_execution(latest_execution))
         else:
             return Response({'message': 'Nenhuma execução encontrada'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -38,10 +141,28 @@ class ScriptViewSet(viewsets.ModelViewSet):
 class ScriptExecutionViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ScriptExecutionSerializer
     queryset = ScriptExecution.objects.all()
-    authentication_classes = []
-    permission_classes = [AllowAny]
+    pagination_class = ExecutionCursorPagination
 
     def get_queryset(self):
         return ScriptExecution.objects.filter(
             script__user=self.request.user
         ).select_related('script')
+
+    def list(self, request, *args, **kwargs):
+        fields, error = parse_fields_param(request)
+        if error:
+            return error
+
+        queryset = summary_queryset(self.get_queryset(), fields)
+        page = self.paginate_queryset(queryset)
+        serializer = ScriptExecutionSummarySerializer(
+            page, many=True, fields=fields)
+        return self.get_paginated_response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(serialize_execution(self.get_object()))
+
+    @action(detail=True, methods=['get'])
+    def payload(self, request, pk=None):
+        return Response(serialize_execution(
+            self.get_object(), ScriptExecutionPayloadSerializer))
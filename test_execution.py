@@ -67,6 +67,10 @@ class WebSocketClient:
                 status = data.get('status', 'N/A')
                 print(f"  📊 Progresso: {step_title} - {status}")
 
+            elif data.get('type') == 'lua_execution_steps':
+                for step in data.get('steps', []):
+                    print(f"  📊 Progresso: {step.get('step_title', 'N/A')} - {step.get('status', 'N/A')}")
+
             elif data.get('type') == 'lua_execution_completed':
                 self.completed = True
                 result = data.get('result', {})